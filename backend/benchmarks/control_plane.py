@@ -0,0 +1,375 @@
+"""
+Banc d'essai du plan de contrôle (API FastAPI de backend/main.py), hors ligne.
+
+Le client Docker partagé (utils._docker_client) est remplacé par un démon
+factice en mémoire (fake_docker.py) et les sondes de disponibilité répondent
+immédiatement : seul le coût du plan de contrôle est mesuré (routage, moteur
+de jobs, inventaire, agents de configuration, appels d'API Docker simulés).
+Les requêtes passent par l'application ASGI, sans serveur HTTP.
+
+Scénarios, pour chaque nombre de conteneurs existants et chaque niveau de concurrence :
+  list_containers      GET /tools/containers?created_by=mon_app
+  list_containers_304  même requête avec If-None-Match (revalidation)
+  config_read          POST /tools/{spark,hbase,mongodb}/config
+  update_config        POST /tools/spark/update-config, jusqu'à la fin du job
+  start_stop           POST /tools/spark/start puis /stop, jusqu'à la fin des jobs
+
+Pour les scénarios à job, 'latency' est la durée de bout en bout (requête +
+exécution du job) et 'submit' la latence de la réponse 202.
+
+Usage :
+  python -m backend.benchmarks.control_plane --containers 10,100,1000 \\
+      --concurrency 1,8,32 --requests 200 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import shutil
+import statistics
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlencode
+
+# Base d'état en mémoire : le banc d'essai ne lit ni n'écrit la base du backend
+os.environ.setdefault("BIGDATA_STATE_DB", ":memory:")
+
+from .fake_docker import FakeDockerClient
+
+logger = logging.getLogger("installer_logger")
+
+SCENARIOS = ("list_containers", "list_containers_304", "config_read", "update_config", "start_stop")
+# Attente maximale d'un job (secondes)
+JOB_TIMEOUT = 60
+# Dossiers de données (./data/<conteneur>) créés par les installateurs pour les conteneurs du banc
+VOLUME_ROOT = os.path.join(".", "data")
+BENCH_PREFIX = "bench-"
+
+
+# ------------------- ENVIRONNEMENT FACTICE -------------------
+
+def install_fake_docker(latency: float) -> FakeDockerClient:
+    """Substitue le démon factice au client Docker partagé et rend les sondes immédiates."""
+    from backend.installers import readiness, utils
+
+    client = FakeDockerClient(latency=latency)
+    utils._docker_client = client
+
+    def ready(*args: Any, **kwargs: Any) -> readiness.Probe:
+        return lambda container: True
+
+    for probe in ("tcp_probe", "http_probe", "http_json_probe", "mongo_ping_probe", "exec_probe"):
+        setattr(readiness, probe, ready)
+    return client
+
+
+def remove_bench_volumes(existing: set) -> None:
+    """Supprime les dossiers de données des conteneurs du banc créés pendant l'exécution."""
+    try:
+        names = os.listdir(VOLUME_ROOT)
+    except OSError:
+        return
+    for name in names:
+        if name.startswith(BENCH_PREFIX) and name not in existing:
+            shutil.rmtree(os.path.join(VOLUME_ROOT, name), ignore_errors=True)
+
+
+def seed_containers(client: FakeDockerClient, count: int) -> Dict[str, List[str]]:
+    """Crée 'count' conteneurs gérés existants, répartis entre les trois outils."""
+    from backend.installers.utils import managed_labels
+
+    client.clear()
+    names: Dict[str, List[str]] = {"spark": [], "hbase": [], "mongodb": []}
+    containers = {}
+    for i in range(count):
+        tool = ("spark", "hbase", "mongodb")[i % 3]
+        name = f"bench-{tool}-{i}"
+        names[tool].append(name)
+        ports = {
+            "spark": {"8080/tcp": 20000 + i, "7077/tcp": None, "7099/tcp": None},
+            "hbase": {"16010/tcp": 20000 + i, "7099/tcp": None},
+            "mongodb": {"27017/tcp": 20000 + i},
+        }[tool]
+        containers[name] = {
+            "image": {"spark": "spark_custom:latest", "hbase": "hbase_custom:latest", "mongodb": "mongo:7.0"}[tool],
+            "labels": managed_labels(tool),
+            "ports": ports,
+            "environment": {"MONGO_INITDB_ROOT_USERNAME": "admin"} if tool == "mongodb" else {},
+        }
+    client.seed(containers)
+    return names
+
+
+# ------------------- CLIENT ASGI -------------------
+
+async def asgi_request(app: Any, method: str, path: str, body: Optional[Dict[str, Any]] = None,
+                       headers: Optional[Dict[str, str]] = None,
+                       query: Optional[Dict[str, Any]] = None) -> Tuple[int, Dict[str, str], bytes]:
+    """Appelle l'application ASGI en mémoire. Retourne (statut, en-têtes, corps)."""
+    payload = json.dumps(body).encode() if body is not None else b""
+    raw_headers = [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]
+    if body is not None:
+        raw_headers += [(b"content-type", b"application/json"), (b"content-length", str(len(payload)).encode())]
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": urlencode(query or {}).encode(),
+        "root_path": "",
+        "headers": raw_headers,
+        "client": ("127.0.0.1", 0),
+        "server": ("bench", 80),
+    }
+    sent = False
+    response: Dict[str, Any] = {"status": 0, "headers": {}, "body": b""}
+    finished = asyncio.Event()
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": payload, "more_body": False}
+        await finished.wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        if message["type"] == "http.response.start":
+            response["status"] = message["status"]
+            response["headers"] = {k.decode(): v.decode() for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            response["body"] += message.get("body", b"")
+            if not message.get("more_body"):
+                finished.set()
+
+    await app(scope, receive, send)
+    return response["status"], response["headers"], response["body"]
+
+
+async def wait_job(job_id: str) -> str:
+    """Attend la fin d'un job du moteur (en mémoire) et retourne son statut."""
+    from backend.installers.jobs import engine
+
+    job = engine.get(job_id)
+    deadline = time.monotonic() + JOB_TIMEOUT
+    while not job.done:
+        if time.monotonic() > deadline:
+            raise TimeoutError(f"Job {job_id} non terminé après {JOB_TIMEOUT} s")
+        await asyncio.sleep(0.002)
+    return job.status
+
+
+# ------------------- SCÉNARIOS -------------------
+
+class Scenario:
+    """Une opération mesurée : run(i) retourne (succès, latence de soumission ou None)."""
+
+    def __init__(self, app: Any, names: Dict[str, List[str]]):
+        self.app = app
+        self.names = names
+        self.etag: Optional[str] = None
+
+    def pick(self, tool: str, i: int) -> str:
+        return self.names[tool][i % len(self.names[tool])]
+
+    async def list_containers(self, i: int) -> Tuple[bool, Optional[float]]:
+        status, headers, _ = await asgi_request(self.app, "GET", "/tools/containers", query={"created_by": "mon_app"})
+        self.etag = headers.get("etag", self.etag)
+        return status == 200, None
+
+    async def list_containers_304(self, i: int) -> Tuple[bool, Optional[float]]:
+        if self.etag is None:
+            await self.list_containers(i)
+        status, _, _ = await asgi_request(
+            self.app, "GET", "/tools/containers", query={"created_by": "mon_app"},
+            headers={"If-None-Match": self.etag},
+        )
+        return status in (200, 304), None
+
+    async def config_read(self, i: int) -> Tuple[bool, Optional[float]]:
+        tool = ("spark", "hbase", "mongodb")[i % 3]
+        status, _, _ = await asgi_request(
+            self.app, "POST", f"/tools/{tool}/config", body={"container_name": self.pick(tool, i // 3)}
+        )
+        return status == 200, None
+
+    async def submit(self, path: str, body: Dict[str, Any]) -> Tuple[bool, float]:
+        start = time.perf_counter()
+        status, _, content = await asgi_request(self.app, "POST", path, body=body)
+        submitted = time.perf_counter() - start
+        if status != 202:
+            return False, submitted
+        return await wait_job(json.loads(content)["job_id"]) == "succeeded", submitted
+
+    async def update_config(self, i: int) -> Tuple[bool, Optional[float]]:
+        return await self.submit("/tools/spark/update-config", {
+            "container_name": self.pick("spark", i),
+            "port": 20000 + (i % len(self.names["spark"])) * 3,
+            "config": {"spark.executor.memory": f"{512 + i % 8 * 128}m"},
+        })
+
+    async def start_stop(self, i: int) -> Tuple[bool, Optional[float]]:
+        config = {"container_name": f"bench-new-{i}", "port": 30000 + i}
+        ok, submitted = await self.submit("/tools/spark/start", config)
+        ok_stop, submitted_stop = await self.submit("/tools/spark/stop", config)
+        return ok and ok_stop, submitted + submitted_stop
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile par rang le plus proche (q entre 0 et 100)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    """Statistiques de latence en millisecondes."""
+    if not values:
+        return {}
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p90_ms": round(percentile(values, 90) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(values) * 1000, 3),
+        "max_ms": round(max(values) * 1000, 3),
+    }
+
+
+async def run_scenario(operation: Callable[[int], Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    """Exécute 'requests' opérations avec au plus 'concurrency' en vol."""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    submits: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                ok, submitted = await operation(i)
+            except Exception as e:
+                logger.debug(f"Opération {i} en échec : {e}")
+                ok, submitted = False, None
+            latencies.append(time.perf_counter() - start)
+            if submitted is not None:
+                submits.append(submitted)
+            if not ok:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    result = {
+        "requests": requests,
+        "errors": errors,
+        "duration_s": round(elapsed, 4),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "latency": summarize(latencies),
+    }
+    if submits:
+        result["submit"] = summarize(submits)
+    return result
+
+
+async def run_benchmark(container_counts: List[int], concurrency_levels: List[int], requests: int,
+                        scenarios: List[str], latency: float) -> Dict[str, Any]:
+    client = install_fake_docker(latency)
+    from backend.installers.config_cache import config_cache
+    from backend.installers.inventory import inventory
+    from backend.main import app
+
+    results = []
+    existing = set(os.listdir(VOLUME_ROOT)) if os.path.isdir(VOLUME_ROOT) else set()
+    try:
+        for count in container_counts:
+            names = seed_containers(client, count)
+            inventory.start()
+            inventory.refresh()
+            # Les noms des conteneurs factices se répètent d'une taille à l'autre
+            config_cache.clear()
+            scenario = Scenario(app, names)
+            for concurrency in concurrency_levels:
+                for name in scenarios:
+                    calls = client.calls
+                    result = await run_scenario(getattr(scenario, name), requests, concurrency)
+                    result.update({
+                        "scenario": name,
+                        "containers": count,
+                        "concurrency": concurrency,
+                        "docker_calls": client.calls - calls,
+                    })
+                    results.append(result)
+                    print(format_row(result), file=sys.stderr)
+    finally:
+        client.close()
+        remove_bench_volumes(existing)
+
+    return {
+        "meta": {
+            "timestamp": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "docker_latency_ms": latency * 1000,
+            "job_workers": int(os.environ.get("BIGDATA_JOB_WORKERS", "4")),
+            "requests": requests,
+        },
+        "results": results,
+    }
+
+
+def format_row(result: Dict[str, Any]) -> str:
+    latency = result["latency"]
+    return (
+        f"{result['scenario']:<20} n={result['containers']:<5} c={result['concurrency']:<4} "
+        f"p50={latency.get('p50_ms', 0):>9.3f}ms p99={latency.get('p99_ms', 0):>9.3f}ms "
+        f"{result['throughput_rps']:>9.1f} req/s  erreurs={result['errors']}"
+    )
+
+
+def parse_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne du plan de contrôle.")
+    parser.add_argument("--containers", type=parse_list, default=[10, 100, 1000],
+                        help="Nombres de conteneurs existants (liste séparée par des virgules)")
+    parser.add_argument("--concurrency", type=parse_list, default=[1, 8, 32],
+                        help="Niveaux de concurrence (liste séparée par des virgules)")
+    parser.add_argument("--requests", type=int, default=200, help="Opérations par scénario")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"Scénarios à exécuter parmi : {', '.join(SCENARIOS)}")
+    parser.add_argument("--docker-latency-ms", type=float, default=0.0,
+                        help="Latence simulée de chaque appel à l'API Docker (ms)")
+    parser.add_argument("--output", help="Fichier JSON des résultats (sortie standard par défaut)")
+    args = parser.parse_args(argv)
+
+    scenarios = [s for s in args.scenarios.split(",") if s]
+    unknown = sorted(set(scenarios) - set(SCENARIOS))
+    if unknown:
+        parser.error(f"Scénario(s) inconnu(s) : {', '.join(unknown)}")
+
+    logging.getLogger("installer_logger").setLevel(logging.WARNING)
+    report = asyncio.run(run_benchmark(
+        args.containers, args.concurrency, args.requests, scenarios, args.docker_latency_ms / 1000
+    ))
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
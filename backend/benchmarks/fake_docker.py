@@ -0,0 +1,392 @@
+import hashlib
+import itertools
+import json
+import queue
+import socketserver
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterator, List, Optional
+
+from docker.errors import APIError, NotFound
+
+# Port de l'agent de configuration (voir installers/agents.py)
+AGENT_PORT = "7099/tcp"
+
+
+class FakeAgent:
+    """
+    Agent de configuration factice : même protocole que l'agent des images
+    Spark et HBase (une requête JSON par ligne), une configuration par processus.
+    Tous les conteneurs factices publient leur port d'agent sur ce serveur.
+    """
+
+    def __init__(self):
+        self.config: Dict[str, Any] = {"spark.executor.memory": "1g", "hbase.regionserver.handler.count": "30"}
+        self._lock = threading.Lock()
+        agent = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    request = json.loads(line)
+                    with agent._lock:
+                        if request.get("op") == "set":
+                            agent.config.update(request.get("config") or {})
+                        response = {"config": dict(agent.config)}
+                    self.wfile.write((json.dumps(response) + "\n").encode())
+
+        self._server = socketserver.ThreadingTCPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+        threading.Thread(target=self._server.serve_forever, name="fake-agent", daemon=True).start()
+
+    def close(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+class FakeImage:
+    def __init__(self, reference: str):
+        self.id = "sha256:" + hashlib.sha256(reference.encode()).hexdigest()
+        self.tags = [reference] if not reference.startswith("sha256:") else []
+        self.attrs = {"Id": self.id, "RepoTags": self.tags, "RepoDigests": [], "Config": {"Env": []}}
+
+    def tag(self, repository: str, tag: Optional[str] = None) -> bool:
+        return True
+
+
+class FakeContainer:
+    """Conteneur en mémoire exposant le sous-ensemble du SDK Docker utilisé par les installateurs."""
+
+    def __init__(self, client: "FakeDockerClient", image: FakeImage, name: str, **kwargs: Any):
+        self.client = client
+        self.id = uuid.uuid4().hex + uuid.uuid4().hex
+        self.name = name
+        self.image = image
+        self.status = "running"
+        self.labels: Dict[str, str] = dict(kwargs.get("labels") or {})
+        self.ports = self._bind_ports(kwargs.get("ports") or {})
+        self.attrs = {
+            "Id": self.id,
+            "Name": "/" + name,
+            "Config": {
+                "Env": [f"{k}={v}" for k, v in (kwargs.get("environment") or {}).items()],
+                "Cmd": kwargs.get("command"),
+                "Labels": self.labels,
+            },
+            "HostConfig": {
+                "Memory": kwargs.get("mem_limit") or 0,
+                "CpuQuota": kwargs.get("cpu_quota") or 0,
+                "CpuPeriod": kwargs.get("cpu_period") or 0,
+                "PortBindings": {k: [{"HostPort": str(p)}] for k, p in self.ports.items()},
+            },
+            "NetworkSettings": {
+                "Ports": {k: [{"HostIp": "0.0.0.0", "HostPort": str(p)}] for k, p in self.ports.items()},
+            },
+            "Mounts": [
+                {"Destination": v["bind"], "Source": k} for k, v in (kwargs.get("volumes") or {}).items()
+            ],
+        }
+
+    def _bind_ports(self, ports: Dict[str, Any]) -> Dict[str, int]:
+        bound = {}
+        for container_port, host in ports.items():
+            if container_port == AGENT_PORT:
+                bound[container_port] = self.client.agent.port
+            elif isinstance(host, int):
+                bound[container_port] = host
+            else:
+                bound[container_port] = next(self.client.ephemeral_ports)
+        return bound
+
+    def row(self) -> Dict[str, Any]:
+        """Ligne de l'API 'containers/json'."""
+        return {
+            "Id": self.id,
+            "Names": ["/" + self.name],
+            "Image": self.image.tags[0] if self.image.tags else self.image.id,
+            "ImageID": self.image.id,
+            "State": self.status,
+            "Labels": self.labels,
+            "Ports": [
+                {"PrivatePort": int(k.split("/")[0]), "Type": k.split("/")[1], "IP": "0.0.0.0", "PublicPort": p}
+                for k, p in self.ports.items()
+            ],
+        }
+
+    def stop(self, **kwargs: Any) -> None:
+        self.client.delay()
+        self.status = "exited"
+        self.client.emit(self, "die")
+
+    def start(self) -> None:
+        self.client.delay()
+        self.status = "running"
+        self.client.emit(self, "start")
+
+    def restart(self, **kwargs: Any) -> None:
+        self.stop()
+        self.start()
+
+    def rename(self, name: str) -> None:
+        self.client.delay()
+        with self.client.lock:
+            self.client.containers.by_name.pop(self.name, None)
+            self.name = name
+            self.client.containers.by_name[name] = self
+        self.client.emit(self, "rename")
+
+    def update(self, **kwargs: Any) -> None:
+        self.client.delay()
+        host_config = self.attrs["HostConfig"]
+        host_config["Memory"] = kwargs.get("mem_limit", host_config["Memory"])
+        host_config["CpuQuota"] = kwargs.get("cpu_quota", host_config["CpuQuota"])
+        host_config["CpuPeriod"] = kwargs.get("cpu_period", host_config["CpuPeriod"])
+        self.client.emit(self, "update")
+
+    def reload(self) -> None:
+        self.client.delay()
+
+    def exec_run(self, cmd: Any, environment: Optional[Dict[str, str]] = None, **kwargs: Any):
+        """Scripts de configuration : 'clé=valeur' écrit la config de l'agent, la sortie est la config JSON."""
+        self.client.delay()
+        args = cmd if isinstance(cmd, list) else str(cmd).split()
+        if args and args[0] == "python3":
+            with self.client.agent._lock:
+                self.client.agent.config.update(dict(a.split("=", 1) for a in args[2:] if "=" in a))
+        with self.client.agent._lock:
+            output = json.dumps(self.client.agent.config)
+        self.client.emit(self, "exec_start")
+        return 0, output.encode()
+
+
+class FakeContainers:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self.by_name: Dict[str, FakeContainer] = {}
+
+    def run(self, image: str, detach: bool = True, name: Optional[str] = None, **kwargs: Any) -> FakeContainer:
+        self.client.delay()
+        name = name or uuid.uuid4().hex[:12]
+        with self.client.lock:
+            if name in self.by_name:
+                raise APIError(f"Conflict. The container name \"/{name}\" is already in use")
+            container = FakeContainer(self.client, self.client.images.get(image), name, **kwargs)
+            self.by_name[name] = container
+        self.client.emit(container, "create")
+        self.client.emit(container, "start")
+        return container
+
+    def get(self, name_or_id: str) -> FakeContainer:
+        self.client.delay()
+        with self.client.lock:
+            container = self.by_name.get(name_or_id) or next(
+                (c for c in self.by_name.values() if c.id == name_or_id), None
+            )
+        if container is None:
+            raise NotFound(f"No such container: {name_or_id}")
+        return container
+
+    def list(self, all: bool = False, filters: Optional[Dict[str, Any]] = None) -> List[FakeContainer]:
+        self.client.delay()
+        labels = (filters or {}).get("label") or []
+        labels = [labels] if isinstance(labels, str) else labels
+        with self.client.lock:
+            containers = list(self.by_name.values())
+        result = []
+        for container in containers:
+            if not all and container.status != "running":
+                continue
+            if not [f for f in labels if not _label_matches(container.labels, f)]:
+                result.append(container)
+        return result
+
+
+def _label_matches(labels: Dict[str, str], spec: str) -> bool:
+    key, sep, value = spec.partition("=")
+    return key in labels and (not sep or labels[key] == value)
+
+
+class FakeAPI:
+    """Client bas niveau (DockerClient.api)."""
+
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self._execs: Dict[str, tuple] = {}
+
+    def containers(self, all: bool = False, filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        self.client.delay()
+        wanted = (filters or {}).get("id")
+        with self.client.lock:
+            containers = list(self.client.containers.by_name.values())
+        return [c.row() for c in containers if (all or c.status == "running") and (not wanted or c.id == wanted)]
+
+    def images(self) -> List[Dict[str, Any]]:
+        self.client.delay()
+        with self.client.lock:
+            return [image.attrs for image in self.client.images.store.values()]
+
+    def inspect_container(self, container_id: str) -> Dict[str, Any]:
+        return self.client.containers.get(container_id).attrs
+
+    def remove_container(self, name: str, force: bool = False) -> None:
+        container = self.client.containers.get(name)
+        with self.client.lock:
+            self.client.containers.by_name.pop(container.name, None)
+        self.client.emit(container, "destroy")
+
+    def stats(self, container_id: str, stream: bool = False, one_shot: bool = True) -> Dict[str, Any]:
+        self.client.delay()
+        return {
+            "cpu_stats": {"cpu_usage": {"total_usage": int(time.time() * 1e6)}, "system_cpu_usage": int(time.time() * 1e9),
+                          "online_cpus": 4},
+            "memory_stats": {"usage": 256 * 1024 ** 2, "limit": 1024 ** 3, "stats": {"inactive_file": 0}},
+            "networks": {"eth0": {"rx_bytes": 0, "tx_bytes": 0}},
+        }
+
+    def exec_create(self, container: str, cmd: Any, environment: Optional[Dict[str, str]] = None,
+                    **kwargs: Any) -> Dict[str, str]:
+        exec_id = uuid.uuid4().hex
+        with self.client.lock:
+            self._execs[exec_id] = (self.client.containers.get(container), cmd, environment, None)
+        return {"Id": exec_id}
+
+    def exec_start(self, exec_id: str, stream: bool = False, **kwargs: Any) -> Any:
+        container, cmd, environment, _ = self._execs[exec_id]
+        code, output = container.exec_run(cmd, environment=environment)
+        with self.client.lock:
+            self._execs[exec_id] = (container, cmd, environment, code)
+        return iter([output]) if stream else output
+
+    def exec_inspect(self, exec_id: str) -> Dict[str, Any]:
+        with self.client.lock:
+            *_, code = self._execs.pop(exec_id)
+        return {"ExitCode": code, "Running": False}
+
+    def build(self, path: str, tag: str, **kwargs: Any) -> Iterator[Dict[str, Any]]:
+        self.client.images.get(tag)
+        yield {"stream": f"Successfully tagged {tag}\n"}
+
+
+class FakeImages:
+    """Store d'images : toute référence demandée est considérée comme présente (ni build, ni pull)."""
+
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self.store: Dict[str, FakeImage] = {}
+
+    def get(self, reference: str) -> FakeImage:
+        self.client.delay()
+        with self.client.lock:
+            for image in self.store.values():
+                if image.id == reference:
+                    return image
+            return self.store.setdefault(reference, FakeImage(reference))
+
+    def pull(self, repository: str, tag: Optional[str] = None) -> FakeImage:
+        return self.get(f"{repository}:{tag or 'latest'}")
+
+    def load(self, data: Any) -> List[FakeImage]:
+        return []
+
+
+class FakeNetwork:
+    def __init__(self, client: "FakeDockerClient", name: str):
+        self.client = client
+        self.name = name
+
+    def remove(self) -> None:
+        with self.client.lock:
+            self.client.networks.store.pop(self.name, None)
+
+
+class FakeNetworks:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+        self.store: Dict[str, FakeNetwork] = {}
+
+    def list(self, names: Optional[List[str]] = None) -> List[FakeNetwork]:
+        self.client.delay()
+        with self.client.lock:
+            return [n for n in self.store.values() if not names or any(name in n.name for name in names)]
+
+    def create(self, name: str, **kwargs: Any) -> FakeNetwork:
+        self.client.delay()
+        with self.client.lock:
+            return self.store.setdefault(name, FakeNetwork(self.client, name))
+
+
+class FakeVolumes:
+    def __init__(self, client: "FakeDockerClient"):
+        self.client = client
+
+    def get(self, name: str):
+        self.client.delay()
+        raise NotFound(f"No such volume: {name}")
+
+
+class FakeDockerClient:
+    """
+    Démon Docker factice en mémoire, substitué au client partagé
+    (utils._docker_client) : conteneurs, images, réseaux et flux d'événements.
+    'latency' (secondes) simule l'aller-retour vers le démon à chaque appel d'API.
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.lock = threading.RLock()
+        self.agent = FakeAgent()
+        self.ephemeral_ports = itertools.count(40000)
+        self.containers = FakeContainers(self)
+        self.api = FakeAPI(self)
+        self.images = FakeImages(self)
+        self.networks = FakeNetworks(self)
+        self.volumes = FakeVolumes(self)
+        self._subscribers: List[queue.Queue] = []
+        self.calls = 0
+
+    def delay(self) -> None:
+        self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def ping(self) -> bool:
+        self.delay()
+        return True
+
+    def emit(self, container: FakeContainer, action: str) -> None:
+        event = {
+            "Type": "container",
+            "Action": action,
+            "id": container.id,
+            "Actor": {"ID": container.id, "Attributes": {"name": container.name, **container.labels}},
+            "time": int(time.time()),
+        }
+        with self.lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.put(event)
+
+    def events(self, decode: bool = True, filters: Optional[Dict[str, Any]] = None) -> Iterator[Dict[str, Any]]:
+        subscriber: queue.Queue = queue.Queue()
+        with self.lock:
+            self._subscribers.append(subscriber)
+        while True:
+            yield subscriber.get()
+
+    def seed(self, containers: Dict[str, Dict[str, Any]]) -> None:
+        """Crée des conteneurs existants sans émettre d'événement (état initial du démon)."""
+        for name, kwargs in containers.items():
+            kwargs = dict(kwargs)
+            image = self.images.get(kwargs.pop("image"))
+            with self.lock:
+                self.containers.by_name[name] = FakeContainer(self, image, name, **kwargs)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.containers.by_name.clear()
+            self.networks.store.clear()
+
+    def close(self) -> None:
+        self.agent.close()
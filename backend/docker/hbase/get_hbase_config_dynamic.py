@@ -3,8 +3,11 @@ import sys
 import json
 import xml.etree.ElementTree as ET
 import os
+import socketserver
+import threading
 
 HBASE_SITE_PATH = "/opt/hbase-2.1.3/conf/hbase-site.xml"
+AGENT_PORT = 7099
 
 def load_config(path):
     if not os.path.exists(path):
@@ -29,14 +32,84 @@ def save_config(path, config):
     tree = ET.ElementTree(root)
     tree.write(path, encoding="utf-8", xml_declaration=True)
 
+def parse_args(args):
+    config = {}
+    for arg in args:
+        if "=" in arg:
+            k, v = arg.split("=", 1)
+            config[k] = v
+    return config
+
+class ConfigAgent:
+    """
+    Garde hbase-site.xml en mémoire (rechargé seulement si le fichier change)
+    et applique les mises à jour sans relancer d'interpréteur.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.mtime = None
+        self.config = {}
+
+    def _refresh(self):
+        mtime = os.path.getmtime(self.path)
+        if mtime != self.mtime:
+            self.config = load_config(self.path)
+            self.mtime = mtime
+
+    def get(self):
+        with self.lock:
+            self._refresh()
+            return dict(self.config)
+
+    def set(self, updates):
+        with self.lock:
+            self._refresh()
+            self.config.update({k: str(v) for k, v in updates.items()})
+            save_config(self.path, self.config)
+            self.mtime = os.path.getmtime(self.path)
+            return dict(self.config)
+
+def serve(agent, port=AGENT_PORT):
+    """Protocole : une requête JSON par ligne, une réponse JSON par ligne."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    op = request.get("op")
+                    if op == "get":
+                        response = {"config": agent.get()}
+                    elif op == "set":
+                        response = {"status": "updated", "config": agent.set(request.get("config", {}))}
+                    elif op == "ping":
+                        response = {"status": "ok"}
+                    else:
+                        response = {"error": f"opération inconnue : {op}"}
+                except Exception as e:
+                    response = {"error": str(e)}
+                self.wfile.write((json.dumps(response) + "\n").encode())
+                self.wfile.flush()
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    with socketserver.ThreadingTCPServer(("0.0.0.0", port), Handler) as server:
+        server.serve_forever()
+
 if __name__ == "__main__":
-    if len(sys.argv) == 1:
+    args = sys.argv[1:]
+    if "--serve" in args:
+        args.remove("--serve")
+        agent = ConfigAgent(HBASE_SITE_PATH)
+        if parse_args(args):
+            agent.set(parse_args(args))
+        serve(agent)
+    elif not args:
         print(json.dumps(load_config(HBASE_SITE_PATH), indent=2))
     else:
         config = load_config(HBASE_SITE_PATH)
-        for arg in sys.argv[1:]:
-            if "=" in arg:
-                k, v = arg.split("=", 1)
-                config[k] = v
+        config.update(parse_args(args))
         save_config(HBASE_SITE_PATH, config)
         print(json.dumps({"status": "updated", "config": config}, indent=2))
@@ -1,25 +1,117 @@
 # get_spark_config.py
+# Usage :
+#   spark-submit get_spark_config.py [clé=valeur ...]          -> affiche la configuration en JSON
+#   spark-submit get_spark_config.py --serve [clé=valeur ...]  -> agent résident sur le port 7099
 import sys
 import json
+import socketserver
+import threading
 from pyspark.sql import SparkSession
 
-args = sys.argv[1:]
-config_dict = {}
+AGENT_PORT = 7099
 
-# Lire les arguments sous forme de clé=valeur
-for arg in args:
-    if '=' in arg:
-        key, val = arg.split('=', 1)
-        config_dict[key] = val
 
-builder = SparkSession.builder
+def parse_args(args):
+    """Lit les arguments sous forme de clé=valeur."""
+    config_dict = {}
+    for arg in args:
+        if '=' in arg:
+            key, val = arg.split('=', 1)
+            config_dict[key] = val
+    return config_dict
 
-for key, val in config_dict.items():
-    builder = builder.config(key, val)
 
-spark = builder.getOrCreate()
-spark.sparkContext.setLogLevel("ERROR")
-conf = spark.sparkContext.getConf().getAll()
+def build_session(config_dict):
+    builder = SparkSession.builder
+    for key, val in config_dict.items():
+        builder = builder.config(key, val)
+    spark = builder.getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    return spark
 
-print(json.dumps(dict(conf)))
 
+def read_config(spark):
+    return dict(spark.sparkContext.getConf().getAll())
+
+
+class ConfigAgent:
+    """
+    Garde une SparkSession ouverte : les lectures de configuration sont servies
+    sans relancer de JVM, les mises à jour sont appliquées dans le même interpréteur.
+    """
+
+    def __init__(self, config_dict):
+        self.lock = threading.Lock()
+        self.static = dict(config_dict)
+        self.runtime = {}
+        self.spark = build_session(self.static)
+
+    def get(self):
+        with self.lock:
+            config = read_config(self.spark)
+            config.update(self.runtime)
+            return config
+
+    def set(self, updates):
+        """
+        Les clés modifiables à chaud sont appliquées via spark.conf.set ;
+        les autres nécessitent de recréer la session (même processus).
+        """
+        with self.lock:
+            applied, restarted = [], []
+            for key, val in updates.items():
+                try:
+                    modifiable = self.spark.conf.isModifiable(key)
+                except Exception:
+                    modifiable = False
+                if modifiable:
+                    self.spark.conf.set(key, val)
+                    self.runtime[key] = str(val)
+                    applied.append(key)
+                else:
+                    self.static[key] = str(val)
+                    restarted.append(key)
+            if restarted:
+                self.spark.stop()
+                self.spark = build_session(self.static)
+                for key, val in self.runtime.items():
+                    self.spark.conf.set(key, val)
+            return {"applied": applied, "restarted": restarted}
+
+
+def serve(agent, port=AGENT_PORT):
+    """Protocole : une requête JSON par ligne, une réponse JSON par ligne."""
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    request = json.loads(line)
+                    op = request.get("op")
+                    if op == "get":
+                        response = {"config": agent.get()}
+                    elif op == "set":
+                        response = {"status": "updated", **agent.set(request.get("config", {}))}
+                    elif op == "ping":
+                        response = {"status": "ok"}
+                    else:
+                        response = {"error": f"opération inconnue : {op}"}
+                except Exception as e:
+                    response = {"error": str(e)}
+                self.wfile.write((json.dumps(response) + "\n").encode())
+                self.wfile.flush()
+
+    socketserver.ThreadingTCPServer.allow_reuse_address = True
+    socketserver.ThreadingTCPServer.daemon_threads = True
+    with socketserver.ThreadingTCPServer(("0.0.0.0", port), Handler) as server:
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if "--serve" in args:
+        args.remove("--serve")
+        serve(ConfigAgent(parse_args(args)))
+    else:
+        spark = build_session(parse_args(args))
+        print(json.dumps(read_config(spark)))
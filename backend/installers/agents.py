@@ -0,0 +1,119 @@
+import json
+import os
+import socket
+import threading
+from collections import deque
+from typing import Any, Dict, Optional, Tuple
+
+from .inventory import inventory
+from .readiness import PROBE_HOST, published_port
+from .utils import get_container
+
+# Port de l'agent de configuration résident dans les images Spark et HBase
+AGENT_PORT = "7099/tcp"
+# Adresse de l'hôte sur laquelle le port de l'agent est publié ; doit être joignable
+# depuis BIGDATA_PROBE_HOST (passerelle docker0 quand le backend tourne dans un conteneur)
+AGENT_BIND = os.environ.get("BIGDATA_AGENT_BIND", "127.0.0.1")
+AGENT_TIMEOUT = float(os.environ.get("BIGDATA_AGENT_TIMEOUT", "5"))
+# Connexions inactives conservées par conteneur
+AGENT_POOL_SIZE = 4
+
+
+class AgentUnavailable(RuntimeError):
+    """L'agent n'est pas joignable (conteneur antérieur à l'agent, agent en démarrage...)."""
+
+
+def agent_port_binding() -> Dict[str, Tuple[str, None]]:
+    """Publication du port de l'agent sur un port éphémère de l'hôte."""
+    return {AGENT_PORT: (AGENT_BIND, None)}
+
+
+class _AgentConnection:
+    """Connexion persistante : une requête JSON par ligne, une réponse par ligne."""
+
+    def __init__(self, address: Tuple[str, int]):
+        self.address = address
+        self.sock = socket.create_connection(address, timeout=AGENT_TIMEOUT)
+        self.rfile = self.sock.makefile("rb")
+
+    def request(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        self.sock.sendall((json.dumps(payload) + "\n").encode())
+        line = self.rfile.readline()
+        if not line:
+            raise ConnectionError("connexion fermée par l'agent")
+        return json.loads(line)
+
+    def close(self) -> None:
+        try:
+            self.rfile.close()
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class AgentPool:
+    """Pool de connexions vers les agents de configuration des conteneurs."""
+
+    def __init__(self, size: int = AGENT_POOL_SIZE):
+        self._size = size
+        self._lock = threading.Lock()
+        self._idle: Dict[Tuple[str, int], deque] = {}
+
+    def _address(self, container_name: str) -> Tuple[str, int]:
+        summary = inventory.get_by_name(container_name)
+        bindings = (summary or {}).get("ports", {}).get(AGENT_PORT)
+        if bindings:
+            return PROBE_HOST, int(bindings[0]["HostPort"])
+        # Conteneur pas encore vu par l'inventaire : lecture directe
+        container = get_container(container_name)
+        port = published_port(container, AGENT_PORT) if container is not None else None
+        if port is None:
+            raise AgentUnavailable(f"Aucun agent de configuration publié pour {container_name}.")
+        return PROBE_HOST, port
+
+    def _acquire(self, address: Tuple[str, int]) -> Optional[_AgentConnection]:
+        with self._lock:
+            idle = self._idle.get(address)
+            return idle.popleft() if idle else None
+
+    def _release(self, conn: _AgentConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(conn.address, deque())
+            if len(idle) < self._size:
+                idle.append(conn)
+                return
+        conn.close()
+
+    def request(self, container_name: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Envoie une requête à l'agent du conteneur. Une connexion réutilisée
+        qui s'avère morte est remplacée une fois par une nouvelle.
+        """
+        address = self._address(container_name)
+        conn = self._acquire(address)
+        for attempt in range(2):
+            fresh = conn is None
+            try:
+                if fresh:
+                    conn = _AgentConnection(address)
+                response = conn.request(payload)
+                break
+            except (OSError, ValueError) as e:
+                if conn is not None:
+                    conn.close()
+                conn = None
+                if fresh or attempt == 1:
+                    raise AgentUnavailable(f"Agent de {container_name} injoignable : {e}")
+        self._release(conn)
+        if "error" in response:
+            raise RuntimeError(f"Erreur de l'agent de {container_name} : {response['error']}")
+        return response
+
+    def get_config(self, container_name: str) -> Dict[str, Any]:
+        return self.request(container_name, {"op": "get"})["config"]
+
+    def set_config(self, container_name: str, config: Dict[str, Any]) -> Dict[str, Any]:
+        return self.request(container_name, {"op": "set", "config": config})
+
+
+agent_pool = AgentPool()
@@ -1,12 +1,76 @@
 import abc
+import functools
 from typing import Any, Dict
 
+from .config_cache import config_cache
+from .metrics import timed_phase
+from .profiles import current_resources, docker_limits, resolve_resources
+
+# Méthodes chronométrées (histogramme par outil et par phase, voir GET /metrics)
+TIMED_PHASES = (
+    "check_prerequisites", "install", "test_installation", "rollback", "wait_until_ready",
+    "get_configuration", "restart_with_new_config", "update_config",
+)
+# Méthodes qui changent la configuration du conteneur : le cache de config est invalidé à leur sortie
+CONFIG_CHANGING = ("install", "rollback", "restart_with_new_config", "update_config", "recreate_with_config")
+
+
+def invalidates_config(fn):
+    @functools.wraps(fn)
+    def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return fn(self, *args, **kwargs)
+        finally:
+            if self.config.get("container_name"):
+                config_cache.invalidate(self.config["container_name"])
+
+    return wrapper
+
+
 class BaseInstaller(abc.ABC):
+    # Nom de l'outil dans les métriques ("spark", "hbase", "mongodb")
+    tool_name = "unknown"
+
+    def __init_subclass__(cls, **kwargs: Any):
+        super().__init_subclass__(**kwargs)
+        for name in CONFIG_CHANGING:
+            method = cls.__dict__.get(name)
+            if callable(method):
+                setattr(cls, name, invalidates_config(method))
+        for phase in TIMED_PHASES:
+            method = cls.__dict__.get(phase)
+            if callable(method):
+                setattr(cls, phase, timed_phase(cls.tool_name, phase, method))
+
     def __init__(self, config: Dict[str, Any], progress_callback: callable, logger: Any):
         self.config = config
         self.progress = progress_callback
         self.logger = logger
 
+    def resources(self) -> Dict[str, Any]:
+        """Ressources demandées (profil + champs explicites), voir profiles.py."""
+        return resolve_resources(self.tool_name, self.config)
+
+    def inherit_resources(self, container) -> None:
+        """
+        Reprend dans la config les ressources actuelles du conteneur qui ne sont
+        pas redemandées, pour qu'une recréation ne perde pas ses limites.
+        """
+        requested = self.resources()
+        for field, value in current_resources(container).items():
+            if field not in requested:
+                self.config[field] = value
+
+    def container_options(self, labels: Dict[str, str]) -> Dict[str, Any]:
+        """
+        Options 'docker run' communes : labels de gestion de l'outil, limites
+        CPU/mémoire des ressources demandées, complétés par config["container_options"]
+        (labels supplémentaires, mem_limit du pool...).
+        """
+        options = {**docker_limits(self.resources()), **(self.config.get("container_options") or {})}
+        options["labels"] = {**labels, **options.get("labels", {})}
+        return options
+
     @abc.abstractmethod
     def check_prerequisites(self) -> None:
         pass
@@ -0,0 +1,94 @@
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+from .jobs import engine
+from .progress import ProgressChannel
+from .reconciler import desired_states, reconciler
+
+logger = logging.getLogger("installer_logger")
+
+# Nombre d'installations menées en parallèle par défaut dans un batch
+BATCH_CONCURRENCY = int(os.environ.get("BIGDATA_BATCH_CONCURRENCY", "4"))
+# Plafond accepté pour le paramètre concurrency d'un batch
+BATCH_MAX_CONCURRENCY = int(os.environ.get("BIGDATA_BATCH_MAX_CONCURRENCY", "16"))
+# Attente maximale du conteneur d'un élément occupé par un autre job (secondes)
+BATCH_LOCK_TIMEOUT = float(os.environ.get("BIGDATA_BATCH_LOCK_TIMEOUT", "600"))
+
+ITEM_STARTED = "started"
+ITEM_FAILED = "failed"
+ITEM_ROLLED_BACK = "rolled_back"
+
+
+def run_batch(
+    items: List[Dict[str, Any]],
+    make_installer: Callable[[int, Dict[str, Any]], Any],
+    channel: ProgressChannel,
+    concurrency: int = BATCH_CONCURRENCY,
+    all_or_nothing: bool = False,
+) -> Dict[str, Any]:
+    """
+    Démarre une liste d'outils ({"tool", "config"}) en parallèle.
+
+    Les installations tournent dans un pool dédié au batch et non dans celui
+    du moteur de jobs, et le job du batch est un coordinateur (pool séparé) :
+    aucun worker du moteur n'attend un élément. Chaque élément réserve son
+    conteneur via engine.container_lock, à son tour dans la file des jobs du
+    conteneur, et échoue s'il ne l'obtient pas en BATCH_LOCK_TIMEOUT secondes.
+    Comme pour /start, sa configuration devient l'état souhaité du conteneur,
+    puis il est réconcilié (pool chaud ou installation complète).
+    Avec all_or_nothing, un échec entraîne le rollback des éléments démarrés,
+    dont l'état souhaité est oublié.
+    """
+    results: List[Dict[str, Any]] = [
+        {"tool": item["tool"], "container_name": item["config"]["container_name"]}
+        for item in items
+    ]
+    installers: List[Any] = [None] * len(items)
+
+    def start(index: int) -> None:
+        item, result = items[index], results[index]
+        try:
+            with engine.container_lock(result["container_name"], BATCH_LOCK_TIMEOUT):
+                spec = {k: v for k, v in item["config"].items() if k != "container_name" and v is not None}
+                desired_states.merge(item["tool"], result["container_name"], spec)
+
+                def make(tool: str, config: Dict[str, Any], job: Any = None) -> Any:
+                    installers[index] = make_installer(index, {"tool": tool, "config": config})
+                    return installers[index]
+
+                result.update(reconciler.reconcile(result["container_name"], None, make), status=ITEM_STARTED)
+        except Exception as e:
+            logger.error(f"Batch : échec de {result['tool']} ({result['container_name']}) : {e}")
+            result.update(status=ITEM_FAILED, error=str(e))
+        channel.publish("item", index=index, **result)
+
+    def rollback(index: int) -> None:
+        result = results[index]
+        try:
+            with engine.container_lock(result["container_name"], BATCH_LOCK_TIMEOUT):
+                desired_states.forget(result["container_name"])
+                installers[index].rollback()
+            result["status"] = ITEM_ROLLED_BACK
+        except Exception as e:
+            logger.error(f"Batch : rollback de {result['container_name']} échoué : {e}")
+            result["rollback_error"] = str(e)
+        channel.publish("item", index=index, **result)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="batch") as executor:
+        list(executor.map(start, range(len(items))))
+
+        failed = [r for r in results if r["status"] == ITEM_FAILED]
+        rolled_back = False
+        if failed and all_or_nothing:
+            started = [i for i, r in enumerate(results) if r["status"] == ITEM_STARTED]
+            list(executor.map(rollback, started))
+            rolled_back = True
+
+    return {
+        "status": "rolled_back" if rolled_back else ("partial" if failed else "started"),
+        "started": sum(r["status"] == ITEM_STARTED for r in results),
+        "failed": len(failed),
+        "items": results,
+    }
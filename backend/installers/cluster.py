@@ -0,0 +1,47 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Tuple
+
+from .utils import CLUSTER_LABEL, ROLE_LABEL, list_containers, remove_container
+
+# Créations/suppressions de membres d'un cluster menées en parallèle
+CLUSTER_PARALLELISM = 8
+
+
+def member_name(cluster: str, role: str, index: int) -> str:
+    """Nom d'un membre indexé d'un cluster : <cluster>-<rôle>-<index>."""
+    return f"{cluster}-{role}-{index}"
+
+
+def list_members(cluster: str, role: str) -> Dict[int, Any]:
+    """Membres existants d'un rôle du cluster (arrêtés compris), par index."""
+    members = list_containers({CLUSTER_LABEL: cluster, ROLE_LABEL: role})
+    return {int(c.name.rsplit("-", 1)[1]): c for c in members}
+
+
+def run_parallel(fn: Callable[[Any], Any], items: Iterable[Any]) -> List[Any]:
+    with ThreadPoolExecutor(max_workers=CLUSTER_PARALLELISM) as executor:
+        return list(executor.map(fn, items))
+
+
+def start_members(start: Callable[[int], Tuple[int, str]], indexes: Iterable[int], what: str) -> None:
+    """
+    Lance des membres en parallèle ; start(index) retourne (code, sortie) comme
+    run_container. Lève RuntimeError en listant les membres en échec.
+    """
+    indexes = list(indexes)
+    results = run_parallel(start, indexes)
+    failed = [f"{i} : {output}" for i, (code, output) in zip(indexes, results) if code != 0]
+    if failed:
+        raise RuntimeError(f"Échec du lancement des {what} : " + " ; ".join(failed))
+
+
+def remove_members(containers: Iterable[Any], logger: logging.Logger) -> None:
+    run_parallel(lambda c: remove_container(c.name, logger), containers)
+
+
+def plan_scale(current: Dict[int, Any], count: int) -> Tuple[List[int], List[Any]]:
+    """(index à créer, conteneurs à supprimer) pour passer à 'count' membres d'index 0..count-1."""
+    added = [i for i in range(count) if i not in current]
+    removed = [current[i] for i in sorted(current) if i >= count]
+    return added, removed
@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Tuple
+
+from .events import RECONNECTED_EVENT, event_container_name, watcher
+from .metrics import CONFIG_CACHE_READS
+
+# Durée de validité d'une configuration lue dans un conteneur (secondes, 0 pour désactiver)
+CONFIG_CACHE_TTL = float(os.environ.get("BIGDATA_CONFIG_CACHE_TTL", "30"))
+# Événements Docker après lesquels la configuration d'un conteneur doit être relue
+INVALIDATING_EVENTS = {"start", "restart", "die", "kill", "stop", "update", "rename", "destroy"}
+
+
+def config_etag(config: Any) -> str:
+    """ETag d'une configuration : empreinte de son JSON canonique."""
+    canonical = json.dumps(config, sort_keys=True, default=str)
+    return f'"{hashlib.sha256(canonical.encode()).hexdigest()[:16]}"'
+
+
+class ConfigCache:
+    """
+    Configurations lues dans les conteneurs (docker exec, démarrage d'une JVM
+    pour Spark), gardées CONFIG_CACHE_TTL secondes par conteneur. Les lectures
+    concurrentes d'un même conteneur partagent une seule lecture en cours.
+    Une entrée est invalidée par les changements de configuration des
+    installateurs et par les événements Docker du conteneur (restart, die...) ;
+    une lecture commencée avant l'invalidation n'est pas mise en cache.
+    """
+
+    def __init__(self, ttl: float = CONFIG_CACHE_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (outil, conteneur) -> (configuration, etag, instant de lecture)
+        self._entries: Dict[Tuple[str, str], Tuple[Any, str, float]] = {}
+        self._inflight: Dict[Tuple[str, str], Future] = {}
+        self._generations: Dict[str, int] = {}
+        self._subscribed = False
+
+    def start(self) -> None:
+        """Abonne le cache aux événements Docker."""
+        with self._lock:
+            if self._subscribed:
+                return
+            self._subscribed = True
+        watcher.subscribe(self._on_event)
+        watcher.start()
+
+    def get(self, tool: str, container_name: str, fetch: Callable[[], Any],
+            refresh: bool = False) -> Tuple[Any, str, float]:
+        """
+        Retourne (configuration, etag, âge en secondes). 'fetch' n'est appelé
+        que si l'entrée est absente, expirée ou si refresh est demandé.
+        """
+        key = (tool, container_name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not refresh and time.monotonic() - entry[2] < self.ttl:
+                CONFIG_CACHE_READS.inc(tool=tool, result="hit")
+                return entry[0], entry[1], time.monotonic() - entry[2]
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+                generation = self._generations.get(container_name, 0)
+
+        if not owner:
+            CONFIG_CACHE_READS.inc(tool=tool, result="shared")
+            config, etag, fetched_at = future.result()
+            return config, etag, time.monotonic() - fetched_at
+
+        CONFIG_CACHE_READS.inc(tool=tool, result="miss")
+        try:
+            config = fetch()
+            entry = (config, config_etag(config), time.monotonic())
+            future.set_result(entry)
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                if self._inflight.get(key) is future:
+                    self._inflight.pop(key)
+        with self._lock:
+            if self._generations.get(container_name, 0) == generation and self.ttl > 0:
+                self._entries[key] = entry
+        return config, entry[1], 0.0
+
+    def invalidate(self, container_name: str) -> None:
+        """Oublie la configuration d'un conteneur ; la lecture en cours éventuelle n'est pas réutilisée."""
+        with self._lock:
+            self._generations[container_name] = self._generations.get(container_name, 0) + 1
+            for key in [k for k in self._entries if k[1] == container_name]:
+                self._entries.pop(key)
+            for key in [k for k in self._inflight if k[1] == container_name]:
+                self._inflight.pop(key)
+
+    def clear(self) -> None:
+        with self._lock:
+            for container_name in {k[1] for k in self._entries} | {k[1] for k in self._inflight}:
+                self._generations[container_name] = self._generations.get(container_name, 0) + 1
+            self._entries.clear()
+            self._inflight.clear()
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        # Des événements ont pu être manqués pendant la coupure du flux
+        if event is RECONNECTED_EVENT:
+            self.clear()
+            return
+        if event.get("Action") not in INVALIDATING_EVENTS:
+            return
+        name = event_container_name(event)
+        if name:
+            self.invalidate(name)
+
+
+config_cache = ConfigCache()
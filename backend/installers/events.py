@@ -0,0 +1,81 @@
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from docker.errors import DockerException
+
+from .utils import get_docker_client
+
+logger = logging.getLogger("installer_logger")
+
+# Délai maximal entre deux tentatives de reconnexion au flux d'événements
+RECONNECT_MAX_DELAY = 10.0
+
+# Événement synthétique émis après une reconnexion : des événements ont pu être manqués
+RECONNECTED_EVENT = {"Type": "watcher", "Action": "reconnected"}
+
+
+class DockerEventWatcher:
+    """
+    Abonnement unique au flux d'événements Docker (type=container).
+    Chaque événement est redistribué aux callbacks abonnés, depuis un thread dédié.
+    """
+
+    def __init__(self):
+        self._subscribers: List[Callable[[Dict[str, Any]], None]] = []
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def subscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Dict[str, Any]], None]) -> None:
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def start(self) -> None:
+        """Démarre le thread d'écoute s'il ne tourne pas déjà."""
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="docker-events", daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        delay = 0.5
+        connected_once = False
+        while True:
+            try:
+                stream = get_docker_client().events(decode=True, filters={"type": "container"})
+                delay = 0.5
+                if connected_once:
+                    self._dispatch(RECONNECTED_EVENT)
+                connected_once = True
+                for event in stream:
+                    self._dispatch(event)
+            except DockerException as e:
+                logger.warning(f"Flux d'événements Docker interrompu : {e}")
+            except Exception as e:
+                logger.exception(f"Erreur inattendue dans le flux d'événements Docker : {e}")
+            time.sleep(delay)
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def _dispatch(self, event: Dict[str, Any]) -> None:
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                logger.exception(f"Erreur dans un abonné aux événements Docker : {e}")
+
+
+def event_container_name(event: Dict[str, Any]) -> str:
+    """Nom du conteneur concerné par un événement Docker."""
+    return event.get("Actor", {}).get("Attributes", {}).get("name", "")
+
+
+watcher = DockerEventWatcher()
@@ -1,11 +1,110 @@
 import os
 import platform
-import socket
-import time
 import json
+import queue
 import re
+import shlex
+import threading
 from .base import BaseInstaller
-from .utils import run_command, run_docker_command
+from . import readiness
+from .agents import AgentUnavailable, agent_port_binding, agent_pool
+from .cluster import list_members, member_name, plan_scale, remove_members, start_members
+from .config_cache import config_cache
+from .images import ZOOKEEPER_IMAGE, build_manager, image_manager
+from .ingest import INGEST_BATCH_SIZE, INGEST_PARALLELISM, INGEST_TIMEOUT
+from .profiles import (
+    HBASE_HANDLER_KEY, apply_limits, current_resources, requires_recreate, resource_changes, resource_env,
+)
+from .reload import IN_PLACE, NOOP, RECREATE, RESTART, diff_config, stronger, update_result
+from .ports import port_allocator
+from .utils import (
+    CLUSTER_LABEL, cluster_labels, cluster_network, copy_to_container, create_network, docker_available,
+    exec_in_container, exec_with_input, get_container, managed_labels, remove_container, remove_network,
+    run_container, stop_container,
+)
+from .workloads import WORKLOAD_DIR, last_json_line, parse_pe_output, read_script
+
+# Processus principal du conteneur : HBase standalone (interface master sur 16010)
+HBASE_START_CMD = "hbase master start"
+# Processus des RegionServers du mode distribué
+HBASE_REGIONSERVER_CMD = "hbase regionserver start"
+# Racine HBase du mode distribué : dossier de données partagé par le master et les RegionServers
+HBASE_DISTRIBUTED_ROOTDIR = "file:///opt/hbase-2.1.3/data/hbase"
+# Table de PerformanceEvaluation utilisée par les benchmarks
+HBASE_BENCH_TABLE = "bigdata_bench"
+# Métriques JMX du master (numRegionServers)
+HBASE_MASTER_JMX = "/jmx?qry=Hadoop:service=HBase,name=Master,sub=Server"
+# Table et famille de colonnes d'ingestion par défaut
+HBASE_INGEST_TABLE = "bigdata_ingest"
+HBASE_INGEST_FAMILY = "d"
+# Chargeur JRuby de l'ingestion, déposé dans le conteneur
+HBASE_INGEST_SCRIPT = f"{WORKLOAD_DIR}/bigdata_hbase_ingest.rb"
+
+# Clés rechargeables à chaud par 'update_all_config' (configuration dynamique HBase)
+HBASE_DYNAMIC_KEYS = {
+    "hbase.regionserver.thread.compaction.large",
+    "hbase.regionserver.thread.compaction.small",
+    "hbase.regionserver.thread.split",
+    "hbase.regionserver.throughput.controller",
+    "hbase.hstore.compaction.max.size",
+    "hbase.hstore.compaction.min.size",
+    "hbase.hstore.compaction.min",
+    "hbase.hstore.compaction.max",
+    "hbase.hstore.compaction.ratio",
+    "hbase.hstore.compaction.ratio.offpeak",
+    "hbase.offpeak.start.hour",
+    "hbase.offpeak.end.hour",
+    "hbase.regionserver.optionalcacheflushinterval",
+    "hbase.balancer.period",
+    "hbase.master.balancer.stochastic.maxMovePercent",
+}
+
+
+def start_command(site_config: dict, process: str = HBASE_START_CMD, agent: bool = True) -> list:
+    """
+    Commande du conteneur : écrit les clés données dans hbase-site.xml, puis
+    lance l'agent de configuration (si demandé) et le processus HBase.
+    """
+    config_args = " ".join(shlex.quote(f"{k}={v}") for k, v in site_config.items())
+    serve = "python3 /opt/hbase-2.1.3/get_hbase_config_dynamic.py --serve & " if agent else ""
+    return [
+        "bash", "-c",
+        f"python3 /opt/hbase-2.1.3/get_hbase_config_dynamic.py {config_args} && "
+        f"{{ {serve}exec {process}; }}",
+    ]
+
+
+def baked_site_keys(container) -> set:
+    """
+    Clés hbase-site.xml écrites par la commande du conteneur (start_command) :
+    elles reprennent leur ancienne valeur à chaque redémarrage du conteneur.
+    """
+    cmd = container.attrs.get("Config", {}).get("Cmd") or []
+    if len(cmd) < 3 or cmd[:2] != ["bash", "-c"]:
+        return set()
+    head = cmd[2].split(" && ", 1)[0]
+    try:
+        args = shlex.split(head)[2:]
+    except ValueError:
+        return set()
+    return {arg.split("=", 1)[0] for arg in args if "=" in arg}
+
+
+def distributed_site(zookeeper: str, role: str) -> dict:
+    """hbase-site.xml d'un rôle du mode distribué (ZooKeeper externe, racine partagée)."""
+    site = {
+        "hbase.cluster.distributed": "true",
+        "hbase.zookeeper.quorum": zookeeper,
+        "hbase.zookeeper.property.clientPort": "2181",
+        "hbase.rootdir": HBASE_DISTRIBUTED_ROOTDIR,
+        # Système de fichiers local : pas de hflush/hsync garantis
+        "hbase.unsafe.stream.capability.enforce": "false",
+    }
+    if role == "master":
+        site["hbase.master.info.port"] = "16010"
+    else:
+        site["hbase.regionserver.info.port"] = "16030"
+    return site
 
 
 def extraire_json_sortie(stdout: str):
@@ -18,6 +117,32 @@ def extraire_json_sortie(stdout: str):
     raise ValueError("Aucun bloc JSON valide trouvé dans la sortie.")
 
 
+def tsv_escape(value) -> str:
+    """Cellule du chargeur HBase : JSON pour les objets, \\, tabulation et retour à la ligne échappés."""
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=str)
+    return str(value).replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n")
+
+
+def ingest_lines(batch: list, row_key: str | None, offset: int) -> tuple:
+    """
+    Lignes TSV du chargeur HBase pour un lot : (données, lignes, erreurs).
+    La clé est la colonne row_key, sinon le numéro de ligne dans l'ingestion.
+    """
+    lines, errors = [], []
+    for index, record in enumerate(batch, offset):
+        key = record.get(row_key) if row_key else f"{index:012d}"
+        cells = [
+            f"{tsv_escape(column)}\t{tsv_escape(value)}"
+            for column, value in record.items() if value is not None and column != row_key
+        ]
+        if key is None or not cells:
+            errors.append(f"Ligne {index} ignorée : {'clé absente' if key is None else 'aucune colonne'}")
+            continue
+        lines.append("\t".join([tsv_escape(key)] + cells) + "\n")
+    return "".join(lines).encode(), len(lines), errors
+
+
 def get_volume_path(container_name: str) -> str:
     """
     Retourne le chemin absolu du volume pour Docker, en adaptant le format selon l'OS.
@@ -31,116 +156,259 @@ def get_volume_path(container_name: str) -> str:
 
 
 class HBaseInstaller(BaseInstaller):
+    tool_name = "hbase"
 
     def check_prerequisites(self):
-        code, _ = run_docker_command("--version", self.logger)
-        if code != 0:
+        if not docker_available(self.logger):
             raise RuntimeError("Docker n'est pas installé ou disponible.")
         self.logger.info("Docker est installé.")
         self.progress(10)
 
-    def is_port_in_use(self, port: int) -> bool:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            return s.connect_ex(('localhost', port)) == 0
-
-    def find_available_port(self, start=16010, end=17000) -> int:
-        for port in range(start, end):
-            if not self.is_port_in_use(port):
-                return port
-        raise RuntimeError("Aucun port libre trouvé entre 16010 et 17000.")
-
     def install(self):
+        if self.regionservers():
+            self.install_distributed()
+            return
         container_name = self.config.get("container_name", "hbase_container")
         requested_port_master = self.config.get("master_port", 16010)
         requested_port_rs = self.config.get("regionserver_port", 16020)
         requested_port_zk = self.config.get("zookeeper_port", 2181)
 
-        # Vérification des ports et recherche d'alternatives si occupés
-        if self.is_port_in_use(requested_port_master):
-            self.logger.warning(f"Port master {requested_port_master} occupé, recherche d’un autre...")
-            requested_port_master = self.find_available_port()
-            self.config["master_port"] = requested_port_master
-        if self.is_port_in_use(requested_port_rs):
-            self.logger.warning(f"Port regionserver {requested_port_rs} occupé, recherche d’un autre...")
-            requested_port_rs = self.find_available_port(start=16020)
-            self.config["regionserver_port"] = requested_port_rs
-        if self.is_port_in_use(requested_port_zk):
-            self.logger.warning(f"Port zookeeper {requested_port_zk} occupé, recherche d’un autre...")
-            requested_port_zk = self.find_available_port(start=2181, end=2300)
-            self.config["zookeeper_port"] = requested_port_zk
-
-        image_name = "custom-hbase-image"
-        dockerfile_path = "./backend/docker/hbase"
+        # Attribution des trois ports en une seule opération (alternatives si occupés)
+        requested = (requested_port_master, requested_port_rs, requested_port_zk)
+        allocated = port_allocator.allocate(container_name, [
+            (requested_port_master, 16010, 17000),
+            (requested_port_rs, 16020, 17000),
+            (requested_port_zk, 2181, 2300),
+        ])
+        if tuple(allocated) != requested:
+            self.logger.warning(f"Ports {requested} partiellement occupés, ports {tuple(allocated)} attribués.")
+        requested_port_master, requested_port_rs, requested_port_zk = allocated
+        self.config["master_port"] = requested_port_master
+        self.config["regionserver_port"] = requested_port_rs
+        self.config["zookeeper_port"] = requested_port_zk
+
         volume_path = get_volume_path(container_name)
 
-        self.logger.info("Construction de l'image Docker HBase...")
-        build_cmd = f"docker build -t {image_name} {dockerfile_path}"
-        code, output = run_command(build_cmd, self.logger)
-        if code != 0:
-            raise RuntimeError(f"Échec du build Docker : {output}")
+        self.logger.info("Préparation de l'image Docker HBase...")
+        image_name = build_manager.ensure_tool_image("hbase", self.logger)
 
+        resources = self.resources()
+        site_config = self.site_resources()
         self.logger.info("Lancement du conteneur HBase...")
-        run_cmd_str = (
-            f"run -d "
-            f"--name {container_name} "
-            f"--label myapp=mon_interface "
-            f"--label created_by=mon_app "
-            f"-p {requested_port_master}:16010 "
-            f"-p {requested_port_rs}:16020 "
-            f"-p {requested_port_zk}:2181 "
-            f"-v {volume_path}:/opt/hbase-2.1.3/data "
-            f"{image_name}"
+        code, output = run_container(
+            image_name,
+            self.logger,
+            name=container_name,
+            **self.container_options(managed_labels("hbase")),
+            environment=resource_env(resources),
+            # Sans réglage à écrire dans hbase-site.xml, la commande de l'image suffit
+            command=start_command(site_config) if site_config else None,
+            ports={
+                "16010/tcp": requested_port_master,
+                "16020/tcp": requested_port_rs,
+                "2181/tcp": requested_port_zk,
+                **agent_port_binding(),
+            },
+            volumes={volume_path: {"bind": "/opt/hbase-2.1.3/data", "mode": "rw"}},
         )
-        code, output = run_docker_command(run_cmd_str, self.logger)
         if code != 0:
+            port_allocator.release(container_name)
             raise RuntimeError(f"Erreur lancement conteneur : {output}")
 
         self.logger.info(f"Conteneur HBase démarré sur les ports: master={requested_port_master}, rs={requested_port_rs}, zk={requested_port_zk}.")
         self.progress(100)
 
+    # ------------------- MODE DISTRIBUÉ -------------------
+
+    def regionservers(self) -> int:
+        return int(self.config.get("regionservers") or 0)
+
+    def zookeeper_name(self) -> str:
+        return f"{self.config.get('container_name', 'hbase_container')}-zookeeper"
+
+    def master_options(self, container_name: str):
+        """
+        (labels, options docker run, clés hbase-site.xml) du master. En mode
+        distribué, il rejoint le réseau du cluster et utilise le ZooKeeper externe.
+        """
+        if not self.regionservers() and not self.config.get("cluster"):
+            return managed_labels("hbase"), {}, {}
+        network = cluster_network(container_name)
+        create_network(network, managed_labels("hbase"), self.logger)
+        options = {"network": network, "hostname": container_name}
+        site = distributed_site(self.zookeeper_name(), "master")
+        return cluster_labels("hbase", container_name, "master"), options, site
+
+    def install_distributed(self):
+        """ZooKeeper, HMaster et N RegionServers dans des conteneurs séparés, sur un réseau dédié."""
+        container_name = self.config.get("container_name", "hbase_container")
+        requested = (self.config.get("master_port", 16010), self.config.get("zookeeper_port", 2181))
+        master_port, zk_port = port_allocator.allocate(container_name, [
+            (requested[0], 16010, 17000),
+            (requested[1], 2181, 2300),
+        ])
+        if (master_port, zk_port) != requested:
+            self.logger.warning(f"Ports {requested} partiellement occupés, ports {(master_port, zk_port)} attribués.")
+        self.config["master_port"] = master_port
+        self.config["zookeeper_port"] = zk_port
+
+        volume_path = get_volume_path(container_name)
+        self.logger.info("Préparation des images HBase et ZooKeeper...")
+        image_name = build_manager.ensure_tool_image("hbase", self.logger)
+        zk_image = image_manager.ensure(ZOOKEEPER_IMAGE, self.logger)
+        self.progress(40)
+
+        labels, options, site = self.master_options(container_name)
+        try:
+            self.logger.info("Lancement de ZooKeeper...")
+            code, output = run_container(
+                zk_image,
+                self.logger,
+                name=self.zookeeper_name(),
+                **{**options, "hostname": self.zookeeper_name()},
+                labels=cluster_labels("hbase", container_name, "zookeeper"),
+                ports={"2181/tcp": zk_port},
+            )
+            if code != 0:
+                raise RuntimeError(f"Erreur lancement ZooKeeper : {output}")
+
+            self.logger.info("Lancement du HMaster...")
+            code, output = run_container(
+                image_name,
+                self.logger,
+                name=container_name,
+                **self.container_options(labels),
+                **options,
+                environment=resource_env(self.resources()),
+                command=start_command({**site, **self.site_resources()}),
+                ports={"16010/tcp": master_port, **agent_port_binding()},
+                volumes={volume_path: {"bind": "/opt/hbase-2.1.3/data", "mode": "rw"}},
+            )
+            if code != 0:
+                raise RuntimeError(f"Erreur lancement HMaster : {output}")
+            self.progress(70)
+
+            self.start_regionservers(image_name, range(self.regionservers()))
+        except Exception:
+            # Pas de cluster partiel : le groupe entier (réseau et bail de ports compris) est supprimé
+            self.rollback()
+            raise
+
+        self.logger.info(
+            f"HBase distribué démarré : master={master_port}, zk={zk_port}, "
+            f"{self.regionservers()} RegionServer(s)."
+        )
+        self.progress(100)
+
+    def list_regionservers(self) -> dict:
+        return list_members(self.config.get("container_name", "hbase_container"), "regionserver")
+
+    def start_regionservers(self, image_name: str, indexes) -> None:
+        """Lance des RegionServers (en parallèle), avec leur propre hbase-site.xml, sans agent."""
+        container_name = self.config.get("container_name", "hbase_container")
+        volume_path = get_volume_path(container_name)
+        site = {**distributed_site(self.zookeeper_name(), "regionserver"), **self.site_resources()}
+
+        def start(index: int):
+            name = member_name(container_name, "regionserver", index)
+            return run_container(
+                image_name,
+                self.logger,
+                name=name,
+                hostname=name,
+                network=cluster_network(container_name),
+                **self.container_options(cluster_labels("hbase", container_name, "regionserver")),
+                environment=resource_env(self.resources()),
+                command=start_command(site, HBASE_REGIONSERVER_CMD, agent=False),
+                volumes={volume_path: {"bind": "/opt/hbase-2.1.3/data", "mode": "rw"}},
+            )
+
+        indexes = list(indexes)
+        start_members(start, indexes, "RegionServers HBase")
+        self.logger.info(f"{len(indexes)} RegionServer(s) HBase lancé(s).")
+
+    def scale(self, regionservers: int) -> dict:
+        """
+        Ajuste le nombre de RegionServers ; attend que le master en compte
+        exactement 'regionservers' en ligne.
+        """
+        container_name = self.config.get("container_name", "hbase_container")
+        master = get_container(container_name)
+        if master is None or master.labels.get(CLUSTER_LABEL) != container_name:
+            raise RuntimeError(f"{container_name} n'est pas le master d'un cluster HBase.")
+
+        added, removed = plan_scale(self.list_regionservers(), regionservers)
+        if added:
+            self.start_regionservers(master.image.id, added)
+        if removed:
+            remove_members(removed, self.logger)
+        self.config["regionservers"] = regionservers
+        self.wait_for_regionservers(container_name, regionservers, exact=True)
+        return {
+            "regionservers": regionservers,
+            "added": [member_name(container_name, "regionserver", i) for i in added],
+            "removed": [c.name for c in removed],
+        }
+
+    def wait_for_regionservers(self, container_name: str, count: int, exact: bool = False,
+                               timeout: int = 180) -> None:
+        """Attend que le master compte 'count' RegionServers en ligne (JMX numRegionServers)."""
+        self.logger.info(f"Attente de {count} RegionServer(s) en ligne...")
+
+        def online(jmx) -> bool:
+            servers = jmx["beans"][0]["numRegionServers"]
+            return servers == count if exact else servers >= count
+
+        readiness.wait_until_ready(
+            container_name, readiness.http_json_probe("16010/tcp", HBASE_MASTER_JMX, online), timeout
+        )
+
     def test_installation(self) -> bool:
         container_name = self.config.get("container_name", "hbase_container")
         self.logger.info(f"Vérification du conteneur HBase : {container_name}")
-        code, output = run_docker_command(
-            f'ps --filter "name={container_name}" --filter "status=running"',
-            self.logger
-        )
-        return code == 0 and container_name in output
+        try:
+            self.wait_until_ready(container_name)
+            return True
+        except RuntimeError as e:
+            self.logger.warning(str(e))
+            return False
 
     def rollback(self):
         container_name = self.config.get("container_name", "hbase_container")
         self.logger.info(f"Rollback : suppression de {container_name}")
-        run_docker_command(f"rm -f {container_name}", self.logger)
+        remove_members(self.list_regionservers().values(), self.logger)
+        remove_container(container_name, self.logger)
+        remove_container(self.zookeeper_name(), self.logger)
+        remove_network(cluster_network(container_name), self.logger)
+        port_allocator.release(container_name)
 
     def wait_for_removal(self, container_name: str, timeout: int = 10):
-        for _ in range(timeout * 2):
-            code, output = run_docker_command(
-                f"ps -a --filter name={container_name} --format '{{{{.ID}}}}'", self.logger
-            )
-            if code == 0 and not output.strip():
-                return
-            time.sleep(0.5)
-        raise RuntimeError(f"{container_name} non supprimé après {timeout} secondes.")
+        readiness.wait_for_removal(container_name, timeout)
 
-    def wait_until_ready(self, container_name: str, timeout: int = 20):
+    def wait_until_ready(self, container_name: str, timeout: int = 60):
         self.logger.info(f"Attente que {container_name} soit prêt...")
-        for _ in range(timeout * 2):
-            code, _ = run_docker_command(
-                f"exec {container_name} ls /opt/hbase-2.1.3", self.logger
-            )
-            if code == 0:
-                return
-            time.sleep(0.5)
-        raise RuntimeError(f"{container_name} non prêt après {timeout} secondes.")
+        readiness.wait_until_ready(container_name, readiness.http_probe("16010/tcp"), timeout)
+        if self.regionservers():
+            self.wait_for_regionservers(container_name, self.regionservers())
+
+    def site_resources(self) -> dict:
+        """Réglages de ressources portés par hbase-site.xml (nombre de handlers du RegionServer)."""
+        handlers = self.resources().get("hbase_handler_count")
+        return {HBASE_HANDLER_KEY: handlers} if handlers is not None else {}
 
     def get_configuration(self):
         container_name = self.config.get("container_name", "hbase_container")
-        docker_cmd = (
-            f'exec {container_name} bash -c '
-            f'"HOME=/home/hbaseuser python3 /opt/hbase-2.1.3/get_hbase_config_dynamic.py"'
-        )
         self.logger.info("Extraction configuration HBase...")
-        code, output = run_docker_command(docker_cmd, self.logger)
+        try:
+            return agent_pool.get_config(container_name)
+        except AgentUnavailable as e:
+            self.logger.info(f"{e} Lecture via docker exec.")
+        code, output = exec_in_container(
+            container_name,
+            ["python3", "/opt/hbase-2.1.3/get_hbase_config_dynamic.py"],
+            self.logger,
+            environment={"HOME": "/home/hbaseuser"},
+        )
         if code != 0:
             raise RuntimeError("Erreur lors de la récupération de la configuration.")
         try:
@@ -149,36 +417,252 @@ class HBaseInstaller(BaseInstaller):
             self.logger.error(f"Erreur JSON : {e} — Sortie brute : {output}")
             raise RuntimeError("Impossible d'analyser la configuration JSON.")
 
-    def restart_with_new_config(self, new_config: dict):
+    def config_drift(self, container, config: dict, applied: dict) -> dict:
+        """
+        Clés de 'config' (et des réglages de ressources de hbase-site.xml) qui
+        diffèrent de la configuration HBase courante (lue via le cache).
+        """
+        current, _, _ = config_cache.get("hbase", container.name, self.get_configuration)
+        return diff_config(current, {**config, **self.site_resources()})
+
+    def config_snapshot(self) -> dict:
+        """Configuration mesurée par un benchmark : hbase-site.xml, ressources et RegionServers."""
+        container_name = self.config.get("container_name", "hbase_container")
+        container = get_container(container_name)
+        if container is None:
+            raise RuntimeError(f"Conteneur {container_name} introuvable.")
+        return {
+            "config": self.get_configuration(),
+            "resources": current_resources(container),
+            "regionservers": len(self.list_regionservers()),
+        }
+
+    def benchmark(self, workload: str, params: dict) -> dict:
+        """
+        PerformanceEvaluation (hbase pe, sans MapReduce) : chaque test de
+        params["tests"] est lancé sur la table bigdata_bench, supprimée à la fin.
+        """
+        container_name = self.config.get("container_name", "hbase_container")
+        phases = {}
+        try:
+            for test in params["tests"].split(","):
+                self.logger.info(f"PerformanceEvaluation {test} ({params['rows']} lignes)...")
+                code, output = exec_in_container(
+                    container_name,
+                    ["hbase", "pe", "--nomapred", f"--rows={params['rows']}",
+                     f"--valueSize={params['value_size']}", f"--table={HBASE_BENCH_TABLE}",
+                     test, str(params["clients"])],
+                    self.logger,
+                    environment={"HOME": "/home/hbaseuser"},
+                )
+                if code != 0:
+                    raise RuntimeError(f"PerformanceEvaluation {test} échoué : {output[-1000:]}")
+                phases[test] = parse_pe_output(output)
+        finally:
+            exec_in_container(
+                container_name,
+                ["bash", "-c", f"echo \"disable '{HBASE_BENCH_TABLE}'; drop '{HBASE_BENCH_TABLE}'\" | hbase shell -n"],
+                self.logger,
+            )
+        return phases
+
+    def ingest(self, stream, options: dict) -> dict:
+        """
+        Écrit le flux dans une table HBase (créée si besoin) par lots de Puts :
+        'parallelism' chargeurs JRuby (hbase shell, une seule JVM chacun)
+        reçoivent les lots à tour de rôle sur leur entrée standard.
+        """
+        container_name = self.config.get("container_name", "hbase_container")
+        table = options.get("target") or HBASE_INGEST_TABLE
+        family = options.get("family") or HBASE_INGEST_FAMILY
+        if not re.fullmatch(r"[\w.-]+(:[\w.-]+)?", table) or not re.fullmatch(r"[\w.-]+", family):
+            raise RuntimeError(f"Table ou famille de colonnes invalide : {table} / {family}")
+        code, output = exec_in_container(
+            container_name, ["bash", "-c", f"echo \"create '{table}', '{family}'\" | hbase shell -n"], self.logger
+        )
+        if code != 0 and "TableExistsException" not in output:
+            raise RuntimeError(f"Création de la table {table} échouée : {output[-1000:]}")
+        code, output = copy_to_container(
+            container_name, WORKLOAD_DIR, os.path.basename(HBASE_INGEST_SCRIPT), read_script("hbase_ingest.rb"), self.logger
+        )
+        if code != 0:
+            raise RuntimeError(f"Copie du chargeur HBase échouée : {output}")
+
+        parallelism = options.get("parallelism") or INGEST_PARALLELISM
+        environment = {
+            "HOME": "/home/hbaseuser",
+            "BIGDATA_INGEST_TABLE": table,
+            "BIGDATA_INGEST_FAMILY": family,
+            "BIGDATA_INGEST_BATCH": str(options.get("batch_size") or INGEST_BATCH_SIZE),
+        }
+        feeds = [queue.Queue(maxsize=2) for _ in range(parallelism)]
+        results = [(1, "Chargeur non terminé")] * parallelism
+
+        def feed(index: int):
+            while True:
+                data = feeds[index].get()
+                if data is None:
+                    return
+                yield data
+
+        def load(index: int):
+            results[index] = exec_with_input(
+                container_name, ["hbase", "shell", "-n", HBASE_INGEST_SCRIPT], feed(index), self.logger,
+                environment=environment,
+            )
+
+        def send(index: int, data) -> None:
+            # Un chargeur arrêté ne lit plus son entrée : l'attendre bloquerait l'ingestion
+            while loaders[index].is_alive():
+                try:
+                    feeds[index].put(data, timeout=1)
+                    return
+                except queue.Full:
+                    continue
+            if data is not None:
+                raise RuntimeError(f"Chargeur HBase {index} arrêté : {results[index][1][-1000:]}")
+
+        loaders = [
+            threading.Thread(target=load, args=(i,), name=f"hbase-ingest-{container_name}-{i}", daemon=True)
+            for i in range(parallelism)
+        ]
+        for loader in loaders:
+            loader.start()
+        offset = 0
+        try:
+            for number, batch in enumerate(stream.batches(options)):
+                data, count, errors = ingest_lines(batch, options.get("row_key"), offset)
+                offset += len(batch)
+                if count:
+                    send(number % parallelism, data)
+                stream.stats.add_rows(count, errors)
+        finally:
+            for index in range(parallelism):
+                send(index, None)
+            for loader in loaders:
+                loader.join(INGEST_TIMEOUT)
+
+        written = 0
+        for index, (code, output) in enumerate(results):
+            if code != 0:
+                raise RuntimeError(f"Chargeur HBase {index} échoué : {output[-1000:]}")
+            written += last_json_line(output)["rows"]
+        return {"table": table, "family": family, "written": written}
+
+    def restart_with_new_config(self, new_config: dict) -> dict:
+        """
+        Applique une nouvelle configuration avec la stratégie la moins coûteuse :
+        rien si elle est identique ; sinon hbase-site.xml est réécrit dans le
+        conteneur (save_config), puis rechargé à chaud (update_all_config) si
+        toutes les clés le permettent, ou le conteneur est redémarré sans être
+        recréé. Il n'est recréé que si le port master ou le heap (HBASE_HEAPSIZE)
+        change, ou si une clé modifiée est écrite par la commande du conteneur
+        (start_command), qui la rétablirait au redémarrage ; les limites
+        CPU/mémoire sont appliquées à chaud (docker update).
+        En mode distribué, hbase-site.xml est aussi réécrit sur chaque RegionServer,
+        redémarrés avec le master si nécessaire.
+        """
+        container_name = self.config.get("container_name", "hbase_container")
+        master_port = self.config.get("master_port")
+        new_config = {**new_config, **self.site_resources()}
+
+        container = get_container(container_name)
+        resources = resource_changes(container, self.resources()) if container is not None else {}
+        if container is None or requires_recreate(resources) or (
+            master_port and readiness.published_port(container, "16010/tcp") != master_port
+        ):
+            self.recreate_with_config(new_config)
+            return update_result(RECREATE, {**new_config, **resources})
+
+        strategy = IN_PLACE if apply_limits(container, resources) else NOOP
+        changes = diff_config(self.get_configuration(), new_config)
+        if not changes:
+            if strategy == NOOP:
+                self.logger.info("Configuration HBase inchangée, aucun redémarrage.")
+            return update_result(strategy, resources)
+
+        # Une clé figée dans la commande du master serait rétablie au prochain redémarrage
+        baked = baked_site_keys(container) & set(changes)
+        if baked:
+            self.logger.info(f"Clés écrites par la commande du conteneur : {sorted(baked)}, recréation.")
+            self.recreate_with_config(new_config)
+            return update_result(RECREATE, {**changes, **resources})
+
+        self.save_configuration(container_name, changes)
+        regionservers = list(self.list_regionservers().values())
+        for regionserver in regionservers:
+            self.save_configuration(regionserver.name, changes)
+
+        if all(k in HBASE_DYNAMIC_KEYS for k in changes):
+            code, output = exec_in_container(
+                container_name, ["bash", "-c", "echo update_all_config | hbase shell -n"], self.logger
+            )
+            if code == 0:
+                self.logger.info(f"Configuration HBase rechargée à chaud : {sorted(changes)}")
+                return update_result(stronger(strategy, IN_PLACE), {**changes, **resources})
+            self.logger.warning(f"Rechargement à chaud impossible : {output}")
+
+        self.logger.info("Redémarrage du processus HBase (conteneur conservé)...")
+        container.restart()
+        for regionserver in regionservers:
+            regionserver.restart()
+        self.config["regionservers"] = len(regionservers)
+        self.wait_until_ready(container_name)
+        return update_result(RESTART, {**changes, **resources})
+
+    def save_configuration(self, container_name: str, changes: dict):
+        """Réécrit hbase-site.xml dans le conteneur, via l'agent ou le script en CLI."""
+        try:
+            agent_pool.set_config(container_name, changes)
+            return
+        except AgentUnavailable as e:
+            self.logger.info(f"{e} Écriture via docker exec.")
+        args = [f"{k}={v}" for k, v in changes.items()]
+        code, output = exec_in_container(
+            container_name,
+            ["python3", "/opt/hbase-2.1.3/get_hbase_config_dynamic.py", *args],
+            self.logger,
+        )
+        if code != 0:
+            raise RuntimeError(f"Écriture de hbase-site.xml échouée : {output}")
+
+    def recreate_with_config(self, new_config: dict):
         container_name = self.config.get("container_name", "hbase_container")
         master_port = self.config.get("master_port", 16010)
         regionserver_port = self.config.get("regionserver_port", 16020)
         zk_port = self.config.get("zookeeper_port", 2181)
-        image_name = "custom-hbase-image"
+        image_name = build_manager.ensure_tool_image("hbase", self.logger)
         volume_path = get_volume_path(container_name)
 
+        current = get_container(container_name)
+        if current is not None:
+            self.inherit_resources(current)
+            # Un master de cluster reste dans son cluster (réseau, ZooKeeper, RegionServers)
+            self.config["cluster"] = current.labels.get(CLUSTER_LABEL) == container_name
+        ports = {"16010/tcp": master_port, **agent_port_binding()}
+        if self.config.get("cluster"):
+            self.config["regionservers"] = len(self.list_regionservers())
+        else:
+            ports.update({"16020/tcp": regionserver_port, "2181/tcp": zk_port})
+        labels, options, site = self.master_options(container_name)
+
         self.logger.info("Redémarrage du conteneur HBase...")
 
-        run_docker_command(f"stop {container_name}", self.logger)
-        run_docker_command(f"rm {container_name}", self.logger)
+        stop_container(container_name, self.logger)
+        remove_container(container_name, self.logger)
         self.wait_for_removal(container_name)
 
-        # Construire la chaîne d'arguments pour le script Python
-        config_args = " ".join([f"{k}={v}" for k, v in new_config.items()])
-
-        run_cmd_str = (
-            f'run -d '
-            f'--name {container_name} '
-            f'--label myapp=mon_interface '
-            f'-p {master_port}:16010 '
-            f'-p {regionserver_port}:16020 '
-            f'-p {zk_port}:2181 '
-            f'-v {volume_path}:/opt/hbase-2.1.3/data '
-            f'{image_name} '
-            f'bash -c "HOME=/home/hbaseuser python3 /opt/hbase-2.1.3/get_hbase_config_dynamic.py {config_args} && tail -f /dev/null"'
+        code, output = run_container(
+            image_name,
+            self.logger,
+            name=container_name,
+            **self.container_options(labels),
+            **options,
+            environment={"HOME": "/home/hbaseuser", **resource_env(self.resources())},
+            ports=ports,
+            volumes={volume_path: {"bind": "/opt/hbase-2.1.3/data", "mode": "rw"}},
+            command=start_command({**new_config, **site, **self.site_resources()}),
         )
-
-        code, output = run_docker_command(run_cmd_str, self.logger)
         if code != 0:
             raise RuntimeError("Redémarrage échoué : " + output)
 
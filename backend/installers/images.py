@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict
+
+from docker.utils import parse_repository_tag
+
+from .utils import build_image, get_docker_client, image_exists, load_image, pull_image
+
+# Contextes de build des images personnalisées : outil -> (nom d'image, dossier)
+BUILD_CONTEXTS = {
+    "spark": ("custom-spark-image", "./backend/docker/spark"),
+    "hbase": ("custom-hbase-image", "./backend/docker/hbase"),
+}
+
+# Construire les images au démarrage de l'application
+PREWARM_IMAGES = os.environ.get("BIGDATA_PREWARM_IMAGES", "0") == "1"
+
+# Image MongoDB épinglée (tag de version ou 'mongo@sha256:...')
+MONGO_IMAGE = os.environ.get("BIGDATA_MONGO_IMAGE", "mongo:7.0")
+# Image ZooKeeper du mode HBase distribué (HBase 2.1 est compatible ZooKeeper 3.4)
+ZOOKEEPER_IMAGE = os.environ.get("BIGDATA_ZOOKEEPER_IMAGE", "zookeeper:3.4")
+# Télécharger les images officielles en arrière-plan au démarrage de l'application
+PREPULL_IMAGES = os.environ.get("BIGDATA_PREPULL_IMAGES", "1") == "1"
+# Miroir de registre local (ex. 'localhost:5000') essayé avant le registre public
+REGISTRY_MIRROR = os.environ.get("BIGDATA_REGISTRY_MIRROR", "")
+# Dossier d'archives 'docker save' importées avant tout téléchargement (mode hors ligne)
+IMAGE_TARBALL_DIR = os.environ.get("BIGDATA_IMAGE_TARBALL_DIR", "")
+
+
+def context_digest(path: str) -> str:
+    """
+    Empreinte SHA-256 d'un contexte de build : Dockerfile, scripts
+    get_*_config*.py, hbase-site.xml... (chemins relatifs + contenus).
+    """
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(path):
+        dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+        for filename in sorted(files):
+            full_path = os.path.join(root, filename)
+            digest.update(os.path.relpath(full_path, path).replace(os.sep, "/").encode())
+            digest.update(b"\0")
+            with open(full_path, "rb") as f:
+                for block in iter(lambda: f.read(65536), b""):
+                    digest.update(block)
+            digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def context_tag(image_name: str, path: str) -> str:
+    """Référence 'image:empreinte' de la version actuelle d'un contexte de build."""
+    return f"{image_name}:{context_digest(path)[:12]}"
+
+
+class _SingleFlight:
+    """Fusionne les appels concurrents portant sur une même clé : un seul s'exécute, les autres attendent son résultat."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+
+    def run(self, key: str, fn: Callable[[], str], logger: logging.Logger, waiting: str) -> str:
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            logger.info(waiting)
+            return future.result()
+
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+class BuildManager:
+    """
+    Construit les images personnalisées une seule fois par version du contexte :
+    l'image est taguée par l'empreinte du contexte, le build est sauté si ce
+    tag existe déjà et les démarrages concurrents attendent le même build.
+    """
+
+    def __init__(self):
+        self._flights = _SingleFlight()
+
+    def ensure_image(self, image_name: str, path: str, logger: logging.Logger) -> str:
+        """Retourne la référence 'image:empreinte', en la construisant si nécessaire."""
+        tag = context_tag(image_name, path)
+        if image_exists(tag):
+            logger.info(f"Image {tag} déjà construite, build ignoré.")
+            return tag
+
+        def build() -> str:
+            logger.info(f"Construction de l'image {tag}...")
+            code, output = build_image(path, tag, logger)
+            if code != 0:
+                raise RuntimeError(f"Échec du build Docker : {output}")
+            # Garder 'image:latest' aligné sur le dernier contexte construit
+            get_docker_client().images.get(tag).tag(image_name, "latest")
+            return tag
+
+        return self._flights.run(tag, build, logger, f"Build de {tag} déjà en cours, attente...")
+
+    def ensure_tool_image(self, tool: str, logger: logging.Logger) -> str:
+        image_name, path = BUILD_CONTEXTS[tool]
+        return self.ensure_image(image_name, path, logger)
+
+
+def tarball_path(reference: str) -> str | None:
+    """Archive 'docker save' attendue pour une référence (mongo:7.0 -> mongo_7.0.tar)."""
+    if not IMAGE_TARBALL_DIR:
+        return None
+    filename = reference.replace("/", "_").replace(":", "_").replace("@", "_") + ".tar"
+    return os.path.join(IMAGE_TARBALL_DIR, filename)
+
+
+class ImageManager:
+    """
+    Fournit les images officielles (MongoDB) sans aller au registre à chaque
+    démarrage : la référence épinglée est résolue une fois en identifiant
+    d'image, le store local est consulté avant tout pull, les pulls concurrents
+    d'une même référence sont fusionnés, et une archive locale ou un miroir de
+    registre sont essayés avant le registre public.
+    """
+
+    def __init__(self):
+        self._flights = _SingleFlight()
+        self._lock = threading.Lock()
+        self._resolved: Dict[str, str] = {}
+
+    def resolved(self, reference: str) -> str | None:
+        with self._lock:
+            return self._resolved.get(reference)
+
+    def ensure(self, reference: str, logger: logging.Logger) -> str:
+        """Retourne l'identifiant (sha256:...) de l'image, en l'important si nécessaire."""
+        image_id = self.resolved(reference)
+        if image_id and image_exists(image_id):
+            return image_id
+        if image_exists(reference):
+            return self._resolve(reference, logger)
+        return self._flights.run(
+            reference,
+            lambda: self._fetch(reference, logger),
+            logger,
+            f"Téléchargement de {reference} déjà en cours, attente...",
+        )
+
+    def _resolve(self, reference: str, logger: logging.Logger) -> str:
+        image = get_docker_client().images.get(reference)
+        digests = image.attrs.get("RepoDigests") or []
+        logger.info(f"Image {reference} résolue : {digests[0] if digests else image.id}")
+        with self._lock:
+            self._resolved[reference] = image.id
+        return image.id
+
+    def _fetch(self, reference: str, logger: logging.Logger) -> str:
+        repository, tag = parse_repository_tag(reference)
+        tag = tag or "latest"
+
+        archive = tarball_path(reference)
+        if archive and os.path.exists(archive):
+            logger.info(f"Import de {reference} depuis {archive}...")
+            code, output = load_image(archive, logger)
+            if code == 0 and image_exists(reference):
+                return self._resolve(reference, logger)
+            logger.warning(f"{archive} ne contient pas {reference} : {output}")
+
+        if REGISTRY_MIRROR:
+            mirror = f"{REGISTRY_MIRROR.rstrip('/')}/{repository}"
+            logger.info(f"Téléchargement de {reference} depuis le miroir {REGISTRY_MIRROR}...")
+            code, output = pull_image(mirror, tag, logger)
+            if code == 0:
+                # Les références par empreinte ne peuvent pas être re-taguées
+                if not tag.startswith("sha256:"):
+                    get_docker_client().images.get(output).tag(repository, tag)
+                    return self._resolve(reference, logger)
+                with self._lock:
+                    self._resolved[reference] = output
+                return output
+
+        logger.info(f"Téléchargement de {reference}...")
+        code, output = pull_image(repository, tag, logger)
+        if code != 0:
+            raise RuntimeError(f"Échec du téléchargement de l'image {reference} : {output}")
+        return self._resolve(reference, logger)
+
+
+build_manager = BuildManager()
+image_manager = ImageManager()
+
+
+def expected_image(tool: str, reference: str | None = None) -> str:
+    """
+    Image attendue d'un conteneur : tag du contexte de build actuel pour Spark
+    et HBase, référence demandée (ou épinglée) pour MongoDB.
+    """
+    if tool in BUILD_CONTEXTS:
+        return context_tag(*BUILD_CONTEXTS[tool])
+    return reference or MONGO_IMAGE
+
+
+def image_matches(container, reference: str) -> bool:
+    """Le conteneur tourne-t-il sur 'reference' (tag, identifiant ou référence déjà résolue) ?"""
+    image = container.image
+    if reference in (image.tags or []) or reference == image.id:
+        return True
+    resolved = image_manager.resolved(reference)
+    if resolved is None and image_exists(reference):
+        resolved = get_docker_client().images.get(reference).id
+    return resolved == image.id
@@ -0,0 +1,338 @@
+import codecs
+import csv
+import json
+import logging
+import os
+import queue
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from .metrics import INGEST_BYTES, INGEST_ROWS
+
+logger = logging.getLogger("installer_logger")
+
+# Lignes par lot écrit (insertMany MongoDB, Puts HBase)
+INGEST_BATCH_SIZE = int(os.environ.get("BIGDATA_INGEST_BATCH_SIZE", "1000"))
+# Lots écrits en parallèle par défaut, et au plus
+INGEST_PARALLELISM = int(os.environ.get("BIGDATA_INGEST_PARALLELISM", "4"))
+INGEST_MAX_PARALLELISM = int(os.environ.get("BIGDATA_INGEST_MAX_PARALLELISM", "16"))
+# Morceaux du corps de la requête en attente d'écriture : au-delà, l'envoi du client est ralenti
+INGEST_QUEUE_CHUNKS = int(os.environ.get("BIGDATA_INGEST_QUEUE_CHUNKS", "16"))
+# Intervalle des rapports de débit sur le canal du job (secondes)
+INGEST_REPORT_INTERVAL = float(os.environ.get("BIGDATA_INGEST_REPORT_INTERVAL", "2"))
+# Attente maximale d'un morceau côté envoi ou côté écriture (secondes)
+INGEST_TIMEOUT = float(os.environ.get("BIGDATA_INGEST_TIMEOUT", "300"))
+
+FORMATS = ("csv", "jsonl", "parquet")
+# Type MIME du corps -> format, quand le paramètre 'format' est absent
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/x-ndjson": "jsonl",
+    "application/jsonl": "jsonl",
+    "application/json-lines": "jsonl",
+    "application/vnd.apache.parquet": "parquet",
+    "application/x-parquet": "parquet",
+}
+# Erreurs d'écriture gardées en exemple dans le résultat
+ERROR_SAMPLES = 5
+
+_END = object()
+
+
+def resolve_format(data_format: Optional[str], content_type: Optional[str], parse: bool = True) -> str:
+    """
+    Format du corps : paramètre explicite, sinon type MIME. Lève ValueError
+    sinon, ou si le Parquet doit être lu (parse) sans pyarrow installé.
+    """
+    if data_format is None and content_type:
+        data_format = CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    if data_format not in FORMATS:
+        raise ValueError(f"Format d'ingestion inconnu : {data_format} (formats : {', '.join(FORMATS)})")
+    if data_format == "parquet" and parse and not parquet_available():
+        raise ValueError("Le format parquet nécessite pyarrow (pip install pyarrow)")
+    return data_format
+
+
+def parquet_available() -> bool:
+    try:
+        import pyarrow.parquet  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def scalar(value: str) -> Any:
+    """Valeur d'une cellule CSV : entier, décimal, vide (None) ou texte."""
+    if value == "":
+        return None
+    for convert in (int, float):
+        try:
+            return convert(value)
+        except ValueError:
+            pass
+    return value
+
+
+class IngestStats:
+    """Compteurs d'une ingestion : octets reçus, lignes écrites, erreurs, débits."""
+
+    def __init__(self, tool: str, container_name: str, data_format: str, target: str):
+        self.tool = tool
+        self.container_name = container_name
+        self.format = data_format
+        self.target = target
+        self.rows = 0
+        self.bytes = 0
+        self.errors = 0
+        self.error_samples: List[str] = []
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        # Logger du job : les rapports de débit suivent son canal de progression
+        self.reporter: Any = None
+        self._reported = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, reporter: Any) -> None:
+        """Début de l'écriture (le job a pu attendre son conteneur)."""
+        self.reporter = reporter
+        self.started = self._reported = time.monotonic()
+
+    def add_bytes(self, count: int) -> None:
+        with self._lock:
+            self.bytes += count
+        INGEST_BYTES.inc(count, tool=self.tool)
+
+    def add_rows(self, count: int, errors: Optional[List[str]] = None) -> None:
+        with self._lock:
+            self.rows += count
+            if errors:
+                self.errors += len(errors)
+                self.error_samples.extend(errors[:ERROR_SAMPLES - len(self.error_samples)])
+            due = time.monotonic() - self._reported >= INGEST_REPORT_INTERVAL
+            if due:
+                self._reported = time.monotonic()
+        INGEST_ROWS.inc(count, tool=self.tool)
+        if due and self.reporter is not None:
+            report = self.summary()
+            self.reporter.info(
+                f"Ingestion {self.target} : {report['rows']} lignes, {report['rows_per_s']} lignes/s, "
+                f"{round(report['bytes_per_s'] / 1024 / 1024, 2)} Mo/s"
+            )
+
+    def finish(self) -> None:
+        self.finished = time.monotonic()
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            elapsed = (self.finished or time.monotonic()) - self.started if self.started else 0.0
+            return {
+                "tool": self.tool,
+                "container_name": self.container_name,
+                "format": self.format,
+                "target": self.target,
+                "rows": self.rows,
+                "bytes": self.bytes,
+                "errors": self.errors,
+                "error_samples": list(self.error_samples),
+                "elapsed_s": round(elapsed, 3),
+                "rows_per_s": round(self.rows / elapsed, 2) if elapsed else 0.0,
+                "bytes_per_s": round(self.bytes / elapsed, 2) if elapsed else 0.0,
+                "running": self.finished is None,
+            }
+
+
+class IngestStream:
+    """
+    Corps d'une requête d'ingestion passé morceau par morceau du routeur
+    (producteur) au job qui écrit dans l'outil (consommateur), par une file
+    bornée : la mémoire reste de l'ordre de INGEST_QUEUE_CHUNKS morceaux et
+    l'envoi du client ralentit au rythme des écritures.
+    """
+
+    def __init__(self, data_format: str, stats: IngestStats, max_chunks: int = INGEST_QUEUE_CHUNKS):
+        self.format = data_format
+        self.stats = stats
+        self._queue: queue.Queue = queue.Queue(maxsize=max_chunks)
+        self._closed = threading.Event()
+        self._error: Optional[str] = None
+
+    # ------------------- CÔTÉ ENVOI (routeur) -------------------
+
+    def put(self, chunk: bytes) -> None:
+        """Ajoute un morceau ; lève RuntimeError si le job a cessé de lire."""
+        deadline = time.monotonic() + INGEST_TIMEOUT
+        while not self._closed.is_set():
+            try:
+                self._queue.put(chunk, timeout=0.5)
+                return
+            except queue.Full:
+                if time.monotonic() > deadline:
+                    raise RuntimeError("L'écriture de l'ingestion ne progresse plus.")
+        raise RuntimeError("L'ingestion a été interrompue côté écriture.")
+
+    def finish(self) -> None:
+        self._offer(_END)
+
+    def abort(self, error: str) -> None:
+        """Interrompt la lecture du job (client déconnecté, corps invalide)."""
+        self._error = error
+        self._offer(_END)
+
+    def _offer(self, item: Any) -> None:
+        while not self._closed.is_set():
+            try:
+                self._queue.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    # ------------------- CÔTÉ ÉCRITURE (job) -------------------
+
+    def close(self) -> None:
+        """Fin de lecture côté job : débloque un envoi en attente."""
+        self._closed.set()
+
+    def chunks(self) -> Iterator[bytes]:
+        """Morceaux bruts du corps, dans l'ordre d'envoi."""
+        while True:
+            try:
+                chunk = self._queue.get(timeout=INGEST_TIMEOUT)
+            except queue.Empty:
+                raise RuntimeError("Aucune donnée reçue depuis trop longtemps : envoi abandonné.")
+            if chunk is _END:
+                if self._error:
+                    raise RuntimeError(self._error)
+                return
+            self.stats.add_bytes(len(chunk))
+            yield chunk
+
+    def lines(self) -> Iterator[str]:
+        """Lignes texte (UTF-8) du corps, retour à la ligne compris, sans le rassembler."""
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        pending = ""
+        for chunk in self.chunks():
+            pending += decoder.decode(chunk)
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line + "\n"
+        pending += decoder.decode(b"", final=True)
+        if pending:
+            yield pending
+
+    def records(self, options: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Lignes du corps en dictionnaires, selon le format."""
+        if self.format == "csv":
+            reader = csv.DictReader(self.lines(), delimiter=options.get("delimiter") or ",")
+            for row in reader:
+                yield {k: scalar(v) for k, v in row.items() if k is not None and v is not None}
+        elif self.format == "jsonl":
+            for number, line in enumerate(self.lines(), 1):
+                if not line.strip():
+                    continue
+                try:
+                    record = json.loads(line)
+                except ValueError as e:
+                    raise RuntimeError(f"Ligne JSON {number} invalide : {e}")
+                if not isinstance(record, dict):
+                    raise RuntimeError(f"Ligne JSON {number} : un objet est attendu")
+                yield record
+        else:
+            yield from self.parquet_records(options)
+
+    def parquet_records(self, options: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """
+        Parquet garde ses métadonnées en fin de fichier : le corps est d'abord
+        déposé dans un fichier temporaire (sur disque, pas en mémoire), puis lu
+        par groupes de lignes.
+        """
+        import pyarrow.parquet as pq
+
+        with tempfile.TemporaryFile(prefix="bigdata-ingest-") as spool:
+            for chunk in self.chunks():
+                spool.write(chunk)
+            spool.seek(0)
+            batch_size = options.get("batch_size") or INGEST_BATCH_SIZE
+            for batch in pq.ParquetFile(spool).iter_batches(batch_size=batch_size):
+                yield from batch.to_pylist()
+
+    def batches(self, options: Dict[str, Any]) -> Iterator[List[Dict[str, Any]]]:
+        """Lots de options['batch_size'] lignes."""
+        size = options.get("batch_size") or INGEST_BATCH_SIZE
+        batch: List[Dict[str, Any]] = []
+        for record in self.records(options):
+            batch.append(record)
+            if len(batch) >= size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+
+def write_parallel(batches: Iterator[List[Dict[str, Any]]], write: Callable[[List[Dict[str, Any]]], Tuple[int, List[str]]],
+                   parallelism: int, stats: IngestStats) -> None:
+    """
+    Écrit les lots avec 'parallelism' écritures simultanées ; 'write' retourne
+    (lignes écrites, erreurs). Au plus 2 x parallelism lots sont en mémoire.
+    """
+    def done(future) -> None:
+        written, errors = future.result()
+        stats.add_rows(written, errors)
+
+    with ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="ingest") as executor:
+        pending = set()
+        for batch in batches:
+            if len(pending) >= parallelism * 2:
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    done(future)
+            pending.add(executor.submit(write, batch))
+        for future in pending:
+            done(future)
+
+
+class IngestRegistry:
+    """Ingestions en cours et dernières terminées, par job (GET /tools/{outil}/{conteneur}/ingest)."""
+
+    def __init__(self, keep: int = 20):
+        self._keep = keep
+        self._lock = threading.Lock()
+        self._stats: Dict[str, IngestStats] = {}
+
+    def add(self, job_id: str, stats: IngestStats) -> None:
+        with self._lock:
+            self._stats[job_id] = stats
+            finished = [k for k, s in self._stats.items() if s.finished is not None]
+            for key in finished[:max(len(finished) - self._keep, 0)]:
+                self._stats.pop(key)
+
+    def list(self, tool: str, container_name: str) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._stats.items())
+        return [
+            {"job_id": job_id, **stats.summary()} for job_id, stats in items
+            if stats.tool == tool and stats.container_name == container_name
+        ]
+
+
+def run_ingest(installer: Any, stream: IngestStream, options: Dict[str, Any]) -> Dict[str, Any]:
+    """Corps du job d'ingestion : l'installateur écrit le flux dans l'outil, puis le bilan est retourné."""
+    stats = stream.stats
+    stats.start(installer.logger)
+    installer.logger.info(f"Ingestion {stats.format} vers {stats.target} ({stats.container_name})...")
+    try:
+        details = installer.ingest(stream, options) or {}
+    finally:
+        stream.close()
+        stats.finish()
+    report = {**stats.summary(), **details}
+    installer.logger.info(
+        f"Ingestion terminée : {report['rows']} lignes en {report['elapsed_s']} s "
+        f"({report['rows_per_s']} lignes/s, {report['errors']} erreur(s))"
+    )
+    return report
+
+
+ingests = IngestRegistry()
@@ -0,0 +1,194 @@
+import logging
+import threading
+import uuid
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from docker.errors import DockerException
+
+from .events import RECONNECTED_EVENT, watcher
+from .utils import get_docker_client
+
+logger = logging.getLogger("installer_logger")
+
+
+def _format_ports(ports: List[Dict[str, Any]]) -> Dict[str, Optional[List[Dict[str, str]]]]:
+    """
+    Convertit les ports de l'API 'containers/json' au format NetworkSettings.Ports
+    ({"8080/tcp": [{"HostIp": ..., "HostPort": ...}]}) attendu par le frontend.
+    """
+    result: Dict[str, Optional[List[Dict[str, str]]]] = {}
+    for p in ports or []:
+        key = f"{p['PrivatePort']}/{p.get('Type', 'tcp')}"
+        if "PublicPort" not in p:
+            result.setdefault(key, None)
+            continue
+        bindings = result.get(key) or []
+        bindings.append({"HostIp": p.get("IP", ""), "HostPort": str(p["PublicPort"])})
+        result[key] = bindings
+    return result
+
+
+class ContainerInventory:
+    """
+    Inventaire en mémoire des conteneurs Docker.
+    Initialisé par un seul listage complet, puis tenu à jour conteneur par
+    conteneur à partir du flux d'événements Docker.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._containers: Dict[str, Dict[str, Any]] = {}
+        self._image_tags: Dict[str, List[str]] = {}
+        self._host_ports: Dict[str, Set[int]] = {}
+        # PortBindings des conteneurs (fixés à la création) : inspectés une seule fois par conteneur
+        self._bindings: Dict[str, Set[int]] = {}
+        self._epoch = uuid.uuid4().hex[:8]
+        self._version = 0
+        self._subscribed = False
+        self._seeded = False
+
+    def start(self) -> None:
+        """Abonne l'inventaire aux événements puis effectue le listage initial."""
+        with self._lock:
+            if not self._subscribed:
+                self._subscribed = True
+                watcher.subscribe(self._on_event)
+        watcher.start()
+        if not self._seeded:
+            self.refresh()
+
+    def refresh(self) -> None:
+        """Recharge entièrement l'inventaire (conteneurs + tags d'images en masse)."""
+        client = get_docker_client()
+        with self._lock:
+            rows = client.api.containers(all=True)
+            self._load_image_tags()
+            self._containers = {row["Id"]: self._summarize(row) for row in rows}
+            self._bindings = {k: v for k, v in self._bindings.items() if k in self._containers}
+            self._host_ports = {row["Id"]: self._reserved_ports(row) for row in rows}
+            self._version += 1
+            self._seeded = True
+
+    def _load_image_tags(self) -> None:
+        images = get_docker_client().api.images()
+        self._image_tags = {img["Id"]: img.get("RepoTags") or [] for img in images}
+
+    def _summarize(self, row: Dict[str, Any]) -> Dict[str, Any]:
+        tags = [t for t in self._image_tags.get(row.get("ImageID", ""), []) if t != "<none>:<none>"]
+        names = row.get("Names") or []
+        return {
+            "id": row["Id"],
+            "name": names[0].lstrip("/") if names else row["Id"][:12],
+            "status": row.get("State", ""),
+            "image": tags[0] if tags else row.get("Image", "untagged"),
+            "labels": row.get("Labels") or {},
+            "ports": _format_ports(row.get("Ports")),
+        }
+
+    def _reserved_ports(self, row: Dict[str, Any]) -> Set[int]:
+        """
+        Ports de l'hôte réservés par un conteneur : ports publiés s'il tourne,
+        PortBindings de sa configuration sinon (repris à son redémarrage).
+        Les PortBindings ne changent pas après la création : ils sont lus une
+        fois par conteneur et gardés jusqu'à sa suppression.
+        """
+        if row.get("State") == "running":
+            return {int(p["PublicPort"]) for p in row.get("Ports") or [] if "PublicPort" in p}
+        cached = self._bindings.get(row["Id"])
+        if cached is not None:
+            return cached
+        try:
+            attrs = get_docker_client().api.inspect_container(row["Id"])
+        except DockerException:
+            return set()
+        bindings = (attrs.get("HostConfig") or {}).get("PortBindings") or {}
+        self._bindings[row["Id"]] = {
+            int(b["HostPort"]) for values in bindings.values() for b in values or []
+            if b.get("HostPort")
+        }
+        return self._bindings[row["Id"]]
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        if event is RECONNECTED_EVENT:
+            self.refresh()
+            return
+        action = event.get("Action", "")
+        if action.startswith("exec_"):
+            return
+        container_id = event.get("id") or event.get("Actor", {}).get("ID")
+        if not container_id:
+            return
+        try:
+            with self._lock:
+                if action == "destroy":
+                    self._containers.pop(container_id, None)
+                    self._host_ports.pop(container_id, None)
+                    self._bindings.pop(container_id, None)
+                else:
+                    self._update_one(container_id)
+                self._version += 1
+        except DockerException as e:
+            logger.warning(f"Mise à jour de l'inventaire impossible pour {container_id[:12]} : {e}")
+
+    def _update_one(self, container_id: str) -> None:
+        rows = get_docker_client().api.containers(all=True, filters={"id": container_id})
+        if not rows:
+            self._containers.pop(container_id, None)
+            self._host_ports.pop(container_id, None)
+            self._bindings.pop(container_id, None)
+            return
+        if rows[0].get("ImageID") not in self._image_tags:
+            self._load_image_tags()
+        self._containers[container_id] = self._summarize(rows[0])
+        self._host_ports[container_id] = self._reserved_ports(rows[0])
+
+    def host_ports(self, exclude_name: Optional[str] = None) -> Set[int]:
+        """
+        Ensemble des ports de l'hôte publiés ou réservés par des conteneurs,
+        hors ceux du conteneur 'exclude_name' (qui va être remplacé).
+        """
+        if not self._seeded:
+            self.start()
+        with self._lock:
+            ports: Set[int] = set()
+            for container_id, reserved in self._host_ports.items():
+                container = self._containers.get(container_id)
+                if container is None or container["name"] != exclude_name:
+                    ports |= reserved
+            return ports
+
+    def get_by_name(self, name: str) -> Optional[Dict[str, Any]]:
+        """Résumé d'un conteneur par son nom exact, ou None."""
+        if not self._seeded:
+            self.start()
+        with self._lock:
+            return next((c for c in self._containers.values() if c["name"] == name), None)
+
+    @property
+    def etag(self) -> str:
+        with self._lock:
+            return f'"{self._epoch}-{self._version}"'
+
+    def snapshot(self, created_by: Optional[str] = None, labels: Optional[Dict[str, str]] = None,
+                 name: Optional[str] = None) -> Tuple[str, List[Dict[str, Any]]]:
+        """
+        Retourne (etag, conteneurs) de façon cohérente, filtrés par label
+        'created_by', par labels clé=valeur et par sous-chaîne du nom.
+        """
+        if not self._seeded:
+            self.start()
+        wanted = dict(labels or {})
+        if created_by:
+            wanted["created_by"] = created_by
+        with self._lock:
+            etag = f'"{self._epoch}-{self._version}"'
+            items = [
+                c for c in self._containers.values()
+                if all(c["labels"].get(k) == v for k, v in wanted.items())
+                and (not name or name in c["name"])
+            ]
+        items.sort(key=lambda c: c["name"])
+        return etag, items
+
+
+inventory = ContainerInventory()
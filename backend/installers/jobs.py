@@ -0,0 +1,217 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from .metrics import JOBS_FINISHED, JOBS_QUEUED, JOBS_RUNNING, ROLLBACKS
+from .progress import ProgressChannel
+from .state import persist, state_store
+from .utils import get_container
+
+# Nombre maximal d'opérations Docker exécutées en parallèle
+JOB_WORKERS = int(os.environ.get("BIGDATA_JOB_WORKERS", "4"))
+# Nombre de jobs terminés conservés pour consultation
+JOB_HISTORY = int(os.environ.get("BIGDATA_JOB_HISTORY", "200"))
+# Jobs coordinateurs (batchs) exécutés en parallèle, hors des workers des opérations Docker
+COORDINATOR_WORKERS = int(os.environ.get("BIGDATA_COORDINATOR_WORKERS", "2"))
+
+PENDING = "pending"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    """Représente une opération asynchrone (start, stop, update-config...)."""
+
+    def __init__(self, tool: str, action: str, container_name: str):
+        self.id = uuid.uuid4().hex
+        self.tool = tool
+        self.action = action
+        self.container_name = container_name
+        self.status = PENDING
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.channel = ProgressChannel()
+
+    @property
+    def done(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.id,
+            "tool": self.tool,
+            "action": self.action,
+            "container_name": self.container_name,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class JobEngine:
+    """
+    Exécute les opérations des installateurs en arrière-plan.
+    Le pool de workers est borné et les jobs visant un même conteneur
+    sont sérialisés : un job en attente n'occupe aucun worker tant que
+    le conteneur est pris. Les jobs coordinateurs (batchs), qui attendent
+    leurs éléments, tournent dans un pool séparé : ils ne peuvent pas priver
+    de worker les jobs dont ces éléments attendent le conteneur.
+    Chaque changement d'état d'un job est enregistré dans la base d'état
+    (table operations).
+    """
+
+    def __init__(self, max_workers: int = JOB_WORKERS, history: int = JOB_HISTORY,
+                 coordinator_workers: int = COORDINATOR_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._coordinators = ThreadPoolExecutor(max_workers=coordinator_workers, thread_name_prefix="coordinator")
+        self._history = history
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._busy: set = set()
+        # Conteneur -> file des démarrages en attente (job à lancer ou réservation de batch à réveiller)
+        self._waiting: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, tool: str, action: str, container_name: str, fn: Callable[[Job], Any],
+               coordinator: bool = False) -> Job:
+        """
+        Enregistre un job et le lance dès que le conteneur est libre.
+        fn reçoit le job, pour publier sa progression sur job.channel.
+        coordinator : job qui attend d'autres opérations (batch), lancé hors
+        du pool des opérations Docker et sans réserver container_name (simple
+        libellé) : ses éléments réservent chacun leur conteneur (container_lock).
+        """
+        job = Job(tool, action, container_name)
+        JOBS_QUEUED.inc()
+        persist(state_store.save_operation, job.to_dict())
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            if not coordinator:
+                if container_name in self._busy:
+                    self._waiting.setdefault(container_name, deque()).append(
+                        lambda: self._executor.submit(self._run, job, fn)
+                    )
+                    return job
+                self._busy.add(container_name)
+        executor = self._coordinators if coordinator else self._executor
+        executor.submit(self._run, job, fn, not coordinator)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[Job], Any], reserved: bool = True) -> None:
+        JOBS_QUEUED.dec()
+        job.status = RUNNING
+        job.started_at = time.time()
+        persist(state_store.save_operation, job.to_dict())
+        try:
+            with JOBS_RUNNING.track(tool=job.tool, action=job.action):
+                job.result = fn(job)
+            job.status = SUCCEEDED
+        except Exception as e:
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            persist(state_store.save_operation, job.to_dict())
+            JOBS_FINISHED.inc(tool=job.tool, action=job.action, status=job.status)
+            job.channel.close(job.status, error=job.error)
+            if reserved:
+                self._release(job.container_name)
+
+    @contextmanager
+    def container_lock(self, container_name: str, timeout: Optional[float] = None) -> Iterator[None]:
+        """
+        Réserve un conteneur hors du pool de workers (opérations d'un batch) :
+        la réservation prend son tour dans la même file que les jobs du
+        conteneur et lui est remise directement, sans worker. Lève
+        RuntimeError si le conteneur n'est pas obtenu en 'timeout' secondes.
+        """
+        handed = threading.Event()
+        with self._lock:
+            if container_name in self._busy:
+                self._waiting.setdefault(container_name, deque()).append(handed.set)
+            else:
+                self._busy.add(container_name)
+                handed.set()
+        if not handed.wait(timeout):
+            with self._lock:
+                queue = self._waiting.get(container_name)
+                # Remis entre l'expiration et la prise du verrou : la réservation est acquise
+                if not handed.is_set() and queue is not None:
+                    queue.remove(handed.set)
+            if not handed.is_set():
+                raise RuntimeError(f"Conteneur {container_name} occupé depuis plus de {timeout:g} s")
+        try:
+            yield
+        finally:
+            self._release(container_name)
+
+    def _release(self, container_name: str) -> None:
+        """Libère le conteneur ou le passe directement à l'attente suivante (job ou réservation)."""
+        with self._lock:
+            queue = self._waiting.get(container_name)
+            if not queue:
+                self._waiting.pop(container_name, None)
+                self._busy.discard(container_name)
+                return
+            start = queue.popleft()
+        start()
+
+    def _prune(self) -> None:
+        """Oublie les jobs terminés les plus anciens au-delà de l'historique."""
+        overflow = len(self._jobs) - self._history
+        if overflow <= 0:
+            return
+        for job_id in [j.id for j in self._jobs.values() if j.done][:overflow]:
+            del self._jobs[job_id]
+
+
+def rollback_after_failure(installer) -> None:
+    """Rollback d'une installation échouée, seul compté par bigdata_installer_rollbacks_total."""
+    ROLLBACKS.inc(tool=installer.tool_name)
+    installer.rollback()
+
+
+def run_lifecycle(installer) -> Dict[str, Any]:
+    """
+    Enchaîne le cycle de vie d'un BaseInstaller :
+    check_prerequisites → install → test_installation (→ rollback en cas d'échec).
+    Un install() interrompu par une exception est aussi annulé (conteneurs et
+    bail de ports), sauf si le conteneur existait déjà avant l'installation.
+    """
+    installer.check_prerequisites()
+    name = installer.config.get("container_name")
+    existed = bool(name) and get_container(name) is not None
+    try:
+        installer.install()
+    except Exception:
+        if not existed:
+            try:
+                rollback_after_failure(installer)
+            except Exception as e:
+                installer.logger.error(f"Rollback après échec de l'installation impossible : {e}")
+        raise
+
+    if not installer.test_installation():
+        rollback_after_failure(installer)
+        raise RuntimeError("Test d'installation échoué.")
+
+    return {"status": "started", "port": installer.config.get("port")}
+
+
+engine = JobEngine()
@@ -0,0 +1,259 @@
+import bisect
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Sequence, Tuple
+
+# Bornes des histogrammes de durée (secondes) : de l'appel API au build d'image
+DURATION_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        return lines + self._samples()
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args: Any, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, k)} {_format_value(v)}" for k, v in items]
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: Any) -> None:
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    @contextmanager
+    def track(self, **labels: Any) -> Iterator[None]:
+        """Incrémente la jauge pendant la durée du bloc (opérations en cours)."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Par série : (compte par borne, somme, total)
+        self._series: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+            if index < len(self.buckets):
+                series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._series.items())
+        lines = []
+        for key, (counts, total, count) in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                le = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            le = _format_labels(self.labelnames, key, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{le} {count}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+
+class Registry:
+    """Ensemble des métriques exposées au format texte Prometheus (GET /metrics)."""
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> Any:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+PHASE_DURATION = registry.register(Histogram(
+    "bigdata_installer_phase_duration_seconds",
+    "Durée des phases du cycle de vie des installateurs.", ("tool", "phase")))
+PHASE_FAILURES = registry.register(Counter(
+    "bigdata_installer_phase_failures_total",
+    "Phases terminées par une exception ou un test d'installation négatif.", ("tool", "phase")))
+PHASE_IN_PROGRESS = registry.register(Gauge(
+    "bigdata_installer_phases_in_progress",
+    "Phases d'installateurs en cours d'exécution.", ("tool", "phase")))
+ROLLBACKS = registry.register(Counter(
+    "bigdata_installer_rollbacks_total",
+    "Rollbacks après l'échec d'une installation (hors arrêts et suppressions).", ("tool",)))
+COMMAND_DURATION = registry.register(Histogram(
+    "bigdata_command_duration_seconds",
+    "Durée des commandes shell (run_command, run_docker_command).", ("command",)))
+COMMAND_FAILURES = registry.register(Counter(
+    "bigdata_command_failures_total",
+    "Commandes shell terminées avec un code non nul.", ("command",)))
+DOCKER_DURATION = registry.register(Histogram(
+    "bigdata_docker_operation_duration_seconds",
+    "Durée des opérations de l'API Docker (build, pull, run, exec...).", ("operation",)))
+DOCKER_FAILURES = registry.register(Counter(
+    "bigdata_docker_operation_failures_total",
+    "Opérations de l'API Docker en échec.", ("operation",)))
+DOCKER_IN_PROGRESS = registry.register(Gauge(
+    "bigdata_docker_operations_in_progress",
+    "Opérations de l'API Docker en cours.", ("operation",)))
+JOBS_RUNNING = registry.register(Gauge(
+    "bigdata_jobs_running",
+    "Jobs en cours d'exécution dans le moteur de jobs.", ("tool", "action")))
+JOBS_QUEUED = registry.register(Gauge(
+    "bigdata_jobs_queued",
+    "Jobs en attente d'un worker ou de leur conteneur.", ()))
+JOBS_FINISHED = registry.register(Counter(
+    "bigdata_jobs_finished_total",
+    "Jobs terminés, par statut.", ("tool", "action", "status")))
+POOL_CLAIMS = registry.register(Counter(
+    "bigdata_pool_claims_total",
+    "Démarrages servis (hit) ou non (miss) par le pool chaud.", ("tool", "result")))
+CONFIG_CACHE_READS = registry.register(Counter(
+    "bigdata_config_cache_reads_total",
+    "Lectures de configuration servies par le cache (hit), une lecture partagée (shared) ou le conteneur (miss).",
+    ("tool", "result")))
+INGEST_ROWS = registry.register(Counter(
+    "bigdata_ingest_rows_total",
+    "Lignes écrites par les ingestions (POST /tools/{outil}/{conteneur}/ingest).", ("tool",)))
+INGEST_BYTES = registry.register(Counter(
+    "bigdata_ingest_bytes_total",
+    "Octets reçus par les ingestions.", ("tool",)))
+
+
+def timed_phase(tool: str, phase: str, fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Enveloppe une méthode d'installateur : durée, échecs, phases en cours."""
+
+    @functools.wraps(fn)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        ok = False
+        start = time.perf_counter()
+        try:
+            with PHASE_IN_PROGRESS.track(tool=tool, phase=phase):
+                result = fn(*args, **kwargs)
+            ok = result is not False
+            return result
+        finally:
+            PHASE_DURATION.observe(time.perf_counter() - start, tool=tool, phase=phase)
+            if not ok:
+                PHASE_FAILURES.inc(tool=tool, phase=phase)
+
+    return wrapper
+
+
+def timed_docker(operation: str) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Décorateur des helpers Docker de utils : durée et opérations en cours ;
+    un code de retour non nul ou une exception compte comme un échec.
+    """
+
+    def decorator(fn: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(fn)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            ok = False
+            try:
+                with DOCKER_IN_PROGRESS.track(operation=operation), DOCKER_DURATION.time(operation=operation):
+                    result = fn(*args, **kwargs)
+                ok = not (isinstance(result, tuple) and result and result[0] != 0)
+                return result
+            finally:
+                if not ok:
+                    DOCKER_FAILURES.inc(operation=operation)
+
+        return wrapper
+
+    return decorator
+
+
+def command_label(cmd: str) -> str:
+    """Étiquette bornée d'une commande : 'docker build', 'docker run', ou le nom du programme."""
+    words = [w.strip('"') for w in cmd.split()]
+    if not words:
+        return "empty"
+    program = words[0].rsplit("/", 1)[-1].rsplit("\\", 1)[-1]
+    if program in ("docker", "docker.exe") and len(words) > 1:
+        return f"docker {words[1]}"
+    return program
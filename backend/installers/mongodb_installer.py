@@ -1,19 +1,89 @@
 from .base import BaseInstaller
-from .utils import run_command
-import time
+from . import readiness
+from .cluster import member_name, start_members
+from .images import MONGO_IMAGE, image_manager, image_matches
+from .ports import port_allocator
+from .profiles import apply_limits, current_resources, mongo_command, requires_recreate, resource_changes
+from .reload import IN_PLACE, NOOP, RECREATE, diff_config, stronger, update_result
+from .utils import (
+    CLUSTER_LABEL, ROLE_LABEL, cluster_labels, cluster_network, create_network, docker_available,
+    exec_in_container, get_container, list_containers, managed_labels, remove_container,
+    copy_to_container, remove_network, remove_volume, run_container,
+)
+from .workloads import WORKLOAD_DIR, last_json_line, latency_summary, phase_result, read_script
+from .ingest import INGEST_PARALLELISM, write_parallel
+from pymongo import MongoClient
+from pymongo.errors import BulkWriteError, PyMongoError
+import base64
 import os
 import json
+import secrets
+import shlex
+
+# Clé interne (keyFile) partagée par les membres d'un cluster, transmise par l'environnement
+MONGO_KEY_ENV = "BIGDATA_MONGO_KEY"
+MONGO_KEYFILE = "/data/keyfile"
+# Identifiants de l'utilisateur root du cluster, conservés dans l'environnement des membres
+MONGO_USER_ENV = "BIGDATA_MONGO_USERNAME"
+MONGO_PASSWORD_ENV = "BIGDATA_MONGO_PASSWORD"
+# Nom du replica set d'un membre de cluster
+REPLSET_LABEL = "bigdata.replset"
+# Attente d'une élection ou d'un membre qui rejoint son replica set (secondes)
+MONGO_CLUSTER_TIMEOUT = 120
+# Collection d'ingestion par défaut ("base.collection")
+MONGO_INGEST_TARGET = "bigdata.ingest"
+
+
+def generate_key() -> str:
+    """Contenu d'un keyFile MongoDB (base64, 64 caractères)."""
+    return base64.b64encode(secrets.token_bytes(48)).decode()
+
+
+def member_command(args: list) -> list:
+    """
+    Commande d'un membre de cluster : écrit le keyFile depuis l'environnement
+    (propriétaire mongodb, mode 400), puis lance mongod/mongos via l'entrypoint de l'image.
+    """
+    process = " ".join(shlex.quote(str(a)) for a in args)
+    return [
+        "bash", "-c",
+        f'echo "${MONGO_KEY_ENV}" > {MONGO_KEYFILE} && chmod 400 {MONGO_KEYFILE} && '
+        f"chown mongodb:mongodb {MONGO_KEYFILE} && exec docker-entrypoint.sh {process}",
+    ]
+
+
+def mongod_args(role: str, replset: str, resources: dict) -> list:
+    """Arguments de mongod pour un membre de replica set (config server, shard ou replica set simple)."""
+    args = ["mongod", "--replSet", replset, "--keyFile", MONGO_KEYFILE, "--bind_ip_all"]
+    if role == "configsvr":
+        args.append("--configsvr")
+    elif role.startswith("shard"):
+        args.append("--shardsvr")
+    return args + (mongo_command(resources) or [])
+
+
+def mongos_args(configdb: str) -> list:
+    return ["mongos", "--configdb", configdb, "--keyFile", MONGO_KEYFILE, "--bind_ip_all"]
+
+
+def hello_probe(expression: str, expected: str = "true") -> readiness.Probe:
+    """Sonde : champ de la commande 'hello' (sans authentification), lu par mongosh dans le conteneur."""
+    return readiness.exec_probe(["mongosh", "--quiet", "--eval", expression], lambda out: out == expected)
+
 
 class MongoDBInstaller(BaseInstaller):
+    tool_name = "mongodb"
 
     def check_prerequisites(self) -> None:
-        code, _ = run_command("docker --version", self.logger)
-        if code != 0:
+        if not docker_available(self.logger):
             raise RuntimeError("Docker n'est pas installé. Veuillez l’installer d’abord.")
         self.logger.info("Docker est disponible.")
         self.progress(10)
 
     def install(self) -> None:
+        if self.config.get("shards") or self.config.get("replicas"):
+            self.install_cluster()
+            return
         container = self.config.get("container_name", "mongodb_docker")
         username = self.config.get("username", "admin")
         password = self.config.get("password", "password")
@@ -22,73 +92,557 @@ class MongoDBInstaller(BaseInstaller):
 
         self.logger.info(f"Lancement de MongoDB avec : container={container}, port={port}, user={username}, volume={volume or 'non spécifié'}")
 
-        code, output = run_command("docker pull mongo", self.logger)
-        if code != 0:
-            self.logger.error(f"Échec du téléchargement de l’image MongoDB : {output}")
+        try:
+            image = image_manager.ensure(self.image_reference(), self.logger)
+        except RuntimeError as e:
+            self.logger.error(f"Échec du téléchargement de l’image MongoDB : {e}")
             raise RuntimeError("Échec du téléchargement de l’image MongoDB.")
         self.progress(40)
 
-        docker_cmd = (
-            f"docker run -d --name {container} "
-            f"-p {port}:27017 "
-            f"-e MONGO_INITDB_ROOT_USERNAME={username} "
-            f"-e MONGO_INITDB_ROOT_PASSWORD={password} "
-        )
+        self.start_container(container, image, {
+            "MONGO_INITDB_ROOT_USERNAME": username,
+            "MONGO_INITDB_ROOT_PASSWORD": password,
+        }, port, volume)
 
-        if volume:
-            docker_cmd += f"-v {volume}:/data/db "
+        self.logger.info("Conteneur MongoDB lancé avec succès.")
+        self.progress(100)
 
-        docker_cmd += "mongo"
+    def image_reference(self) -> str:
+        """Image MongoDB demandée (config "image"), l'image épinglée par défaut."""
+        return self.config.get("image") or MONGO_IMAGE
 
-        self.logger.info(f"Commande Docker : {docker_cmd}")
+    def start_container(self, container: str, image: str, environment: dict, port: int, volume: str | None) -> None:
+        """Lance le conteneur MongoDB à partir d'une image déjà présente (référence ou id)."""
+        # Bail sur le port demandé, sans alternative (le port MongoDB est choisi par l'utilisateur)
+        port_allocator.allocate(container, [(port, port, port + 1)])
 
-        code, output = run_command(docker_cmd, self.logger)
+        volumes = {volume: {"bind": "/data/db", "mode": "rw"}} if volume else None
+
+        code, output = run_container(
+            image,
+            self.logger,
+            name=container,
+            **self.container_options(managed_labels("mongodb")),
+            environment=environment,
+            ports={"27017/tcp": port},
+            volumes=volumes,
+            # Taille du cache WiredTiger (profil ou mongo_cache_gb)
+            command=mongo_command(self.resources()),
+        )
         if code != 0:
             self.logger.error(f"Erreur au démarrage de MongoDB : {output}")
+            port_allocator.release(container)
             raise RuntimeError("Échec du lancement de MongoDB en conteneur.")
 
-        self.logger.info("Conteneur MongoDB lancé avec succès.")
+    # ------------------- REPLICA SET ET CLUSTER SHARDÉ -------------------
+
+    def credentials(self) -> tuple:
+        """Identifiants root : ceux de la config, sinon ceux conservés par le conteneur principal."""
+        username, password = self.config.get("username"), self.config.get("password")
+        if not (username and password):
+            container = get_container(self.config.get("container_name", "mongodb_docker"))
+            env = env_dict(container.attrs.get("Config", {}).get("Env", [])) if container is not None else {}
+            username = username or env.get(MONGO_USER_ENV) or env.get("MONGO_INITDB_ROOT_USERNAME")
+            password = password or env.get(MONGO_PASSWORD_ENV) or env.get("MONGO_INITDB_ROOT_PASSWORD")
+        return username or "admin", password or "password"
+
+    def member_env(self) -> dict:
+        username, password = self.credentials()
+        return {MONGO_USER_ENV: username, MONGO_PASSWORD_ENV: password}
+
+    def mongosh(self, container_name: str, script: str, auth: bool = True) -> str:
+        """Exécute un script mongosh dans un conteneur ; sans auth, via l'exception localhost."""
+        cmd = ["mongosh", "--quiet"]
+        if auth:
+            username, password = self.credentials()
+            cmd += ["-u", username, "-p", password, "--authenticationDatabase", "admin"]
+        code, output = exec_in_container(container_name, cmd + ["--eval", script], self.logger)
+        if code != 0:
+            raise RuntimeError(f"mongosh dans {container_name} échoué : {output}")
+        return output
+
+    def install_cluster(self) -> None:
+        """
+        Replica set de 'replicas' membres (le conteneur principal est le membre
+        prioritaire), ou cluster shardé : replica set de config, 'shards' shards
+        de 'replicas' membres (1 par défaut) et un routeur mongos publié sur le port.
+        Les membres se joignent par leur nom sur un réseau dédié et s'authentifient
+        par un keyFile commun.
+        """
+        name = self.config.get("container_name", "mongodb_docker")
+        port = self.config.get("port", 27017)
+        shards = int(self.config.get("shards") or 0)
+        replicas = int(self.config.get("replicas") or 1)
+
+        image = image_manager.ensure(self.image_reference(), self.logger)
+        self.progress(30)
+        key = generate_key()
+        create_network(cluster_network(name), managed_labels("mongodb"), self.logger)
+
+        # (conteneur, rôle, replica set, port publié)
+        if shards:
+            sets = {f"{name}-cfg": [(member_name(name, "configsvr", 0), "configsvr")]}
+            for s in range(shards):
+                sets[f"{name}-shard{s}"] = [(member_name(name, f"shard{s}", i), f"shard{s}") for i in range(replicas)]
+            members = [(c, role, replset, None) for replset, group in sets.items() for c, role in group]
+        else:
+            sets = {name: [(name, "seed")] + [(member_name(name, "member", i), "member") for i in range(1, replicas)]}
+            members = [(name, "seed", name, port)] + [
+                (c, role, name, port + i) for i, (c, role) in enumerate(sets[name][1:], start=1)
+            ]
+
+        try:
+            # Baux des ports publiés (le port du membre principal est celui demandé) :
+            # chaque membre publie le port effectivement attribué
+            for i, (container, role, replset, member_port) in enumerate(members):
+                if member_port is None:
+                    continue
+                allocated = port_allocator.allocate(container, [(member_port, member_port, member_port + 100)])[0]
+                if allocated != member_port:
+                    self.logger.warning(f"Port {member_port} occupé, port {allocated} attribué à {container}.")
+                    members[i] = (container, role, replset, allocated)
+            if not shards:
+                port = members[0][3]
+                self.config["port"] = port
+            start_members(
+                lambda i: self.run_member(image, key, *members[i]), range(len(members)), "membres MongoDB"
+            )
+            self.progress(60)
+            for replset, group in sets.items():
+                self.initiate(replset, [c for c, _ in group], configsvr=group[0][1] == "configsvr")
+                # Utilisateur local du shard : ferme l'exception localhost
+                if replset != f"{name}-cfg":
+                    self.create_root_user(group[0][0])
+            self.progress(80)
+
+            if shards:
+                cfg = sets[f"{name}-cfg"][0][0]
+                self.run_mongos(image, key, f"{name}-cfg/{cfg}:27017", port)
+                readiness.wait_until_ready(name, hello_probe("db.hello().ok", "1"), MONGO_CLUSTER_TIMEOUT)
+                # Utilisateurs du cluster : stockés sur les config servers, créés via mongos
+                self.create_root_user(name)
+                for replset, group in sets.items():
+                    if replset != f"{name}-cfg":
+                        hosts = ",".join(f"{c}:27017" for c, _ in group)
+                        self.mongosh(name, f"sh.addShard({json.dumps(f'{replset}/{hosts}')})")
+        except RuntimeError:
+            self.rollback()
+            raise
+
+        self.logger.info(
+            f"Cluster MongoDB {name} prêt : "
+            + (f"{shards} shard(s) de {replicas} membre(s), mongos sur {port}." if shards
+               else f"replica set de {replicas} membre(s), primaire sur {port}.")
+        )
         self.progress(100)
 
+    def run_member(self, image: str, key: str, container: str, role: str, replset: str,
+                   port: int | None, environment: dict | None = None) -> tuple:
+        """Lance un membre mongod ; ses données sont dans le volume nommé <membre>-data."""
+        cluster = self.config.get("container_name", "mongodb_docker")
+        return run_container(
+            image,
+            self.logger,
+            name=container,
+            hostname=container,
+            network=cluster_network(cluster),
+            **self.container_options({**cluster_labels("mongodb", cluster, role), REPLSET_LABEL: replset}),
+            environment={**(self.member_env() if environment is None else environment), MONGO_KEY_ENV: key},
+            command=member_command(mongod_args(role, replset, self.resources())),
+            ports={"27017/tcp": port} if port is not None else None,
+            volumes={f"{container}-data": {"bind": "/data/db", "mode": "rw"}},
+        )
+
+    def run_mongos(self, image: str, key: str, configdb: str, port: int,
+                   environment: dict | None = None) -> None:
+        name = self.config.get("container_name", "mongodb_docker")
+        port_allocator.allocate(name, [(port, port, port + 1)])
+        labels = {**cluster_labels("mongodb", name, "mongos"), REPLSET_LABEL: configdb}
+        options = self.container_options(labels)
+        code, output = run_container(
+            image,
+            self.logger,
+            name=name,
+            hostname=name,
+            network=cluster_network(name),
+            **options,
+            environment={**(self.member_env() if environment is None else environment), MONGO_KEY_ENV: key},
+            command=member_command(mongos_args(configdb)),
+            ports={"27017/tcp": port},
+        )
+        if code != 0:
+            raise RuntimeError(f"Échec du lancement de mongos : {output}")
+
+    def initiate(self, replset: str, members: list, configsvr: bool = False) -> None:
+        """rs.initiate sur le premier membre (prioritaire), puis attente de son élection."""
+        for container in members:
+            readiness.wait_until_ready(container, hello_probe("db.hello().ok", "1"), MONGO_CLUSTER_TIMEOUT)
+        config = {
+            "_id": replset,
+            "members": [
+                {"_id": i, "host": f"{c}:27017", "priority": 2 if i == 0 else 1} for i, c in enumerate(members)
+            ],
+        }
+        if configsvr:
+            config["configsvr"] = True
+        self.logger.info(f"Initialisation du replica set {replset} ({len(members)} membre(s))...")
+        self.mongosh(members[0], f"rs.initiate({json.dumps(config)})", auth=False)
+        self.wait_for_primary(members[0])
+
+    def wait_for_primary(self, container: str) -> None:
+        self.logger.info(f"Attente de l'élection de {container} comme primaire...")
+        readiness.wait_until_ready(container, hello_probe("db.hello().isWritablePrimary"), MONGO_CLUSTER_TIMEOUT)
+
+    def create_root_user(self, container: str) -> None:
+        username, password = self.credentials()
+        user = {"user": username, "pwd": password, "roles": [{"role": "root", "db": "admin"}]}
+        self.mongosh(container, f'db.getSiblingDB("admin").createUser({json.dumps(user)})', auth=False)
+
+    def cluster_members(self) -> list:
+        """Conteneurs du cluster (membres mongod et mongos)."""
+        name = self.config.get("container_name", "mongodb_docker")
+        return list_containers({CLUSTER_LABEL: name})
+
     def test_installation(self) -> bool:
         container = self.config.get("container_name", "mongodb_docker")
         self.logger.info(f"Vérification du conteneur MongoDB '{container}'...")
 
-        for _ in range(5):
-            code, output = run_command(
-                f'docker ps --filter "name={container}" --filter "status=running" --format "{{{{.Names}}}}"',
-                self.logger
-            )
-            if code == 0 and container in output:
-                self.logger.info("Conteneur MongoDB actif.")
-                return True
-            time.sleep(2)
+        try:
+            readiness.wait_until_ready(container, readiness.mongo_ping_probe(), timeout=30)
+            current = get_container(container)
+            if current is not None and current.labels.get(ROLE_LABEL) == "seed":
+                # Replica set : prêt quand un primaire est élu
+                readiness.wait_until_ready(container, hello_probe("!!db.hello().primary"), timeout=30)
+        except RuntimeError as e:
+            self.logger.warning(f"Conteneur MongoDB non trouvé ou non actif : {e}")
+            return False
 
-        self.logger.warning("Conteneur MongoDB non trouvé ou non actif.")
-        return False
+        self.logger.info("Conteneur MongoDB actif.")
+        return True
 
     def rollback(self) -> None:
         container = self.config.get("container_name", "mongodb_docker")
         self.logger.info(f"Rollback en cours pour le conteneur MongoDB : {container}")
-        run_command(f"docker rm -f {container}", self.logger)
+        for member in self.cluster_members():
+            remove_container(member.name, self.logger)
+            remove_volume(f"{member.name}-data", self.logger)
+            port_allocator.release(member.name)
+        remove_container(container, self.logger)
+        remove_network(cluster_network(container), self.logger)
+        port_allocator.release(container)
         self.logger.info(f"Rollback MongoDB terminé pour {container}.")
 
     def update_config(self, new_config: dict) -> dict:
         """
-        Met à jour la configuration MongoDB et redémarre le conteneur
+        Met à jour la configuration MongoDB avec la stratégie la moins coûteuse :
+        'parameters' et les limites CPU/mémoire sont appliqués à chaud
+        (setParameter, docker update) ; le conteneur n'est recréé (sans nouveau
+        pull, en gardant son volume de données) que si le port, l'environnement,
+        le volume ou le cache WiredTiger changent.
         """
-        container = new_config.get("container_name", self.config.get("container_name", "mongodb_docker"))
+        container_name = new_config.get("container_name", self.config.get("container_name", "mongodb_docker"))
 
-        self.logger.info(f"Mise à jour de la configuration MongoDB pour {container}...")
+        self.logger.info(f"Mise à jour de la configuration MongoDB pour {container_name}...")
         self.logger.debug(f"Nouvelle configuration : {json.dumps(new_config, indent=2)}")
 
-        # Arrêter et supprimer le conteneur existant
-        run_command(f"docker rm -f {container}", self.logger)
+        container = get_container(container_name)
+        if container is None:
+            self.config.update(new_config)
+            self.install()
+            return {"status": "ok", **update_result(RECREATE, new_config)}
+        if container.labels.get(CLUSTER_LABEL) == container_name:
+            return {"status": "ok", **self.rolling_update(new_config)}
+
+        current_env = env_dict(container.attrs.get("Config", {}).get("Env", []))
+        current_port = readiness.published_port(container, "27017/tcp")
+        current_volume = data_volume(container)
+
+        port = requested_host_port(new_config) or current_port
+        volume = new_config.get("volume", current_volume)
+        changes = diff_config(current_env, new_config.get("env") or {})
+        if port != current_port:
+            changes["port"] = port
+        if volume != current_volume:
+            changes["volume"] = volume
+        # Image demandée explicitement (config "image" de l'installateur) : changement de version
+        image = container.image.id
+        if self.config.get("image") and not image_matches(container, self.config["image"]):
+            image = image_manager.ensure(self.config["image"], self.logger)
+            changes["image"] = self.config["image"]
+        resources = resource_changes(container, self.resources())
+        if requires_recreate(resources):
+            changes.update(resources)
+
+        strategy = NOOP
+        if changes:
+            changes.update(resources)
+            self.inherit_resources(container)
+            self.logger.info(f"Recréation du conteneur MongoDB : {sorted(changes)}")
+            image_env = env_dict(container.image.attrs.get("Config", {}).get("Env", []))
+            env = {**current_env, **(new_config.get("env") or {})}
+            environment = {k: v for k, v in env.items() if image_env.get(k) != v}
+
+            remove_container(container_name, self.logger)
+            readiness.wait_for_removal(container_name)
+            # Même image que le conteneur remplacé (sauf image demandée) : ni pull, ni changement de version
+            self.start_container(container_name, image, environment, port, volume)
+            self.config["port"] = port
+            strategy = RECREATE
+        elif apply_limits(container, resources):
+            changes.update(resources)
+            strategy = IN_PLACE
+
+        parameters = new_config.get("parameters") or {}
+        if parameters:
+            self.set_parameters(container_name, parameters)
+            changes.update(parameters)
+            strategy = strategy if strategy == RECREATE else IN_PLACE
+
+        self.logger.info(f"Configuration MongoDB appliquée ({strategy}) pour {container_name}.")
+        return {"status": "ok", **update_result(strategy, changes)}
+
+    def rolling_update(self, new_config: dict) -> dict:
+        """
+        Mise à jour d'un cluster membre par membre. Les limites CPU/mémoire sont
+        appliquées à chaud ; si l'environnement ou le cache WiredTiger change,
+        chaque replica set est recréé secondaires d'abord, puis l'ancien primaire
+        après rs.stepDown : un primaire reste disponible pendant toute la mise à
+        jour. 'parameters' est appliqué sur chaque membre (setParameter).
+        Le port et les volumes d'un cluster ne sont pas modifiables.
+        """
+        name = self.config.get("container_name", "mongodb_docker")
+        members = self.cluster_members()
+        mongods = [m for m in members if m.labels.get(ROLE_LABEL) != "mongos"]
+        main = get_container(name)
+
+        port = requested_host_port(new_config)
+        if (port and port != readiness.published_port(main, "27017/tcp")) or new_config.get("volume"):
+            self.logger.warning("Port et volume d'un cluster MongoDB non modifiables : ignorés.")
+
+        current_env = env_dict(main.attrs.get("Config", {}).get("Env", []))
+        env_changes = diff_config(current_env, new_config.get("env") or {})
+        env_changes.pop(MONGO_KEY_ENV, None)
+        if mongods:
+            self.inherit_resources(mongods[0])
+        resources = self.resources()
+
+        strategy = NOOP
+        changes = dict(env_changes)
+        replsets: dict = {}
+        for member in mongods:
+            replsets.setdefault(member.labels.get(REPLSET_LABEL), []).append(member)
+        for replset, group in replsets.items():
+            recreate = []
+            for member in group:
+                member_changes = resource_changes(member, resources)
+                if env_changes or requires_recreate(member_changes):
+                    recreate.append(member)
+                    changes.update(member_changes)
+                elif apply_limits(member, member_changes):
+                    changes.update(member_changes)
+                    strategy = stronger(strategy, IN_PLACE)
+            if recreate:
+                self.roll_replica_set(replset, group, recreate, env_changes)
+                strategy = RECREATE
+
+        for router in (m for m in members if m.labels.get(ROLE_LABEL) == "mongos"):
+            # mongos n'a pas de cache WiredTiger ; routeur unique : brève coupure s'il est recréé
+            router_changes = resource_changes(router, {k: v for k, v in resources.items() if k != "mongo_cache_gb"})
+            if env_changes or requires_recreate(router_changes):
+                self.recreate_member(router, env_changes)
+                readiness.wait_until_ready(router.name, hello_probe("db.hello().ok", "1"), MONGO_CLUSTER_TIMEOUT)
+                strategy = RECREATE
+            elif apply_limits(router, router_changes):
+                strategy = stronger(strategy, IN_PLACE)
+            changes.update(router_changes)
+
+        parameters = new_config.get("parameters") or {}
+        if parameters:
+            command = json.dumps({"setParameter": 1, **parameters})
+            for member in self.cluster_members():
+                self.mongosh(member.name, f"db.adminCommand({command})")
+            changes.update(parameters)
+            strategy = stronger(strategy, IN_PLACE)
+
+        self.logger.info(f"Configuration du cluster MongoDB appliquée ({strategy}) pour {name}.")
+        return update_result(strategy, changes)
+
+    def roll_replica_set(self, replset: str, group: list, recreate: list, env_changes: dict) -> None:
+        """Recrée des membres d'un replica set un par un, secondaires d'abord, primaire en dernier."""
+        primary = next(
+            (m for m in recreate if hello_probe("db.hello().isWritablePrimary")(m)), None
+        )
+        for member in sorted(recreate, key=lambda m: m is primary):
+            if member is primary and len(group) > 1:
+                self.logger.info(f"{replset} : rs.stepDown sur {member.name} avant sa recréation...")
+                self.mongosh(member.name, "rs.stepDown(60)")
+                readiness.wait_until_ready(member.name, hello_probe("db.hello().secondary"), MONGO_CLUSTER_TIMEOUT)
+            self.recreate_member(member, env_changes)
+            if len(group) > 1:
+                # Le membre a rejoint le replica set (secondaire, ou primaire par priorité)
+                readiness.wait_until_ready(
+                    member.name,
+                    hello_probe("db.hello().secondary || db.hello().isWritablePrimary"),
+                    MONGO_CLUSTER_TIMEOUT,
+                )
+            else:
+                self.wait_for_primary(member.name)
+            self.logger.info(f"{replset} : {member.name} recréé.")
+
+    def recreate_member(self, member, env_changes: dict) -> None:
+        """Recrée un membre (même image, même volume, même clé) avec l'environnement et les ressources à jour."""
+        image_env = env_dict(member.image.attrs.get("Config", {}).get("Env", []))
+        env = {**env_dict(member.attrs.get("Config", {}).get("Env", [])), **env_changes}
+        environment = {k: v for k, v in env.items() if image_env.get(k) != v}
+        key = environment.pop(MONGO_KEY_ENV)
+        role = member.labels[ROLE_LABEL]
+        replset = member.labels[REPLSET_LABEL]
+        port = readiness.published_port(member, "27017/tcp")
+
+        remove_container(member.name, self.logger)
+        readiness.wait_for_removal(member.name)
+        if role == "mongos":
+            self.run_mongos(member.image.id, key, replset, port, environment)
+            return
+        code, output = self.run_member(member.image.id, key, member.name, role, replset, port, environment)
+        if code != 0:
+            raise RuntimeError(f"Recréation de {member.name} échouée : {output}")
+
+    def config_drift(self, container, config: dict, applied: dict) -> dict:
+        """
+        Champs de 'config' (format update_config) qui diffèrent du conteneur :
+        environnement, port, volume ; 'parameters' n'étant pas relisible à
+        moindre coût, il est comparé à la dernière configuration appliquée.
+        """
+        changes = diff_config(env_dict(container.attrs.get("Config", {}).get("Env", [])), config.get("env") or {})
+        port = requested_host_port(config)
+        if port and port != readiness.published_port(container, "27017/tcp"):
+            changes["port"] = port
+        if config.get("volume") and config["volume"] != data_volume(container):
+            changes["volume"] = config["volume"]
+        if (config.get("parameters") or {}) != (applied.get("parameters") or {}):
+            changes["parameters"] = config.get("parameters") or {}
+        return changes
+
+    def config_snapshot(self) -> dict:
+        """Configuration mesurée par un benchmark : environnement (sans secrets), ressources, topologie."""
+        container_name = self.config.get("container_name", "mongodb_docker")
+        container = get_container(container_name)
+        if container is None:
+            raise RuntimeError(f"Conteneur {container_name} introuvable.")
+        env = env_dict(container.attrs.get("Config", {}).get("Env", []))
+        return {
+            "env": {k: v for k, v in env.items() if "PASSWORD" not in k and k != MONGO_KEY_ENV},
+            "resources": current_resources(container),
+            "topology": container.labels.get(ROLE_LABEL, "standalone"),
+            "members": len(self.cluster_members()),
+        }
+
+    def benchmark(self, workload: str, params: dict) -> dict:
+        """
+        Charge de type YCSB (mongosh dans le conteneur, via mongos pour un cluster
+        shardé) : chargement de 'records' documents, puis 'operations' lectures et
+        mises à jour selon read_proportion.
+        """
+        container_name = self.config.get("container_name", "mongodb_docker")
+        code, output = copy_to_container(
+            container_name, WORKLOAD_DIR, "bigdata_mongo_workload.js", read_script("mongo_workload.js"), self.logger
+        )
+        if code != 0:
+            raise RuntimeError(f"Copie du script de charge échouée : {output}")
+        report = last_json_line(self.mongosh(
+            container_name, f"const params = {json.dumps(params)}; load('{WORKLOAD_DIR}/bigdata_mongo_workload.js')"
+        ))
+        phases = {"load": phase_result(len(report["insert"]), report["load_ms"], report["insert"])}
+        run = report["read"] + report["update"]
+        phases["run"] = phase_result(len(run), report["run_ms"], run)
+        phases["run"]["read"] = latency_summary(report["read"])
+        phases["run"]["update"] = latency_summary(report["update"])
+        return phases
+
+    def connect(self, container_name: str, pool_size: int = 1) -> MongoClient:
+        """Client pymongo vers le port publié du conteneur, avec les identifiants root."""
+        container = get_container(container_name)
+        if container is None:
+            raise RuntimeError(f"Conteneur {container_name} introuvable")
+        username, password = self.credentials()
+        return MongoClient(
+            readiness.PROBE_HOST,
+            readiness.published_port(container, "27017/tcp"),
+            username=username,
+            password=password,
+            directConnection=True,
+            serverSelectionTimeoutMS=5000,
+            maxPoolSize=pool_size,
+        )
+
+    def ingest(self, stream, options: dict) -> dict:
+        """
+        Insère le flux par lots d'insertMany non ordonnés, 'parallelism' lots à
+        la fois : un document refusé (clé dupliquée...) n'arrête pas son lot et
+        compte dans les erreurs du résultat.
+        """
+        container_name = self.config.get("container_name", "mongodb_docker")
+        database, _, collection = (options.get("target") or MONGO_INGEST_TARGET).partition(".")
+        if not collection:
+            raise RuntimeError("Cible MongoDB attendue sous la forme 'base.collection'")
+        parallelism = options.get("parallelism") or INGEST_PARALLELISM
+        client = self.connect(container_name, pool_size=parallelism)
+        target = client[database][collection]
+
+        def write(batch: list) -> tuple:
+            try:
+                return len(target.insert_many(batch, ordered=False).inserted_ids), []
+            except BulkWriteError as e:
+                return e.details.get("nInserted", 0), [err.get("errmsg", "") for err in e.details.get("writeErrors", [])]
+
+        try:
+            write_parallel(stream.batches(options), write, parallelism, stream.stats)
+        except PyMongoError as e:
+            raise RuntimeError(f"Ingestion MongoDB échouée : {e}")
+        finally:
+            client.close()
+        return {"database": database, "collection": collection}
+
+    def set_parameters(self, container_name: str, parameters: dict) -> None:
+        """Applique des paramètres serveur à chaud (commande setParameter)."""
+        container = get_container(container_name)
+        readiness.wait_until_ready(container_name, readiness.mongo_ping_probe(), timeout=30)
+        env = env_dict(container.attrs.get("Config", {}).get("Env", []))
+        client = MongoClient(
+            readiness.PROBE_HOST,
+            readiness.published_port(container, "27017/tcp"),
+            username=env.get("MONGO_INITDB_ROOT_USERNAME"),
+            password=env.get("MONGO_INITDB_ROOT_PASSWORD"),
+            directConnection=True,
+            serverSelectionTimeoutMS=5000,
+        )
+        try:
+            for key, value in parameters.items():
+                client.admin.command({"setParameter": 1, key: value})
+        except PyMongoError as e:
+            raise RuntimeError(f"setParameter MongoDB échoué : {e}")
+        finally:
+            client.close()
+
+
+def env_dict(env_list: list) -> dict:
+    """Convertit une liste 'CLE=valeur' (Config.Env) en dictionnaire."""
+    return dict(item.split("=", 1) for item in env_list or [] if "=" in item)
+
 
-        # Mettre à jour la config interne de l'instance
-        self.config.update(new_config)
+def data_volume(container) -> str | None:
+    """Volume (nom ou chemin) monté sur /data/db, conservé lors d'une recréation."""
+    for mount in container.attrs.get("Mounts", []):
+        if mount.get("Destination") == "/data/db":
+            return mount.get("Name") or mount.get("Source")
+    return None
 
-        # Relancer avec la nouvelle config
-        self.install()
 
-        return {"status": "ok", "message": f"MongoDB redémarré avec la nouvelle configuration pour {container}"}
+def requested_host_port(new_config: dict) -> int | None:
+    """Port de l'hôte demandé pour 27017/tcp dans la config envoyée par le frontend."""
+    bindings = (new_config.get("ports") or {}).get("27017/tcp") or []
+    for binding in bindings:
+        if binding.get("HostPort"):
+            return int(binding["HostPort"])
+    return None
@@ -0,0 +1,154 @@
+import logging
+import os
+import re
+import threading
+import uuid
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+# Taille du tampon circulaire de sortie par opération (octets) : seule la fin est gardée en mémoire
+OUTPUT_BUFFER_BYTES = int(os.environ.get("BIGDATA_OUTPUT_BUFFER_BYTES", str(1024 * 1024)))
+# Longueur maximale d'une ligne : au-delà, la ligne est coupée (sortie sans retour à la ligne)
+OUTPUT_MAX_LINE = int(os.environ.get("BIGDATA_OUTPUT_MAX_LINE", str(512 * 1024)))
+# Dossier des fichiers de sortie complets par opération (désactivé si vide)
+OUTPUT_SPILL_DIR = os.environ.get("BIGDATA_OUTPUT_SPILL_DIR", "")
+# Rotation des fichiers de sortie : taille maximale et nombre de fichiers conservés
+OUTPUT_SPILL_MAX_BYTES = int(os.environ.get("BIGDATA_OUTPUT_SPILL_MAX_BYTES", str(10 * 1024 * 1024)))
+OUTPUT_SPILL_BACKUPS = int(os.environ.get("BIGDATA_OUTPUT_SPILL_BACKUPS", "3"))
+
+# Les lignes brutes passent par ce logger en DEBUG, préfixées par l'opération :
+# deux builds simultanés ne se mélangent plus dans le flux INFO de installer_logger
+output_logger = logging.getLogger("installer_logger.output")
+
+LineCallback = Callable[[str], None]
+
+_UNSAFE = re.compile(r"[^\w.-]")
+
+
+def operation_id(name: str) -> str:
+    """Identifiant d'opération utilisable comme nom de fichier."""
+    return f"{_UNSAFE.sub('_', name)}-{uuid.uuid4().hex[:8]}"
+
+
+class OutputCapture:
+    """
+    Sortie d'une commande (shell, docker build, docker exec) lue ligne par
+    ligne : seule la fin tient en mémoire dans un tampon circulaire borné en
+    octets, la sortie complète peut être déversée dans un fichier tournant
+    propre à l'opération et chaque ligne est passée aux abonnés (canal de
+    progression, parseurs). La mémoire reste constante quelle que soit la
+    verbosité de la commande.
+    """
+
+    def __init__(self, operation: str, max_bytes: int = OUTPUT_BUFFER_BYTES,
+                 spill_dir: Optional[str] = None, callbacks: Iterable[LineCallback] = ()):
+        self.operation = operation_id(operation)
+        self._max_bytes = max_bytes
+        self._lines: deque = deque()
+        self._size = 0
+        self._pending = ""
+        self._lock = threading.Lock()
+        self._callbacks: List[LineCallback] = list(callbacks)
+        self.line_count = 0
+        self.dropped = 0
+        self.spill_path: Optional[str] = None
+        self._spill: Optional[RotatingFileHandler] = None
+        spill_dir = OUTPUT_SPILL_DIR if spill_dir is None else spill_dir
+        if spill_dir:
+            os.makedirs(spill_dir, exist_ok=True)
+            self.spill_path = os.path.join(spill_dir, f"{self.operation}.log")
+            self._spill = RotatingFileHandler(self.spill_path, maxBytes=OUTPUT_SPILL_MAX_BYTES,
+                                              backupCount=OUTPUT_SPILL_BACKUPS, encoding="utf-8")
+            self._spill.setFormatter(logging.Formatter("%(message)s"))
+
+    def subscribe(self, callback: LineCallback) -> None:
+        self._callbacks.append(callback)
+
+    def feed_line(self, line: str) -> None:
+        """Ajoute une ligne complète (sans retour à la ligne final)."""
+        line = line.rstrip("\r\n")
+        with self._lock:
+            self.line_count += 1
+            self._lines.append(line)
+            self._size += len(line) + 1
+            # Une ligne seule peut dépasser le tampon : elle est alors la seule gardée
+            while self._size > self._max_bytes and len(self._lines) > 1:
+                self._size -= len(self._lines.popleft()) + 1
+                self.dropped += 1
+        if self._spill is not None:
+            self._spill.handle(logging.makeLogRecord({"msg": line, "levelno": logging.INFO}))
+        if output_logger.isEnabledFor(logging.DEBUG):
+            output_logger.debug(f"[{self.operation}] {line}")
+        for callback in self._callbacks:
+            try:
+                callback(line)
+            except Exception as e:
+                output_logger.warning(f"Abonné de sortie en erreur ({self.operation}) : {e}")
+
+    def feed(self, data: Any) -> None:
+        """
+        Ajoute un morceau de flux (str ou bytes) non aligné sur les lignes :
+        la ligne incomplète attend le morceau suivant, bornée à OUTPUT_MAX_LINE.
+        """
+        if isinstance(data, bytes):
+            data = data.decode("utf-8", errors="replace")
+        self._pending += data
+        *lines, self._pending = self._pending.split("\n")
+        for line in lines:
+            self.feed_line(line)
+        while len(self._pending) > OUTPUT_MAX_LINE:
+            self.feed_line(self._pending[:OUTPUT_MAX_LINE])
+            self._pending = self._pending[OUTPUT_MAX_LINE:]
+
+    def close(self) -> None:
+        """Vide la ligne incomplète et ferme le fichier de sortie."""
+        if self._pending:
+            self.feed_line(self._pending)
+            self._pending = ""
+        if self._spill is not None:
+            self._spill.close()
+            self._spill = None
+
+    def __enter__(self) -> "OutputCapture":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def tail(self, lines: Optional[int] = None) -> str:
+        """Dernières lignes gardées (toutes celles du tampon si lines est None)."""
+        with self._lock:
+            kept = list(self._lines)
+        if lines is not None:
+            kept = kept[-lines:] if lines > 0 else []
+        return "\n".join(kept).strip()
+
+    def parse(self, parser: Callable[[str], Any]) -> Any:
+        """Résultat structuré extrait de la fin de sortie (ex. workloads.last_json_line)."""
+        return parser(self.tail())
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            kept = len(self._lines)
+        return {"operation": self.operation, "lines": self.line_count, "kept": kept,
+                "dropped": self.dropped, "spill": self.spill_path}
+
+
+def channel_callback(logger: Any) -> Optional[LineCallback]:
+    """
+    Abonné qui republie les lignes sur le canal de progression du job quand le
+    logger est un ChannelLogger : chaque opération garde son propre flux.
+    """
+    channel = getattr(logger, "channel", None)
+    if channel is None:
+        return None
+    prefix = getattr(logger, "prefix", "")
+    return lambda line: channel.line(f"{prefix}{line}", "INFO") if line.strip() else None
+
+
+def capture_for(operation: str, logger: Any, on_line: Optional[LineCallback] = None,
+                stream: bool = True) -> OutputCapture:
+    """Capture d'une opération, abonnée au canal du job (si stream) et à on_line."""
+    callbacks = [cb for cb in (channel_callback(logger) if stream else None, on_line) if cb]
+    return OutputCapture(operation, callbacks=callbacks)
@@ -0,0 +1,118 @@
+import logging
+import os
+import socket
+import threading
+from typing import Dict, List, Set, Tuple
+
+from .inventory import inventory
+from .state import persist, state_store
+
+logger = logging.getLogger("installer_logger")
+
+# Tables des sockets TCP du noyau (Linux)
+PROC_NET_TCP = ("/proc/net/tcp", "/proc/net/tcp6")
+TCP_LISTEN = "0A"
+
+# Demande de port : (port souhaité, début de plage, fin de plage exclue)
+PortRequest = Tuple[int, int, int]
+
+
+def listening_ports() -> Set[int]:
+    """Ports TCP en écoute sur la machine, lus en une passe dans /proc/net/tcp*."""
+    ports: Set[int] = set()
+    for path in PROC_NET_TCP:
+        try:
+            with open(path) as f:
+                next(f, None)
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 3 and fields[3] == TCP_LISTEN:
+                        ports.add(int(fields[1].rsplit(":", 1)[1], 16))
+        except OSError:
+            continue
+    return ports
+
+
+def _port_in_use(port: int) -> bool:
+    """Repli hors Linux : test de connexion sur un seul port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        return s.connect_ex(("localhost", port)) == 0
+
+
+class PortAllocator:
+    """
+    Attribution centralisée des ports de l'hôte. L'occupation combine les ports
+    publiés ou réservés par les conteneurs (inventaire Docker), les sockets en
+    écoute et les baux déjà accordés ; chaque attribution est atomique et
+    rattachée à un conteneur jusqu'à sa libération (rollback). Les baux sont
+    enregistrés dans la base d'état et survivent à un redémarrage du backend.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._leases: Dict[str, Set[int]] = {}
+
+    def _occupied(self, container_name: str) -> Set[int]:
+        # Les ports du conteneur du même nom ne comptent pas : il est remplacé
+        occupied = inventory.host_ports(exclude_name=container_name) | listening_ports()
+        for ports in self._leases.values():
+            occupied |= ports
+        return occupied
+
+    def allocate(self, container_name: str, requests: List[PortRequest]) -> List[int]:
+        """
+        Attribue un port par demande, en une seule opération : le port souhaité
+        s'il est libre, sinon le premier port libre de la plage.
+        """
+        use_proc = os.path.exists(PROC_NET_TCP[0])
+        with self._lock:
+            # Les anciens baux du conteneur sont remplacés par la nouvelle attribution
+            self._leases.pop(container_name, None)
+            occupied = self._occupied(container_name)
+
+            def is_free(port: int) -> bool:
+                return port not in occupied and (use_proc or not _port_in_use(port))
+
+            allocated = []
+            for preferred, start, end in requests:
+                if is_free(preferred):
+                    port = preferred
+                else:
+                    port = next((p for p in range(start, end) if is_free(p)), None)
+                    if port is None:
+                        raise RuntimeError(
+                            f"Port {preferred} occupé et aucun port libre entre {start} et {end - 1}."
+                        )
+                occupied.add(port)
+                allocated.append(port)
+
+            self._leases[container_name] = set(allocated)
+            persist(state_store.save_leases, container_name, allocated)
+            return allocated
+
+    def release(self, container_name: str) -> None:
+        with self._lock:
+            self._leases.pop(container_name, None)
+            persist(state_store.delete_leases, container_name)
+
+    def transfer(self, old_name: str, new_name: str) -> None:
+        """Rattache les baux d'un conteneur renommé (conteneur du pool chaud réclamé)."""
+        with self._lock:
+            ports = self._leases.pop(old_name, None)
+            if ports is not None:
+                self._leases[new_name] = ports
+                persist(state_store.delete_leases, old_name)
+                persist(state_store.save_leases, new_name, ports)
+
+    def restore(self, leases: Dict[str, List[int]]) -> None:
+        """Reprend les baux enregistrés avant un redémarrage du backend (voir reconciler.recover)."""
+        with self._lock:
+            for container_name, ports in leases.items():
+                self._leases[container_name] = set(ports)
+
+    def leases(self) -> Dict[str, List[int]]:
+        with self._lock:
+            return {name: sorted(ports) for name, ports in self._leases.items()}
+
+
+port_allocator = PortAllocator()
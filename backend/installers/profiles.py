@@ -0,0 +1,155 @@
+import re
+import shlex
+from typing import Any, Dict, List, Optional
+
+# Profils de ressources nommés : valeurs par défaut, remplacées champ par champ par la config
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "small": {
+        "cpus": 1, "memory": "1g",
+        "spark_driver_memory": "512m", "spark_executor_memory": "512m", "spark_executor_cores": 1,
+        "hbase_heapsize": "512m", "hbase_handler_count": 10,
+        "mongo_cache_gb": 0.25,
+    },
+    "analytics": {
+        "cpus": 4, "memory": "8g",
+        "spark_driver_memory": "2g", "spark_executor_memory": "4g", "spark_executor_cores": 3,
+        "hbase_heapsize": "4g", "hbase_handler_count": 30,
+        "mongo_cache_gb": 2,
+    },
+    "ingest": {
+        "cpus": 2, "memory": "4g",
+        "spark_driver_memory": "1g", "spark_executor_memory": "1g", "spark_executor_cores": 1,
+        "hbase_heapsize": "2g", "hbase_handler_count": 100,
+        "mongo_cache_gb": 1.5,
+    },
+}
+
+# Champs de ressources communs à tous les outils (limites Docker)
+LIMIT_FIELDS = ("cpus", "memory", "cpuset")
+# Champs propres à chaque outil
+TOOL_FIELDS = {
+    "spark": ("spark_driver_memory", "spark_executor_memory", "spark_executor_cores"),
+    "hbase": ("hbase_heapsize", "hbase_handler_count"),
+    "mongodb": ("mongo_cache_gb",),
+}
+RESOURCE_FIELDS = ("profile",) + LIMIT_FIELDS + tuple(f for fields in TOOL_FIELDS.values() for f in fields)
+
+# Variables d'environnement lues au démarrage des JVM (spark-submit, bin/hbase)
+ENV_FIELDS = {
+    "spark_driver_memory": "SPARK_DRIVER_MEMORY",
+    "spark_executor_memory": "SPARK_EXECUTOR_MEMORY",
+    "spark_executor_cores": "SPARK_EXECUTOR_CORES",
+    "hbase_heapsize": "HBASE_HEAPSIZE",
+}
+HBASE_HANDLER_KEY = "hbase.regionserver.handler.count"
+MONGO_CACHE_FLAG = "--wiredTigerCacheSizeGB"
+
+# Période CFS utilisée pour exprimer la limite CPU (quota = cpus × période)
+CPU_PERIOD = 100000
+
+_SIZE_UNITS = {"": 1, "b": 1, "k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(value: Any) -> int:
+    """Convertit une taille Docker ('512m', '2g', 1073741824) en octets."""
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([bkmg]?)b?\s*", str(value).lower())
+    if not match:
+        raise ValueError(f"Taille invalide : {value}")
+    return int(float(match.group(1)) * _SIZE_UNITS[match.group(2)])
+
+
+def resolve_resources(tool: str, config: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Ressources demandées pour un outil : valeurs du profil éventuel, remplacées
+    par les champs renseignés dans la config. Les champs absents ne sont pas
+    retournés (ils gardent leur valeur actuelle lors d'une mise à jour).
+    """
+    profile = config.get("profile")
+    if profile and profile not in PROFILES:
+        raise ValueError(f"Profil inconnu : {profile} (profils : {', '.join(PROFILES)})")
+    fields = LIMIT_FIELDS + TOOL_FIELDS.get(tool, ())
+    resources = {k: v for k, v in PROFILES.get(profile, {}).items() if k in fields}
+    resources.update({k: config[k] for k in fields if config.get(k) is not None})
+    return resources
+
+
+def docker_limits(resources: Dict[str, Any]) -> Dict[str, Any]:
+    """Options 'docker run' / 'docker update' des limites (sans swap au-delà de la mémoire)."""
+    limits: Dict[str, Any] = {}
+    if "cpus" in resources:
+        limits["cpu_period"] = CPU_PERIOD
+        limits["cpu_quota"] = int(float(resources["cpus"]) * CPU_PERIOD)
+    if "memory" in resources:
+        limits["mem_limit"] = limits["memswap_limit"] = parse_size(resources["memory"])
+    if "cpuset" in resources:
+        limits["cpuset_cpus"] = str(resources["cpuset"])
+    return limits
+
+
+def resource_env(resources: Dict[str, Any]) -> Dict[str, str]:
+    return {env: str(resources[field]) for field, env in ENV_FIELDS.items() if field in resources}
+
+
+def mongo_command(resources: Dict[str, Any]) -> Optional[List[str]]:
+    """Arguments de mongod pour la taille du cache WiredTiger, ou None."""
+    if "mongo_cache_gb" not in resources:
+        return None
+    return [MONGO_CACHE_FLAG, str(resources["mongo_cache_gb"])]
+
+
+def current_resources(container) -> Dict[str, Any]:
+    """Ressources actuellement appliquées à un conteneur (limites, variables JVM, cache mongod)."""
+    host_config = container.attrs.get("HostConfig") or {}
+    resources: Dict[str, Any] = {}
+    if host_config.get("CpuQuota"):
+        period = host_config.get("CpuPeriod") or CPU_PERIOD
+        resources["cpus"] = host_config["CpuQuota"] / period
+    elif host_config.get("NanoCpus"):
+        resources["cpus"] = host_config["NanoCpus"] / 1e9
+    if host_config.get("Memory"):
+        resources["memory"] = host_config["Memory"]
+    if host_config.get("CpusetCpus"):
+        resources["cpuset"] = host_config["CpusetCpus"]
+
+    env = dict(item.split("=", 1) for item in container.attrs.get("Config", {}).get("Env") or [] if "=" in item)
+    for field, name in ENV_FIELDS.items():
+        if name in env:
+            resources[field] = env[name]
+
+    cmd = container.attrs.get("Config", {}).get("Cmd") or []
+    if cmd[:2] == ["bash", "-c"] and len(cmd) == 3:
+        # Commande enveloppée (membres d'un cluster MongoDB) : arguments du processus final
+        cmd = shlex.split(cmd[2])
+    if MONGO_CACHE_FLAG in cmd[:-1]:
+        resources["mongo_cache_gb"] = cmd[cmd.index(MONGO_CACHE_FLAG) + 1]
+    return resources
+
+
+def _same(field: str, current: Any, wanted: Any) -> bool:
+    if field == "memory":
+        return parse_size(current) == parse_size(wanted)
+    if field in ("cpus", "mongo_cache_gb"):
+        return float(current) == float(wanted)
+    return str(current) == str(wanted)
+
+
+def resource_changes(container, resources: Dict[str, Any]) -> Dict[str, Any]:
+    """Champs demandés dont la valeur diffère de celle du conteneur."""
+    current = current_resources(container)
+    return {
+        k: v for k, v in resources.items()
+        if k != "hbase_handler_count" and (k not in current or not _same(k, current[k], v))
+    }
+
+
+def requires_recreate(changes: Dict[str, Any]) -> bool:
+    """Les variables JVM et les arguments de mongod ne changent qu'en recréant le conteneur."""
+    return any(k not in LIMIT_FIELDS for k in changes)
+
+
+def apply_limits(container, changes: Dict[str, Any]) -> bool:
+    """Applique à chaud les limites modifiées (docker update). Retourne True si une limite a changé."""
+    limits = docker_limits({k: v for k, v in changes.items() if k in LIMIT_FIELDS})
+    if limits:
+        container.update(**limits)
+    return bool(limits)
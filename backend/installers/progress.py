@@ -0,0 +1,109 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Tuple
+
+# Nombre d'événements conservés par opération pendant son exécution
+PROGRESS_BUFFER = int(os.environ.get("BIGDATA_PROGRESS_BUFFER", "200"))
+# Nombre d'événements gardés une fois l'opération terminée
+PROGRESS_TAIL = 20
+# Longueur maximale d'une ligne de log diffusée
+MAX_LINE_LENGTH = 1000
+# Intervalle des commentaires keep-alive SSE (secondes)
+KEEPALIVE_INTERVAL = 15
+
+
+class ProgressChannel:
+    """
+    Canal de progression d'une opération : pourcentages, lignes de sortie
+    docker build/run et événement de fin. Les événements sont gardés dans un
+    tampon borné partagé par tous les abonnés ; un client lent perd les plus
+    anciens au lieu de faire grossir la mémoire du serveur.
+    """
+
+    def __init__(self, maxlen: int = PROGRESS_BUFFER):
+        self._events: deque = deque(maxlen=maxlen)
+        self._seq = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._listeners: set = set()
+
+    def publish(self, kind: str, **data: Any) -> None:
+        with self._lock:
+            if self._closed:
+                return
+            self._seq += 1
+            self._events.append((self._seq, kind, data))
+            listeners = list(self._listeners)
+        for loop, wake in listeners:
+            loop.call_soon_threadsafe(wake.set)
+
+    def progress(self, percent: int) -> None:
+        self.publish("progress", percent=percent)
+
+    def line(self, text: str, level: str = "INFO") -> None:
+        self.publish("log", line=text[:MAX_LINE_LENGTH], level=level)
+
+    def close(self, status: str, **data: Any) -> None:
+        """Publie l'événement de fin puis réduit le tampon à sa fin."""
+        self.publish("end", status=status, **data)
+        with self._lock:
+            self._closed = True
+            self._events = deque(list(self._events)[-PROGRESS_TAIL:], maxlen=PROGRESS_TAIL)
+            listeners = list(self._listeners)
+        for loop, wake in listeners:
+            loop.call_soon_threadsafe(wake.set)
+
+    def read_since(self, seq: int) -> Tuple[List[Tuple[int, str, Dict[str, Any]]], int, bool]:
+        """Retourne (événements après seq, nombre d'événements perdus, canal fermé)."""
+        with self._lock:
+            events = [e for e in self._events if e[0] > seq]
+            dropped = events[0][0] - seq - 1 if events else 0
+            return events, max(dropped, 0), self._closed
+
+    async def sse(self, last_seq: int = 0) -> AsyncIterator[str]:
+        """Générateur Server-Sent Events, reprenant après last_seq (Last-Event-ID)."""
+        listener = (asyncio.get_running_loop(), asyncio.Event())
+        with self._lock:
+            self._listeners.add(listener)
+        try:
+            while True:
+                listener[1].clear()
+                events, dropped, closed = self.read_since(last_seq)
+                if dropped:
+                    yield f"event: gap\ndata: {json.dumps({'dropped': dropped})}\n\n"
+                for seq, kind, data in events:
+                    yield f"id: {seq}\nevent: {kind}\ndata: {json.dumps(data)}\n\n"
+                    last_seq = seq
+                if closed:
+                    return
+                try:
+                    await asyncio.wait_for(listener[1].wait(), timeout=KEEPALIVE_INTERVAL)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+        finally:
+            with self._lock:
+                self._listeners.discard(listener)
+
+
+class ChannelLogger(logging.LoggerAdapter):
+    """
+    Logger passé aux installateurs : chaque message de niveau INFO ou plus
+    est aussi publié sur le canal de progression de l'opération. Les lignes
+    brutes de run_command, build_image et exec y arrivent par leur
+    OutputCapture (voir output.channel_callback).
+    """
+
+    def __init__(self, logger: logging.Logger, channel: ProgressChannel, prefix: str = ""):
+        super().__init__(logger, {})
+        self.channel = channel
+        self.prefix = prefix
+
+    def log(self, level: int, msg: Any, *args: Any, **kwargs: Any) -> None:
+        if level >= logging.INFO:
+            text = str(msg) % args if args else str(msg)
+            self.channel.line(self.prefix + text, logging.getLevelName(level))
+        super().log(level, msg, *args, **kwargs)
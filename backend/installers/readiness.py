@@ -0,0 +1,198 @@
+import json
+import os
+import socket
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Any, Callable, Dict, Optional
+
+from docker.errors import DockerException
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from .events import event_container_name, watcher
+from .utils import get_container
+
+# Hôte sur lequel les ports publiés des conteneurs sont joignables. Backend lui-même
+# dans un conteneur (docker-compose.yml) : l'hôte Docker, par ex. host.docker.internal
+PROBE_HOST = os.environ.get("BIGDATA_PROBE_HOST", "localhost")
+
+# Actions Docker qui réveillent les attentes sur un conteneur
+WAKE_ACTIONS = ("start", "die", "destroy", "health_status")
+
+Probe = Callable[[Any], bool]
+
+
+class _Waiters:
+    """Condition partagée par les attentes sur un même conteneur."""
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.generation = 0
+        self.refs = 0
+
+
+class ContainerWaiter:
+    """
+    Attentes pilotées par les événements Docker : un appelant bloqué sur un
+    conteneur est réveillé dès qu'un événement le concernant arrive, au lieu
+    de relancer une commande toutes les 0,5 s.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._waiters: Dict[str, _Waiters] = {}
+        watcher.subscribe(self._on_event)
+
+    def _on_event(self, event: Dict[str, Any]) -> None:
+        action = event.get("Action", "")
+        if not action.startswith(WAKE_ACTIONS):
+            return
+        with self._lock:
+            entry = self._waiters.get(event_container_name(event))
+        if entry is not None:
+            with entry.condition:
+                entry.generation += 1
+                entry.condition.notify_all()
+
+    def wait_for(self, name: str, predicate: Callable[[], bool], timeout: float,
+                 max_interval: Optional[float] = None) -> bool:
+        """
+        Attend que predicate() soit vrai, en le réévaluant à chaque événement
+        Docker sur 'name'. Si max_interval est fourni, il est aussi réévalué
+        avec un backoff exponentiel plafonné (utile pour les sondes réseau,
+        qui n'émettent pas d'événement).
+        """
+        watcher.start()
+        with self._lock:
+            entry = self._waiters.setdefault(name, _Waiters())
+            entry.refs += 1
+        deadline = time.monotonic() + timeout
+        delay = 0.05
+        try:
+            while True:
+                with entry.condition:
+                    seen = entry.generation
+                # Le prédicat (appel API, sonde réseau) est évalué hors verrou
+                if predicate():
+                    return True
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                if max_interval is not None:
+                    remaining = min(remaining, delay)
+                    delay = min(delay * 2, max_interval)
+                with entry.condition:
+                    if entry.generation == seen:
+                        entry.condition.wait(remaining)
+        finally:
+            with self._lock:
+                entry.refs -= 1
+                if entry.refs == 0:
+                    del self._waiters[name]
+
+
+waiter = ContainerWaiter()
+
+
+def published_port(container, container_port: str) -> Optional[int]:
+    """Port de l'hôte sur lequel 'container_port' (ex. '8080/tcp') est publié."""
+    bindings = container.attrs.get("NetworkSettings", {}).get("Ports", {}).get(container_port)
+    if not bindings:
+        return None
+    return int(bindings[0]["HostPort"])
+
+
+def tcp_probe(container_port: str) -> Probe:
+    """Sonde : connexion TCP au port publié."""
+    def probe(container) -> bool:
+        port = published_port(container, container_port)
+        if port is None:
+            return False
+        try:
+            with socket.create_connection((PROBE_HOST, port), timeout=1):
+                return True
+        except OSError:
+            return False
+    return probe
+
+
+def http_probe(container_port: str, path: str = "/") -> Probe:
+    """Sonde : requête HTTP sur le port publié (interface web Spark ou HBase)."""
+    def probe(container) -> bool:
+        port = published_port(container, container_port)
+        if port is None:
+            return False
+        try:
+            with urllib.request.urlopen(f"http://{PROBE_HOST}:{port}{path}", timeout=2) as resp:
+                return resp.status < 500
+        except urllib.error.HTTPError as e:
+            return e.code < 500
+        except (OSError, ValueError):
+            return False
+    return probe
+
+
+def http_json_probe(container_port: str, path: str, check: Callable[[Any], bool]) -> Probe:
+    """Sonde : document JSON servi sur le port publié, validé par 'check' (workers Spark, JMX HBase)."""
+    def probe(container) -> bool:
+        port = published_port(container, container_port)
+        if port is None:
+            return False
+        try:
+            with urllib.request.urlopen(f"http://{PROBE_HOST}:{port}{path}", timeout=2) as resp:
+                return bool(check(json.load(resp)))
+        except (OSError, ValueError, KeyError, TypeError):
+            return False
+    return probe
+
+
+def mongo_ping_probe(container_port: str = "27017/tcp") -> Probe:
+    """Sonde : commande 'ping' MongoDB (ne nécessite pas d'authentification)."""
+    def probe(container) -> bool:
+        port = published_port(container, container_port)
+        if port is None:
+            return False
+        client = MongoClient(PROBE_HOST, port, directConnection=True,
+                             serverSelectionTimeoutMS=1000, connectTimeoutMS=1000)
+        try:
+            client.admin.command("ping")
+            return True
+        except PyMongoError:
+            return False
+        finally:
+            client.close()
+    return probe
+
+
+def exec_probe(cmd: list, check: Callable[[str], bool]) -> Probe:
+    """Sonde : commande exécutée dans le conteneur (docker exec), sortie validée par 'check'."""
+    def probe(container) -> bool:
+        try:
+            code, output = container.exec_run(cmd)
+        except DockerException:
+            return False
+        return code == 0 and bool(check(output.decode("utf-8", errors="replace").strip()))
+    return probe
+
+
+def wait_for_removal(container_name: str, timeout: float = 10) -> None:
+    """Attend la suppression effective d'un conteneur (événement 'destroy')."""
+    if not waiter.wait_for(container_name, lambda: get_container(container_name) is None, timeout):
+        raise RuntimeError(f"{container_name} non supprimé après {timeout} secondes.")
+
+
+def wait_until_ready(container_name: str, probe: Probe, timeout: float = 60) -> None:
+    """
+    Attend que le conteneur tourne et que la sonde de service réponde.
+    Échoue immédiatement si le conteneur s'arrête entre-temps.
+    """
+    def ready() -> bool:
+        container = get_container(container_name)
+        if container is None or container.status in ("exited", "dead"):
+            raise RuntimeError(f"{container_name} s'est arrêté pendant le démarrage.")
+        return container.status == "running" and probe(container)
+
+    if not waiter.wait_for(container_name, ready, timeout, max_interval=1.0):
+        raise RuntimeError(f"{container_name} non prêt après {timeout} secondes.")
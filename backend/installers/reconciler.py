@@ -0,0 +1,393 @@
+import copy
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from . import readiness
+from .images import BUILD_CONTEXTS, expected_image, image_matches
+from .jobs import Job, engine
+from .inventory import inventory
+from .ports import port_allocator
+from .profiles import resource_changes
+from .reload import NOOP, RECREATE, RESTART, stronger
+from .state import StateStore, persist, state_store
+from .utils import CLUSTER_LABEL, get_container
+from .warm_pool import POOL_PREFIX, start_or_claim
+
+logger = logging.getLogger("installer_logger")
+
+# Délai de regroupement des PUT successifs sur un conteneur avant réconciliation (secondes)
+RECONCILE_DEBOUNCE = float(os.environ.get("BIGDATA_RECONCILE_DEBOUNCE", "2"))
+# Attente maximale d'une réconciliation repoussée par des PUT continus (secondes)
+RECONCILE_MAX_DELAY = float(os.environ.get("BIGDATA_RECONCILE_MAX_DELAY", "10"))
+# Resynchronisation périodique de tous les conteneurs déclarés (secondes, 0 pour désactiver)
+RECONCILE_INTERVAL = float(os.environ.get("BIGDATA_RECONCILE_INTERVAL", "0"))
+
+# Port principal de chaque outil : (clé de config de l'installateur, port du conteneur)
+MAIN_PORTS = {
+    "spark": ("port", "8080/tcp"),
+    "hbase": ("master_port", "16010/tcp"),
+    "mongodb": ("port", "27017/tcp"),
+}
+# Taille de cluster ajustable par scale() : outil -> (clé de config, méthode de listage des membres)
+CLUSTER_SIZES = {
+    "spark": ("workers", "list_workers"),
+    "hbase": ("regionservers", "list_regionservers"),
+}
+
+MakeInstaller = Callable[..., Any]
+
+
+def declared_port(entry: Dict[str, Any]) -> Optional[int]:
+    """Port principal déclaré ; pour MongoDB, les 'ports' de la configuration priment (voir config_drift)."""
+    if entry["tool"] == "mongodb" and entry["config"].get("ports"):
+        return None
+    return entry["spec"].get(MAIN_PORTS[entry["tool"]][0])
+
+
+class DesiredStateStore:
+    """
+    État souhaité de chaque conteneur déclaré (PUT /tools/{outil}/{conteneur}) :
+    paramètres de l'installateur (spec), configuration de l'outil, image, et
+    état de sa dernière réconciliation. Chaque changement incrémente la
+    génération ; un PUT identique à l'état courant ne change rien.
+    Les états sont servis depuis la mémoire et écrits dans la base d'état
+    (instances, config_history), rechargée au démarrage.
+    """
+
+    def __init__(self, backend: Optional[StateStore] = None):
+        self._lock = threading.Lock()
+        self._states: Dict[str, Dict[str, Any]] = {}
+        self._backend = backend
+
+    def _persist(self, entry: Dict[str, Any], new_generation: bool = False) -> None:
+        if self._backend is not None:
+            persist(self._backend.save_instance, entry, new_generation)
+
+    def load(self) -> int:
+        """Recharge les états enregistrés ; retourne leur nombre."""
+        if self._backend is None:
+            return 0
+        rows = self._backend.instances()
+        with self._lock:
+            for row in rows:
+                row.pop("container_id", None)
+                self._states[row["container_name"]] = row
+        return len(rows)
+
+    def put(self, tool: str, container_name: str, spec: Dict[str, Any], config: Dict[str, Any],
+            image: Optional[str] = None) -> Tuple[Dict[str, Any], bool]:
+        """Remplace l'état souhaité. Retourne (état, changé)."""
+        desired = {"tool": tool, "spec": spec, "config": config, "image": image}
+        with self._lock:
+            current = self._states.get(container_name)
+            if current is not None and all(current[k] == v for k, v in desired.items()):
+                return copy.deepcopy(current), False
+            entry = {
+                "container_name": container_name,
+                **copy.deepcopy(desired),
+                "generation": current["generation"] + 1 if current else 1,
+                "updated_at": time.time(),
+                "status": current["status"] if current else {"observed_generation": 0},
+            }
+            self._states[container_name] = entry
+            self._persist(entry, new_generation=True)
+            return copy.deepcopy(entry), True
+
+    def merge(self, tool: str, container_name: str, spec: Dict[str, Any],
+              config: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], bool]:
+        """Met à jour une partie de l'état souhaité (routes start et update-config)."""
+        with self._lock:
+            current = copy.deepcopy(self._states.get(container_name))
+        if current is None or current["tool"] != tool:
+            return self.put(tool, container_name, spec, config or {})
+        return self.put(tool, container_name, {**current["spec"], **spec},
+                        current["config"] if config is None else config, current["image"])
+
+    def adopt(self, container_name: str, key: str, value: Any) -> None:
+        """Reprend dans la spec une valeur choisie à l'installation (port réattribué), sans nouvelle génération."""
+        with self._lock:
+            entry = self._states.get(container_name)
+            if entry is not None:
+                entry["spec"][key] = value
+                self._persist(entry)
+
+    def set_status(self, container_name: str, **status: Any) -> None:
+        with self._lock:
+            entry = self._states.get(container_name)
+            if entry is not None:
+                entry["status"] = {**entry["status"], **status}
+                self._persist(entry)
+
+    def get(self, container_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return copy.deepcopy(self._states.get(container_name))
+
+    def forget(self, container_name: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._states.pop(container_name, None)
+            if entry is not None and self._backend is not None:
+                persist(self._backend.delete_instance, container_name)
+            return entry
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return list(self._states)
+
+
+class Reconciler:
+    """
+    Ramène chaque conteneur déclaré vers son état souhaité. Les PUT sont
+    regroupés par conteneur (RECONCILE_DEBOUNCE) : une rafale de mises à jour
+    donne un seul job 'reconcile', qui lit l'état souhaité le plus récent au
+    moment où il s'exécute. Le job compare l'état souhaité à l'état réel
+    (inspect Docker, configuration lue via le cache) et fait le minimum :
+    rien si tout correspond, sinon la stratégie la moins coûteuse de
+    l'installateur (à chaud, redémarrage, recréation).
+    """
+
+    def __init__(self, store: DesiredStateStore, debounce: float = RECONCILE_DEBOUNCE,
+                 max_delay: float = RECONCILE_MAX_DELAY, interval: float = RECONCILE_INTERVAL):
+        self.store = store
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.interval = interval
+        self._cond = threading.Condition()
+        self._due: Dict[str, float] = {}
+        self._first: Dict[str, float] = {}
+        self._make_installer: Optional[MakeInstaller] = None
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, make_installer: MakeInstaller) -> None:
+        """Démarre la boucle de réconciliation (make_installer : voir routers.tools.get_installer)."""
+        with self._cond:
+            self._make_installer = make_installer
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="reconciler", daemon=True)
+            self._thread.start()
+
+    def schedule(self, container_name: str) -> float:
+        """Programme une réconciliation regroupée ; retourne son échéance (time.time())."""
+        now = time.time()
+        with self._cond:
+            first = self._first.setdefault(container_name, now)
+            self._due[container_name] = min(now + self.debounce, first + self.max_delay)
+            self._cond.notify()
+            return self._due[container_name]
+
+    def submit(self, container_name: str, make_installer: Optional[MakeInstaller] = None,
+               action: str = "reconcile") -> Job:
+        """Soumet immédiatement le job de réconciliation d'un conteneur (annule l'échéance regroupée)."""
+        with self._cond:
+            self._due.pop(container_name, None)
+            self._first.pop(container_name, None)
+            make_installer = make_installer or self._make_installer
+        entry = self.store.get(container_name)
+        tool = entry["tool"] if entry else "unknown"
+        job = engine.submit(tool, action, container_name,
+                            lambda job: self.reconcile(container_name, job, make_installer))
+        self.store.set_status(container_name, job_id=job.id)
+        return job
+
+    def _run(self) -> None:
+        next_resync = time.time() + self.interval if self.interval > 0 else None
+        while True:
+            with self._cond:
+                now = time.time()
+                deadlines = list(self._due.values()) + ([next_resync] if next_resync else [])
+                if not deadlines or min(deadlines) > now:
+                    self._cond.wait(min(deadlines) - now if deadlines else None)
+                    continue
+                due = [name for name, at in self._due.items() if at <= now]
+            if next_resync and next_resync <= now:
+                due = sorted(set(due) | set(self.store.names()))
+                next_resync = now + self.interval
+            for name in due:
+                try:
+                    self.submit(name)
+                except Exception as e:
+                    logger.exception(f"Réconciliation de {name} non soumise : {e}")
+
+    # ------------------- RÉCONCILIATION -------------------
+
+    def reconcile(self, container_name: str, job: Job, make_installer: MakeInstaller) -> Dict[str, Any]:
+        """Corps du job : observe les écarts puis les corrige avec l'installateur de l'outil."""
+        entry = self.store.get(container_name)
+        if entry is None:
+            return {"status": "absent", "strategy": NOOP, "changed": []}
+        tool = entry["tool"]
+        config = {"container_name": container_name, **entry["spec"]}
+        if entry["image"]:
+            config["image"] = entry["image"]
+        installer = make_installer(tool, config, job)
+        try:
+            result = self.converge(entry, installer)
+        except Exception as e:
+            self.store.set_status(container_name, error=str(e), reconciled_at=time.time())
+            raise
+        self.store.set_status(
+            container_name,
+            observed_generation=entry["generation"],
+            strategy=result["strategy"],
+            drift=sorted(result["drift"]),
+            applied_config=entry["config"],
+            error=None,
+            reconciled_at=time.time(),
+        )
+        if result["strategy"] != NOOP:
+            container = get_container(container_name)
+            persist(state_store.set_container_id, container_name, container.id if container else None)
+        return {**result, "tool": tool, "container_name": container_name, "generation": entry["generation"]}
+
+    def observe(self, entry: Dict[str, Any], installer: Any) -> Dict[str, Any]:
+        """Écarts entre l'état souhaité et le conteneur : {} s'il est conforme."""
+        tool, name, spec = entry["tool"], entry["container_name"], entry["spec"]
+        container = get_container(name)
+        if container is None:
+            return {"missing": True}
+        if container.status != "running":
+            return {"stopped": container.status}
+
+        drift: Dict[str, Any] = {}
+        if entry["image"] or tool in BUILD_CONTEXTS:
+            reference = expected_image(tool, entry["image"])
+            if not image_matches(container, reference):
+                drift["image"] = reference
+        port = declared_port(entry)
+        if port and readiness.published_port(container, MAIN_PORTS[tool][1]) != port:
+            drift["port"] = port
+        resources = resource_changes(container, installer.resources())
+        if resources:
+            drift["resources"] = sorted(resources)
+        if entry["config"]:
+            changes = installer.config_drift(container, entry["config"], entry["status"].get("applied_config") or {})
+            if changes:
+                drift["config"] = sorted(changes)
+        if tool in CLUSTER_SIZES and container.labels.get(CLUSTER_LABEL) == name:
+            size_key, list_members = CLUSTER_SIZES[tool]
+            wanted = spec.get(size_key)
+            if wanted is not None and len(getattr(installer, list_members)()) != wanted:
+                drift["size"] = wanted
+        return drift
+
+    def converge(self, entry: Dict[str, Any], installer: Any) -> Dict[str, Any]:
+        tool, name = entry["tool"], entry["container_name"]
+        drift = self.observe(entry, installer)
+        if not drift:
+            installer.logger.info(f"{name} conforme à l'état souhaité, rien à faire.")
+            return {"status": "unchanged", "strategy": NOOP, "changed": [], "drift": {}}
+        installer.logger.info(f"Écarts de {name} avec l'état souhaité : {sorted(drift)}")
+
+        if "missing" in drift:
+            result = start_or_claim(tool, installer)
+            port_key, _ = MAIN_PORTS[tool]
+            if installer.config.get(port_key):
+                self.store.adopt(name, port_key, installer.config[port_key])
+            if entry["config"]:
+                self.apply(entry, installer, {})
+            return {**result, "strategy": RECREATE, "changed": ["container"], "drift": drift}
+
+        # La taille d'un cluster existant ne passe que par scale(), jamais par une recréation
+        for size_key, _ in CLUSTER_SIZES.values():
+            installer.config.pop(size_key, None)
+
+        strategy, changed = NOOP, []
+        if "stopped" in drift:
+            installer.logger.info(f"Redémarrage de {name} ({drift['stopped']})...")
+            get_container(name).start()
+            strategy, changed = RESTART, ["status"]
+            drift = {**self.observe(entry, installer), "stopped": drift["stopped"]}
+
+        if "image" in drift and tool in BUILD_CONTEXTS:
+            installer.recreate_with_config(self.wanted_config(entry, installer))
+            strategy, changed = RECREATE, changed + ["image"]
+        elif drift.keys() & {"image", "port", "resources", "config"}:
+            result = self.apply(entry, installer, drift)
+            strategy = stronger(strategy, result["strategy"])
+            changed += result["changed"]
+
+        if "size" in drift:
+            installer.scale(drift["size"])
+            strategy, changed = stronger(strategy, RESTART), changed + ["size"]
+
+        if strategy != NOOP and not installer.test_installation():
+            raise RuntimeError(f"{name} non fonctionnel après réconciliation.")
+        return {"status": "updated", "strategy": strategy, "changed": sorted(set(changed)), "drift": drift}
+
+    def wanted_config(self, entry: Dict[str, Any], installer: Any) -> Dict[str, Any]:
+        """Configuration à appliquer : celle déclarée, sinon la configuration courante (conservée)."""
+        return entry["config"] or installer.get_configuration()
+
+    def apply(self, entry: Dict[str, Any], installer: Any, drift: Dict[str, Any]) -> Dict[str, Any]:
+        """Applique la configuration par la mise à jour de l'installateur (noop, à chaud, redémarrage, recréation)."""
+        if entry["tool"] == "mongodb":
+            config = dict(entry["config"])
+            if "port" in drift:
+                config["ports"] = {"27017/tcp": [{"HostIp": "", "HostPort": str(drift["port"])}]}
+            return installer.update_config(config)
+        return installer.restart_with_new_config(self.wanted_config(entry, installer))
+
+
+def adoptable(container: Dict[str, Any]) -> bool:
+    """Conteneur géré (résumé de l'inventaire) à reprendre comme instance : ni membre de cluster ni pool chaud."""
+    labels = container["labels"]
+    return (
+        labels.get("bigdata.tool") in MAIN_PORTS
+        and labels.get(CLUSTER_LABEL, container["name"]) == container["name"]
+        and not container["name"].startswith(POOL_PREFIX)
+    )
+
+
+def recover() -> Dict[str, int]:
+    """
+    Reprise au démarrage, en une seule confrontation avec l'inventaire Docker :
+    états souhaités et baux de ports rechargés depuis la base (les baux des
+    conteneurs disparus sont libérés), conteneurs gérés encore inconnus repris
+    comme instances, opérations interrompues par l'arrêt du backend marquées
+    en échec et leurs conteneurs déclarés re-réconciliés.
+    """
+    loaded = desired_states.load()
+    try:
+        containers = {c["name"]: c for c in inventory.snapshot(created_by="mon_app")[1]}
+    except Exception as e:
+        # Sans Docker, rien n'est libéré ni repris : la prochaine reprise confrontera la base
+        logger.warning(f"Reprise sans inventaire Docker : {e}")
+        port_allocator.restore(state_store.leases())
+        return {"instances": loaded, "adopted": 0, "interrupted": 0, "leases": 0}
+
+    leases = state_store.leases()
+    kept = {name: ports for name, ports in leases.items() if name in containers or desired_states.get(name)}
+    port_allocator.restore(kept)
+    for name in set(leases) - set(kept):
+        persist(state_store.delete_leases, name)
+
+    adopted = 0
+    for name, container in containers.items():
+        if desired_states.get(name) is not None or not adoptable(container):
+            continue
+        tool = container["labels"]["bigdata.tool"]
+        port_key, container_port = MAIN_PORTS[tool]
+        bindings = container["ports"].get(container_port) or []
+        spec = {port_key: int(bindings[0]["HostPort"])} if bindings else {}
+        entry, _ = desired_states.put(tool, name, spec, {})
+        desired_states.set_status(name, observed_generation=entry["generation"], adopted=True)
+        adopted += 1
+    for name in desired_states.names():
+        container = containers.get(name)
+        persist(state_store.set_container_id, name, container["id"] if container else None)
+
+    interrupted = state_store.interrupt_operations("Opération interrompue par un redémarrage du backend.")
+    for name in {op["container_name"] for op in interrupted}:
+        if desired_states.get(name) is not None:
+            reconciler.schedule(name)
+    persist(state_store.prune_operations)
+    result = {"instances": loaded, "adopted": adopted, "interrupted": len(interrupted), "leases": len(kept)}
+    logger.info(f"État persistant repris : {result}")
+    return result
+
+
+desired_states = DesiredStateStore(state_store)
+reconciler = Reconciler(desired_states)
@@ -0,0 +1,25 @@
+from typing import Any, Dict
+
+# Stratégies d'application d'une nouvelle configuration, de la moins coûteuse à la plus coûteuse
+NOOP = "noop"            # rien n'a changé
+IN_PLACE = "in_place"    # appliqué à chaud, sans redémarrage
+RESTART = "restart"      # seul le processus concerné est relancé (le conteneur est conservé)
+RECREATE = "recreate"    # conteneur supprimé puis recréé (ports ou volumes modifiés)
+
+
+_ORDER = (NOOP, IN_PLACE, RESTART, RECREATE)
+
+
+def stronger(a: str, b: str) -> str:
+    """La plus coûteuse de deux stratégies."""
+    return max(a, b, key=_ORDER.index)
+
+
+def diff_config(current: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    """Clés de 'new' dont la valeur diffère de la configuration courante."""
+    return {k: v for k, v in new.items() if k not in current or str(current[k]) != str(v)}
+
+
+def update_result(strategy: str, changes: Dict[str, Any]) -> Dict[str, Any]:
+    """Réponse commune des mises à jour de configuration."""
+    return {"strategy": strategy, "changed": sorted(changes)}
@@ -0,0 +1,49 @@
+# Chargement en flux dans une table HBase (POST /tools/hbase/{conteneur}/ingest), lancé par
+# 'hbase shell -n'. Entrée standard : une ligne TSV par ligne de table,
+# "clé<TAB>colonne<TAB>valeur<TAB>colonne<TAB>valeur..." avec \\, \t et \n échappés.
+# Les Puts sont envoyés par lots de BIGDATA_INGEST_BATCH lignes ; le rapport JSON est la dernière ligne.
+java_import org.apache.hadoop.hbase.HBaseConfiguration
+java_import org.apache.hadoop.hbase.TableName
+java_import org.apache.hadoop.hbase.client.ConnectionFactory
+java_import org.apache.hadoop.hbase.client.Put
+java_import org.apache.hadoop.hbase.util.Bytes
+
+UNESCAPED = { 't' => "\t", 'n' => "\n", '\\' => '\\' }
+
+def unescape(value)
+  value.gsub(/\\([tn\\])/) { UNESCAPED[$1] }
+end
+
+family = Bytes.toBytes(ENV['BIGDATA_INGEST_FAMILY'])
+batch_size = ENV['BIGDATA_INGEST_BATCH'].to_i
+connection = ConnectionFactory.createConnection(HBaseConfiguration.create)
+table = connection.getTable(TableName.valueOf(ENV['BIGDATA_INGEST_TABLE']))
+started = Time.now
+rows = 0
+batches = 0
+batch = java.util.ArrayList.new
+
+$stdin.set_encoding('UTF-8')
+$stdin.each_line do |line|
+  fields = line.chomp("\n").split("\t", -1)
+  next if fields.size < 3
+  put = Put.new(Bytes.toBytes(unescape(fields[0])))
+  fields[1..-1].each_slice(2) do |column, value|
+    put.addColumn(family, Bytes.toBytes(unescape(column)), Bytes.toBytes(unescape(value.to_s)))
+  end
+  batch.add(put)
+  rows += 1
+  next if batch.size < batch_size
+  table.put(batch)
+  batches += 1
+  batch = java.util.ArrayList.new
+end
+unless batch.isEmpty
+  table.put(batch)
+  batches += 1
+end
+
+table.close
+connection.close
+puts "{\"rows\": #{rows}, \"batches\": #{batches}, \"elapsed_ms\": #{((Time.now - started) * 1000).round}}"
+exit
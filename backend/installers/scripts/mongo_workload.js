@@ -0,0 +1,36 @@
+// mongo_workload.js
+// Charge de type YCSB exécutée par mongosh dans le conteneur MongoDB.
+// Paramètres fournis avant le chargement du script : const params = {records, operations, read_proportion, field_length}
+// Affiche un rapport JSON sur la dernière ligne.
+const now = () => (typeof performance !== "undefined" ? performance.now() : Date.now());
+const coll = db.getSiblingDB("bigdata_benchmark").getCollection("usertable");
+coll.drop();
+
+const value = "x".repeat(params.field_length);
+const load = [];
+let start = now();
+for (let i = 0; i < params.records; i++) {
+  const t = now();
+  coll.insertOne({ _id: "user" + i, field0: value, field1: value });
+  load.push(now() - t);
+}
+const loadMs = now() - start;
+
+const reads = [];
+const updates = [];
+start = now();
+for (let i = 0; i < params.operations; i++) {
+  const key = "user" + Math.floor(Math.random() * params.records);
+  const t = now();
+  if (Math.random() < params.read_proportion) {
+    coll.findOne({ _id: key });
+    reads.push(now() - t);
+  } else {
+    coll.updateOne({ _id: key }, { $set: { field0: value } });
+    updates.push(now() - t);
+  }
+}
+const runMs = now() - start;
+coll.drop();
+
+print(JSON.stringify({ load_ms: loadMs, run_ms: runMs, insert: load, read: reads, update: updates }));
@@ -0,0 +1,55 @@
+# spark_workload.py
+# Charge de référence exécutée par spark-submit dans le conteneur Spark :
+#   spark-submit spark_workload.py --workload groupby|terasort --rows N --partitions P [--keys K] [--iterations I]
+# Affiche un rapport JSON sur la dernière ligne.
+import argparse
+import json
+import time
+
+from pyspark.sql import SparkSession
+from pyspark.sql import functions as F
+
+
+def groupby(spark, args):
+    """Agrégation par clé sur des données générées (shuffle de 'keys' groupes)."""
+    df = spark.range(args.rows, numPartitions=args.partitions).select(
+        (F.col("id") % args.keys).alias("k"), F.rand(seed=42).alias("v")
+    )
+    return df.groupBy("k").agg(F.sum("v"), F.count("*")).count()
+
+
+def terasort(spark, args):
+    """TeraSort allégé : tri global de clés de 10 caractères générées."""
+    df = spark.range(args.rows, numPartitions=args.partitions).select(
+        F.substring(F.sha2(F.col("id").cast("string"), 256), 1, 10).alias("key"), F.col("id").alias("value")
+    )
+    df.sort("key").write.format("noop").mode("overwrite").save()
+    return args.rows
+
+
+WORKLOADS = {"groupby": groupby, "terasort": terasort}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workload", choices=sorted(WORKLOADS), default="groupby")
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--partitions", type=int, default=8)
+    parser.add_argument("--keys", type=int, default=1000)
+    parser.add_argument("--iterations", type=int, default=3)
+    args = parser.parse_args()
+
+    spark = SparkSession.builder.appName(f"bigdata-benchmark-{args.workload}").getOrCreate()
+    spark.sparkContext.setLogLevel("ERROR")
+    durations = []
+    for _ in range(args.iterations):
+        start = time.perf_counter()
+        WORKLOADS[args.workload](spark, args)
+        durations.append((time.perf_counter() - start) * 1000)
+    spark.stop()
+    print(json.dumps({"workload": args.workload, "rows": args.rows, "iterations": args.iterations,
+                      "durations_ms": durations}))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,32 @@
 from .base import BaseInstaller
-from .utils import run_command, run_docker_command
+from . import readiness
+from .agents import AgentUnavailable, agent_port_binding, agent_pool
+from .config_cache import config_cache
+from .images import build_manager
+from .ingest import parquet_available
+from .profiles import apply_limits, current_resources, requires_recreate, resource_changes, resource_env
+from .reload import IN_PLACE, NOOP, RECREATE, RESTART, diff_config, stronger, update_result
+from .ports import port_allocator
+from .cluster import list_members, member_name, plan_scale, remove_members, start_members
+from .utils import (
+    CLUSTER_LABEL, cluster_labels, cluster_network, create_network, docker_available,
+    copy_to_container, exec_in_container, get_container, managed_labels, remove_container,
+    remove_network, run_container, stop_container,
+)
+from .workloads import WORKLOAD_DIR, last_json_line, phase_result, read_script
 import json
-import socket
+import shlex
 import re
-import time
 import os
 import platform
 
+# Processus principal du conteneur : master Spark (interface web sur 8080)
+SPARK_START_CMD = "/opt/bitnami/scripts/spark/entrypoint.sh /opt/bitnami/scripts/spark/run.sh"
+# Port RPC du master en mode cluster (joint par les workers sur le réseau du cluster)
+SPARK_MASTER_PORT = 7077
+# Dossier du conteneur monté sur get_volume_path(conteneur) (cible des ingestions)
+SPARK_WORKSPACE = "/opt/bitnami/spark/workspace"
+
 
 def extraire_json_sortie(stdout: str):
     """Tente d'extraire un bloc JSON depuis une sortie qui pourrait contenir d'autres logs."""
@@ -28,25 +48,14 @@ def get_volume_path(container_name: str) -> str:
 
 
 class SparkInstaller(BaseInstaller):
+    tool_name = "spark"
 
     def check_prerequisites(self) -> None:
-        # Utiliser run_docker_command pour vérifier Docker
-        code, _ = run_docker_command("--version", self.logger)
-        if code != 0:
+        if not docker_available(self.logger):
             raise RuntimeError("Docker n'est pas installé ou disponible dans le PATH.")
         self.logger.info("Docker est installé.")
         self.progress(10)
 
-    def is_port_in_use(self, port: int) -> bool:
-        with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
-            return s.connect_ex(('localhost', port)) == 0
-
-    def find_available_port(self, start=8000, end=9000) -> int:
-        for port in range(start, end):
-            if not self.is_port_in_use(port):
-                return port
-        raise RuntimeError("Aucun port libre entre 8000 et 9000.")
-
     def install(self) -> None:
         container_name = self.config.get("container_name", "spark_container")
         username = self.config.get("username", "admin")
@@ -56,88 +65,185 @@ class SparkInstaller(BaseInstaller):
         if not isinstance(requested_port, int) or requested_port <= 0:
             raise RuntimeError("Port invalide.")
 
-        if self.is_port_in_use(requested_port):
-            self.logger.warning(f"Port {requested_port} déjà utilisé. Recherche d’un port libre...")
-            requested_port = self.find_available_port()
+        port, = port_allocator.allocate(container_name, [(requested_port, 8000, 9000)])
+        if port != requested_port:
+            self.logger.warning(f"Port {requested_port} déjà utilisé, port {port} attribué.")
+            requested_port = port
             self.config["port"] = requested_port
 
-        image_name = "custom-spark-image"
-        dockerfile_path = "./backend/docker/spark"
         volume_path = get_volume_path(container_name)
 
-        self.logger.info("Construction de l'image Docker Spark...")
-        build_cmd = f"docker build -t {image_name} {dockerfile_path}"
-        code, output = run_command(build_cmd, self.logger)
-        if code != 0:
-            raise RuntimeError(f"Échec du build Docker : {output}")
+        self.logger.info("Préparation de l'image Docker Spark...")
+        image_name = build_manager.ensure_tool_image("spark", self.logger)
 
+        labels, environment, options = self.master_options(container_name)
         self.logger.info("Lancement du conteneur Spark...")
-        run_cmd_str = (
-            f"run -d "
-            f"--name {container_name} "
-            f"--label myapp=mon_interface "
-            f"--label created_by=mon_app "
-            f"-e SPARK_USER={username} "
-            f"-e SPARK_PASSWORD={password} "
-            f"-e HOME=/home/sparkuser "
-            f"-p {requested_port}:8080 "
-            f"-v {volume_path}:/opt/bitnami/spark/workspace "
-            f"{image_name}"
+        code, output = run_container(
+            image_name,
+            self.logger,
+            name=container_name,
+            **self.container_options(labels),
+            **options,
+            environment={
+                "SPARK_USER": username,
+                "SPARK_PASSWORD": password,
+                "HOME": "/home/sparkuser",
+                **resource_env(self.resources()),
+                **environment,
+            },
+            ports={"8080/tcp": requested_port, **agent_port_binding()},
+            volumes={volume_path: {"bind": SPARK_WORKSPACE, "mode": "rw"}},
         )
-
-        # Utiliser run_docker_command (le "docker" est ajouté automatiquement)
-        code, output = run_docker_command(run_cmd_str, self.logger)
         if code != 0:
+            port_allocator.release(container_name)
+            remove_network(cluster_network(container_name), self.logger)
             raise RuntimeError(f"Erreur lancement conteneur : {output}")
+        self.progress(70)
+
+        if self.workers():
+            try:
+                self.start_workers(image_name, range(self.workers()))
+            except RuntimeError:
+                # Pas de cluster partiel : le groupe entier est supprimé
+                self.rollback()
+                raise
 
         self.logger.info(f"Conteneur Spark démarré sur le port {requested_port}.")
         self.progress(100)
 
+    # ------------------- MODE CLUSTER -------------------
+
+    def workers(self) -> int:
+        return int(self.config.get("workers") or 0)
+
+    def master_options(self, container_name: str):
+        """
+        (labels, environnement, options docker run) du master. En mode cluster,
+        il rejoint le réseau dédié où les workers le joignent par son nom.
+        """
+        if not self.workers() and not self.config.get("cluster"):
+            return managed_labels("spark"), {}, {}
+        network = cluster_network(container_name)
+        create_network(network, managed_labels("spark"), self.logger)
+        environment = {
+            "SPARK_MODE": "master",
+            # Écouter sur l'interface du réseau du cluster, pas sur 127.0.0.1 (Dockerfile)
+            "SPARK_LOCAL_IP": container_name,
+            "SPARK_MASTER_HOST": container_name,
+        }
+        options = {"network": network, "hostname": container_name}
+        return cluster_labels("spark", container_name, "master"), environment, options
+
+    def list_workers(self) -> dict:
+        """Workers existants du cluster, par index."""
+        return list_members(self.config.get("container_name", "spark_container"), "worker")
+
+    def start_workers(self, image_name: str, indexes) -> None:
+        """Lance des workers (en parallèle) rattachés au master par spark://<master>:7077."""
+        container_name = self.config.get("container_name", "spark_container")
+        environment = {
+            "SPARK_MODE": "worker",
+            "SPARK_MASTER_URL": f"spark://{container_name}:{SPARK_MASTER_PORT}",
+            "HOME": "/home/sparkuser",
+        }
+        if self.config.get("worker_cores"):
+            environment["SPARK_WORKER_CORES"] = str(self.config["worker_cores"])
+        if self.config.get("worker_memory"):
+            environment["SPARK_WORKER_MEMORY"] = str(self.config["worker_memory"])
+
+        def start(index: int):
+            name = member_name(container_name, "worker", index)
+            return run_container(
+                image_name,
+                self.logger,
+                name=name,
+                hostname=name,
+                network=cluster_network(container_name),
+                labels=cluster_labels("spark", container_name, "worker"),
+                environment={**environment, "SPARK_LOCAL_IP": name},
+                # Le worker n'a pas besoin de l'agent de configuration
+                command=SPARK_START_CMD.split(),
+            )
+
+        indexes = list(indexes)
+        start_members(start, indexes, "workers Spark")
+        self.logger.info(f"{len(indexes)} worker(s) Spark lancé(s).")
+
+    def scale(self, workers: int) -> dict:
+        """
+        Ajuste le nombre de workers du cluster : les index manquants sont créés,
+        les plus élevés supprimés ; attend que le master compte exactement 'workers' workers.
+        """
+        container_name = self.config.get("container_name", "spark_container")
+        master = get_container(container_name)
+        if master is None or master.labels.get(CLUSTER_LABEL) != container_name:
+            raise RuntimeError(f"{container_name} n'est pas le master d'un cluster Spark.")
+
+        added, removed = plan_scale(self.list_workers(), workers)
+        if added:
+            self.start_workers(master.image.id, added)
+        if removed:
+            remove_members(removed, self.logger)
+        self.config["workers"] = workers
+        self.wait_for_workers(container_name, workers, exact=True)
+        return {"workers": workers, "added": [member_name(container_name, "worker", i) for i in added],
+                "removed": [c.name for c in removed]}
+
+    def wait_for_workers(self, container_name: str, workers: int, exact: bool = False,
+                         timeout: int = 120) -> None:
+        """Attend que le master annonce 'workers' workers vivants (/json/ de l'interface web)."""
+        self.logger.info(f"Attente de l'enregistrement de {workers} worker(s) Spark...")
+
+        def registered(status) -> bool:
+            alive = status.get("aliveworkers", 0)
+            return alive == workers if exact else alive >= workers
+
+        readiness.wait_until_ready(
+            container_name, readiness.http_json_probe("8080/tcp", "/json/", registered), timeout
+        )
+
     def test_installation(self) -> bool:
         container_name = self.config.get("container_name", "spark_container")
         self.logger.info(f"Vérification du conteneur Spark : {container_name}")
-        code, output = run_docker_command(
-            f'ps --filter "name={container_name}" --filter "status=running"',
-            self.logger
-        )
-        return code == 0 and container_name in output
+        try:
+            self.wait_until_ready(container_name)
+            return True
+        except RuntimeError as e:
+            self.logger.warning(str(e))
+            return False
 
     def rollback(self) -> None:
         container_name = self.config.get("container_name", "spark_container")
         self.logger.info(f"Rollback : suppression de {container_name}")
-        run_docker_command(f"rm -f {container_name}", self.logger)
+        remove_members(self.list_workers().values(), self.logger)
+        remove_container(container_name, self.logger)
+        remove_network(cluster_network(container_name), self.logger)
+        port_allocator.release(container_name)
 
     def wait_for_removal(self, container_name: str, timeout: int = 10):
-        for _ in range(timeout * 2):
-            code, output = run_docker_command(
-                f"ps -a --filter name={container_name} --format '{{{{.ID}}}}'", self.logger
-            )
-            if code == 0 and not output.strip():
-                return
-            time.sleep(0.5)
-        raise RuntimeError(f"{container_name} non supprimé après {timeout} secondes.")
+        readiness.wait_for_removal(container_name, timeout)
 
-    def wait_until_ready(self, container_name: str, timeout: int = 20):
+    def wait_until_ready(self, container_name: str, timeout: int = 60):
         self.logger.info(f"Attente de l'état prêt de {container_name}...")
-        for _ in range(timeout * 2):
-            code, _ = run_docker_command(
-                f"exec {container_name} ls /opt/bitnami/spark", self.logger
-            )
-            if code == 0:
-                return
-            time.sleep(0.5)
-        raise RuntimeError(f"{container_name} non prêt après {timeout} secondes.")
+        readiness.wait_until_ready(container_name, readiness.http_probe("8080/tcp"), timeout)
+        if self.workers():
+            self.wait_for_workers(container_name, self.workers())
 
     def get_configuration(self):
         container_name = self.config.get("container_name", "spark_container")
 
-        docker_cmd = (
-            f'exec {container_name} bash -c '
-            f'"HOME=/home/sparkuser /opt/bitnami/spark/bin/spark-submit /opt/bitnami/spark/get_spark_config.py"'
-        )
-
         self.logger.info("Extraction configuration Spark...")
-        code, output = run_docker_command(docker_cmd, self.logger)
+        try:
+            return agent_pool.get_config(container_name)
+        except AgentUnavailable as e:
+            self.logger.info(f"{e} Lecture via spark-submit.")
+
+        code, output = exec_in_container(
+            container_name,
+            ["/opt/bitnami/spark/bin/spark-submit", "/opt/bitnami/spark/get_spark_config.py"],
+            self.logger,
+            environment={"HOME": "/home/sparkuser"},
+        )
         if code != 0:
             raise RuntimeError("Erreur lors de la récupération de la configuration.")
 
@@ -147,33 +253,181 @@ class SparkInstaller(BaseInstaller):
             self.logger.error(f"Erreur JSON : {e} — Sortie brute : {output}")
             raise RuntimeError("Impossible d'analyser la configuration JSON.")
 
-    def restart_with_new_config(self, new_config: dict):
+    def config_drift(self, container, config: dict, applied: dict) -> dict:
+        """Clés de 'config' qui diffèrent de la configuration Spark courante (lue via le cache)."""
+        current, _, _ = config_cache.get("spark", container.name, self.get_configuration)
+        return diff_config(current, config)
+
+    def config_snapshot(self) -> dict:
+        """Configuration mesurée par un benchmark : configuration Spark, ressources et workers."""
+        container_name = self.config.get("container_name", "spark_container")
+        container = get_container(container_name)
+        if container is None:
+            raise RuntimeError(f"Conteneur {container_name} introuvable.")
+        return {
+            "config": self.get_configuration(),
+            "resources": current_resources(container),
+            "workers": len(self.list_workers()),
+        }
+
+    def benchmark(self, workload: str, params: dict) -> dict:
+        """
+        Exécute une charge de référence (groupby, terasort) par spark-submit dans
+        le conteneur : sur le cluster si le conteneur en est le master, en local sinon.
+        """
+        container_name = self.config.get("container_name", "spark_container")
+        code, output = copy_to_container(
+            container_name, WORKLOAD_DIR, "bigdata_spark_workload.py", read_script("spark_workload.py"), self.logger
+        )
+        if code != 0:
+            raise RuntimeError(f"Copie du script de charge échouée : {output}")
+
+        container = get_container(container_name)
+        clustered = container is not None and container.labels.get(CLUSTER_LABEL) == container_name
+        master = f"spark://{container_name}:{SPARK_MASTER_PORT}" if clustered else "local[*]"
+        args = [f"--{k}={v}" for k, v in params.items()]
+        code, output = exec_in_container(
+            container_name,
+            ["/opt/bitnami/spark/bin/spark-submit", "--master", master,
+             f"{WORKLOAD_DIR}/bigdata_spark_workload.py", f"--workload={workload}", *args],
+            self.logger,
+            environment={"HOME": "/home/sparkuser"},
+        )
+        if code != 0:
+            raise RuntimeError(f"Benchmark Spark échoué : {output[-1000:]}")
+        report = last_json_line(output)
+        durations = report["durations_ms"]
+        return {workload: phase_result(report["rows"] * len(durations), sum(durations), durations)}
+
+    def ingest(self, stream, options: dict) -> dict:
+        """
+        Écrit le flux tel quel dans le workspace monté du conteneur
+        (get_volume_path), sans passer par l'API Docker ; le fichier ne prend
+        son nom qu'une fois complet. Lots et parallélisme ne s'appliquent pas.
+        """
+        container_name = self.config.get("container_name", "spark_container")
+        if get_container(container_name) is None:
+            raise RuntimeError(f"Conteneur {container_name} introuvable")
+        target = os.path.normpath(options.get("target") or f"ingest.{stream.format}")
+        if os.path.isabs(target) or target.startswith(".."):
+            raise RuntimeError(f"Chemin d'ingestion hors du workspace : {target}")
+        path = os.path.join(get_volume_path(container_name), target)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        lines, last = 0, b"\n"
+        try:
+            with open(f"{path}.part", "wb") as f:
+                for chunk in stream.chunks():
+                    f.write(chunk)
+                    count = chunk.count(b"\n") if stream.format != "parquet" else 0
+                    lines += count
+                    last = chunk[-1:] or last
+                    stream.stats.add_rows(count)
+            os.replace(f"{path}.part", path)
+        finally:
+            if os.path.exists(f"{path}.part"):
+                os.remove(f"{path}.part")
+
+        # Lignes du fichier : dernière ligne sans retour final comprise, en-tête CSV exclu
+        if stream.format == "parquet":
+            rows = self.parquet_rows(path)
+        else:
+            rows = lines + (last != b"\n") - (stream.format == "csv" and lines > 0)
+        if rows is not None:
+            stream.stats.add_rows(rows - stream.stats.rows)
+        return {"path": f"{SPARK_WORKSPACE}/{target.replace(os.sep, '/')}", "host_path": path}
+
+    @staticmethod
+    def parquet_rows(path: str) -> int | None:
+        if not parquet_available():
+            return None
+        import pyarrow.parquet as pq
+
+        return pq.ParquetFile(path).metadata.num_rows
+
+    def restart_with_new_config(self, new_config: dict) -> dict:
+        """
+        Applique une nouvelle configuration avec la stratégie la moins coûteuse :
+        rien si elle est identique, spark.conf.set via l'agent pour les clés
+        modifiables à chaud, recréation de la SparkSession de l'agent pour les
+        clés statiques, recréation du conteneur si le port change.
+        Les limites CPU/mémoire sont appliquées à chaud (docker update) ; la
+        mémoire et les cœurs driver/exécuteur imposent une recréation.
+        """
+        container_name = self.config.get("container_name", "spark_container")
+        port = self.config.get("port", 8080)
+
+        container = get_container(container_name)
+        resources = resource_changes(container, self.resources()) if container is not None else {}
+        if (
+            container is None
+            or readiness.published_port(container, "8080/tcp") != port
+            or requires_recreate(resources)
+        ):
+            self.recreate_with_config(new_config)
+            return update_result(RECREATE, {**new_config, **resources})
+
+        strategy = IN_PLACE if apply_limits(container, resources) else NOOP
+        try:
+            changes = diff_config(self.get_configuration(), new_config)
+            if changes:
+                applied = agent_pool.set_config(container_name, changes)
+                strategy = stronger(strategy, RESTART if applied.get("restarted") else IN_PLACE)
+        except AgentUnavailable as e:
+            self.logger.warning(f"{e} Recréation du conteneur.")
+            self.recreate_with_config(new_config)
+            return update_result(RECREATE, {**new_config, **resources})
+
+        changes = {**changes, **resources}
+        if strategy == NOOP:
+            self.logger.info("Configuration Spark inchangée, aucun redémarrage.")
+        else:
+            self.logger.info(f"Configuration Spark appliquée ({strategy}) : {sorted(changes)}")
+        return update_result(strategy, changes)
+
+    def recreate_with_config(self, new_config: dict):
         container_name = self.config.get("container_name", "spark_container")
         port = self.config.get("port", 8080)
-        image_name = "custom-spark-image"
+        image_name = build_manager.ensure_tool_image("spark", self.logger)
         volume_path = get_volume_path(container_name)
 
+        current = get_container(container_name)
+        if current is not None:
+            self.inherit_resources(current)
+            # Un master de cluster est recréé sur son réseau ; les workers s'y reconnectent
+            self.config["cluster"] = current.labels.get(CLUSTER_LABEL) == container_name
+        labels, environment, options = self.master_options(container_name)
+
         self.logger.info("Redémarrage du conteneur Spark...")
 
-        run_docker_command(f"stop {container_name}", self.logger)
-        run_docker_command(f"rm {container_name}", self.logger)
+        stop_container(container_name, self.logger)
+        remove_container(container_name, self.logger)
         self.wait_for_removal(container_name)
 
-        config_args = " ".join([f"{k}={v}" for k, v in new_config.items()])
-
-        run_cmd_str = (
-            f'run -d '
-            f'--name {container_name} '
-            f'--label myapp=mon_interface '
-            f'-e HOME=/home/sparkuser '
-            f'-p {port}:8080 '
-            f'-v {volume_path}:/opt/bitnami/spark/workspace '
-            f'{image_name} '
-            f'bash -c "/opt/bitnami/spark/bin/spark-submit '
-            f'/opt/bitnami/spark/get_spark_config.py {config_args} && tail -f /dev/null"'
+        # Bail pris une fois l'ancien conteneur supprimé : son port redevient libre
+        allocated, = port_allocator.allocate(container_name, [(port, 8000, 9000)])
+        if allocated != port:
+            self.logger.warning(f"Port {port} déjà utilisé, port {allocated} attribué.")
+            port = allocated
+            self.config["port"] = port
+
+        config_args = " ".join(shlex.quote(f"{k}={v}") for k, v in new_config.items())
+
+        code, output = run_container(
+            image_name,
+            self.logger,
+            name=container_name,
+            **self.container_options(labels),
+            **options,
+            environment={"HOME": "/home/sparkuser", **resource_env(self.resources()), **environment},
+            ports={"8080/tcp": port, **agent_port_binding()},
+            volumes={volume_path: {"bind": SPARK_WORKSPACE, "mode": "rw"}},
+            command=[
+                "bash", "-c",
+                f"/opt/bitnami/spark/bin/spark-submit "
+                f"/opt/bitnami/spark/get_spark_config.py --serve {config_args} & exec {SPARK_START_CMD}",
+            ],
         )
-
-        code, output = run_docker_command(run_cmd_str, self.logger)
         if code != 0:
             raise RuntimeError("Redémarrage échoué : " + output)
 
@@ -0,0 +1,274 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger("installer_logger")
+
+# Base SQLite de l'état du backend (":memory:" pour ne rien garder entre deux démarrages)
+STATE_DB = os.environ.get("BIGDATA_STATE_DB", os.path.join(".", "data", "bigdata-state.db"))
+# Versions de configuration gardées par conteneur
+CONFIG_HISTORY = int(os.environ.get("BIGDATA_CONFIG_HISTORY", "50"))
+# Opérations terminées gardées dans la base
+OPERATION_HISTORY = int(os.environ.get("BIGDATA_OPERATION_HISTORY", "1000"))
+# Démarrage de ce processus : les opérations antérieures non terminées ont été interrompues
+PROCESS_STARTED_AT = time.time()
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    container_name TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    spec TEXT NOT NULL,
+    config TEXT NOT NULL,
+    image TEXT,
+    generation INTEGER NOT NULL,
+    status TEXT NOT NULL,
+    container_id TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS instances_tool ON instances (tool);
+
+CREATE TABLE IF NOT EXISTS config_history (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    container_name TEXT NOT NULL,
+    tool TEXT NOT NULL,
+    generation INTEGER NOT NULL,
+    spec TEXT NOT NULL,
+    config TEXT NOT NULL,
+    image TEXT,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS config_history_container ON config_history (container_name, generation);
+CREATE INDEX IF NOT EXISTS config_history_tool ON config_history (tool);
+
+CREATE TABLE IF NOT EXISTS port_leases (
+    container_name TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    leased_at REAL NOT NULL,
+    PRIMARY KEY (container_name, port)
+);
+CREATE INDEX IF NOT EXISTS port_leases_port ON port_leases (port);
+
+CREATE TABLE IF NOT EXISTS operations (
+    id TEXT PRIMARY KEY,
+    tool TEXT NOT NULL,
+    action TEXT NOT NULL,
+    container_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS operations_container ON operations (container_name, created_at);
+CREATE INDEX IF NOT EXISTS operations_tool ON operations (tool, created_at);
+CREATE INDEX IF NOT EXISTS operations_status ON operations (status);
+"""
+
+# Colonnes JSON de chaque table (le statut d'une opération est un simple texte)
+INSTANCE_JSON = ("spec", "config", "status")
+HISTORY_JSON = ("spec", "config")
+OPERATION_JSON = ("result",)
+
+
+def _row(row: sqlite3.Row, json_fields: Iterable[str]) -> Dict[str, Any]:
+    item = dict(row)
+    for field in json_fields:
+        if item.get(field) is not None:
+            item[field] = json.loads(item[field])
+    return item
+
+
+def _dump(value: Any) -> str:
+    return json.dumps(value, sort_keys=True, default=str)
+
+
+class StateStore:
+    """
+    État persistant du backend dans une base SQLite en mode WAL : instances
+    gérées (état souhaité et dernière réconciliation), historique de leurs
+    configurations, baux de ports et opérations. Les lectures concurrentes ne
+    bloquent pas l'écriture ; une seule connexion protégée par un verrou suffit
+    au débit du backend (quelques écritures par opération).
+    """
+
+    def __init__(self, path: str = STATE_DB):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            if self.path != ":memory:":
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def _execute(self, sql: str, params: Iterable[Any] = (), json_fields: Iterable[str] = ()) -> List[Dict[str, Any]]:
+        with self._lock:
+            cursor = self._connect().execute(sql, tuple(params))
+            return [_row(r, json_fields) for r in cursor.fetchall()]
+
+    def _transaction(self, statements: List[tuple]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                for sql, params in statements:
+                    conn.execute(sql, tuple(params))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ------------------- INSTANCES ET HISTORIQUE -------------------
+
+    def save_instance(self, entry: Dict[str, Any], new_generation: bool = False) -> None:
+        """Enregistre l'état souhaité d'une instance ; une nouvelle génération entre dans l'historique."""
+        statements = [(
+            "INSERT INTO instances (container_name, tool, spec, config, image, generation, status, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (container_name) DO UPDATE SET "
+            "tool = excluded.tool, spec = excluded.spec, config = excluded.config, image = excluded.image, "
+            "generation = excluded.generation, status = excluded.status, updated_at = excluded.updated_at",
+            (entry["container_name"], entry["tool"], _dump(entry["spec"]), _dump(entry["config"]),
+             entry["image"], entry["generation"], _dump(entry["status"]), entry["updated_at"]),
+        )]
+        if new_generation:
+            statements.append((
+                "INSERT INTO config_history (container_name, tool, generation, spec, config, image, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (entry["container_name"], entry["tool"], entry["generation"], _dump(entry["spec"]),
+                 _dump(entry["config"]), entry["image"], entry["updated_at"]),
+            ))
+            statements.append((
+                "DELETE FROM config_history WHERE container_name = ? AND id NOT IN "
+                "(SELECT id FROM config_history WHERE container_name = ? ORDER BY id DESC LIMIT ?)",
+                (entry["container_name"], entry["container_name"], CONFIG_HISTORY),
+            ))
+        self._transaction(statements)
+
+    def set_container_id(self, container_name: str, container_id: Optional[str]) -> None:
+        self._execute("UPDATE instances SET container_id = ? WHERE container_name = ?", (container_id, container_name))
+
+    def delete_instance(self, container_name: str) -> None:
+        self._execute("DELETE FROM instances WHERE container_name = ?", (container_name,))
+
+    def instances(self, tool: Optional[str] = None) -> List[Dict[str, Any]]:
+        if tool is None:
+            return self._execute("SELECT * FROM instances ORDER BY updated_at", json_fields=INSTANCE_JSON)
+        return self._execute("SELECT * FROM instances WHERE tool = ? ORDER BY updated_at", (tool,), INSTANCE_JSON)
+
+    def instance(self, container_name: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT * FROM instances WHERE container_name = ?", (container_name,), INSTANCE_JSON)
+        return rows[0] if rows else None
+
+    def config_history(self, container_name: str, limit: int = CONFIG_HISTORY) -> List[Dict[str, Any]]:
+        return self._execute(
+            "SELECT generation, spec, config, image, created_at FROM config_history "
+            "WHERE container_name = ? ORDER BY id DESC LIMIT ?", (container_name, limit), HISTORY_JSON
+        )
+
+    # ------------------- BAUX DE PORTS -------------------
+
+    def save_leases(self, container_name: str, ports: Iterable[int]) -> None:
+        now = time.time()
+        self._transaction(
+            [("DELETE FROM port_leases WHERE container_name = ?", (container_name,))]
+            + [("INSERT INTO port_leases (container_name, port, leased_at) VALUES (?, ?, ?)", (container_name, p, now))
+               for p in ports]
+        )
+
+    def delete_leases(self, container_name: str) -> None:
+        self._execute("DELETE FROM port_leases WHERE container_name = ?", (container_name,))
+
+    def leases(self) -> Dict[str, List[int]]:
+        result: Dict[str, List[int]] = {}
+        for row in self._execute("SELECT container_name, port FROM port_leases ORDER BY port"):
+            result.setdefault(row["container_name"], []).append(row["port"])
+        return result
+
+    # ------------------- OPÉRATIONS -------------------
+
+    def save_operation(self, operation: Dict[str, Any]) -> None:
+        self._execute(
+            "INSERT INTO operations (id, tool, action, container_name, status, result, error, created_at, "
+            "started_at, finished_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+            "status = excluded.status, result = excluded.result, error = excluded.error, "
+            "started_at = excluded.started_at, finished_at = excluded.finished_at",
+            (operation["id"], operation["tool"], operation["action"], operation["container_name"],
+             operation["status"], None if operation["result"] is None else _dump(operation["result"]),
+             operation["error"], operation["created_at"], operation["started_at"], operation["finished_at"]),
+        )
+
+    def operation(self, operation_id: str) -> Optional[Dict[str, Any]]:
+        rows = self._execute("SELECT * FROM operations WHERE id = ?", (operation_id,), OPERATION_JSON)
+        return rows[0] if rows else None
+
+    def operations(self, container_name: Optional[str] = None, tool: Optional[str] = None,
+                   limit: int = 50) -> List[Dict[str, Any]]:
+        clauses, params = [], []
+        if container_name:
+            clauses.append("container_name = ?")
+            params.append(container_name)
+        if tool:
+            clauses.append("tool = ?")
+            params.append(tool)
+        where = f"WHERE {' AND '.join(clauses)} " if clauses else ""
+        return self._execute(f"SELECT * FROM operations {where}ORDER BY created_at DESC LIMIT ?",
+                             (*params, limit), OPERATION_JSON)
+
+    def interrupt_operations(self, error: str, before: float = PROCESS_STARTED_AT) -> List[Dict[str, Any]]:
+        """
+        Marque en échec les opérations laissées en cours par le processus
+        précédent (créées avant 'before') ; les retourne. Celles de ce
+        processus ne sont pas touchées.
+        """
+        where = "WHERE status IN ('pending', 'running') AND created_at < ?"
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            try:
+                unfinished = [_row(r, OPERATION_JSON) for r in conn.execute(f"SELECT * FROM operations {where}", (before,))]
+                conn.execute(f"UPDATE operations SET status = 'failed', error = ?, finished_at = ? {where}",
+                             (error, time.time(), before))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return unfinished
+
+    def prune_operations(self, keep: int = OPERATION_HISTORY) -> None:
+        self._execute(
+            "DELETE FROM operations WHERE status IN ('succeeded', 'failed') AND id NOT IN "
+            "(SELECT id FROM operations ORDER BY created_at DESC LIMIT ?)", (keep,)
+        )
+
+
+def persist(write: Callable[..., Any], *args: Any, **kwargs: Any) -> None:
+    """
+    Écriture dans la base d'état sans faire échouer l'opération en cours :
+    l'état en mémoire reste la référence jusqu'au prochain démarrage.
+    """
+    try:
+        write(*args, **kwargs)
+    except (sqlite3.Error, OSError) as e:
+        logger.warning(f"Écriture de l'état persistant impossible ({write.__name__}) : {e}")
+
+
+state_store = StateStore()
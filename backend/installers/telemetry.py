@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from docker.errors import DockerException
+
+from .inventory import inventory
+from .utils import get_docker_client
+
+logger = logging.getLogger("installer_logger")
+
+# Intervalle d'échantillonnage des statistiques (secondes)
+TELEMETRY_INTERVAL = float(os.environ.get("BIGDATA_TELEMETRY_INTERVAL", "5"))
+# Nombre d'échantillons conservés par conteneur
+TELEMETRY_HISTORY = int(os.environ.get("BIGDATA_TELEMETRY_HISTORY", "120"))
+# Le collecteur se met en pause si personne n'a lu les statistiques depuis ce délai (secondes)
+TELEMETRY_IDLE = float(os.environ.get("BIGDATA_TELEMETRY_IDLE", "300"))
+# Lectures 'docker stats' menées en parallèle à chaque tour
+TELEMETRY_WORKERS = 8
+
+
+def _blkio(stats: Dict[str, Any]) -> Dict[str, int]:
+    totals = {"read": 0, "write": 0}
+    for entry in (stats.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []:
+        op = entry.get("op", "").lower()
+        if op in totals:
+            totals[op] += entry.get("value", 0)
+    return totals
+
+
+def _memory(stats: Dict[str, Any]) -> Dict[str, int]:
+    """Mémoire utilisée hors cache de pages (même calcul que 'docker stats')."""
+    memory = stats.get("memory_stats") or {}
+    details = memory.get("stats") or {}
+    cache = details.get("inactive_file", details.get("total_inactive_file", details.get("cache", 0)))
+    usage = max(memory.get("usage", 0) - cache, 0)
+    return {"usage": usage, "limit": memory.get("limit", 0)}
+
+
+def summarize_stats(stats: Dict[str, Any], previous: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Réduit une réponse de l'API stats (one-shot) à un échantillon. Le CPU est
+    calculé par rapport à l'échantillon précédent du collecteur, l'API one-shot
+    ne renseignant pas 'precpu_stats'.
+    """
+    cpu = stats.get("cpu_stats") or {}
+    total = (cpu.get("cpu_usage") or {}).get("total_usage", 0)
+    system = cpu.get("system_cpu_usage", 0)
+    online = cpu.get("online_cpus") or len((cpu.get("cpu_usage") or {}).get("percpu_usage") or []) or 1
+    cpu_percent = 0.0
+    if previous is not None:
+        cpu_delta = total - previous["_cpu_total"]
+        system_delta = system - previous["_cpu_system"]
+        if cpu_delta > 0 and system_delta > 0:
+            cpu_percent = round(cpu_delta / system_delta * online * 100, 2)
+
+    memory = _memory(stats)
+    blkio = _blkio(stats)
+    networks = (stats.get("networks") or {}).values()
+    return {
+        "ts": time.time(),
+        "cpu_percent": cpu_percent,
+        "mem_usage": memory["usage"],
+        "mem_limit": memory["limit"],
+        "mem_percent": round(memory["usage"] / memory["limit"] * 100, 2) if memory["limit"] else 0.0,
+        "blk_read": blkio["read"],
+        "blk_write": blkio["write"],
+        "net_rx": sum(n.get("rx_bytes", 0) for n in networks),
+        "net_tx": sum(n.get("tx_bytes", 0) for n in networks),
+        "_cpu_total": total,
+        "_cpu_system": system,
+    }
+
+
+def public_sample(sample: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in sample.items() if not k.startswith("_")}
+
+
+class StatsCollector:
+    """
+    Collecteur unique des statistiques des conteneurs gérés (created_by=mon_app) :
+    un tour toutes les TELEMETRY_INTERVAL secondes, une lecture one-shot par
+    conteneur en cours d'exécution, et un tampon circulaire par conteneur. Les
+    clients lisent ces tampons au lieu d'ouvrir chacun un flux 'docker stats'.
+    Démarré à la première lecture, il se met en pause quand plus personne ne lit.
+    """
+
+    def __init__(self, interval: float = TELEMETRY_INTERVAL, history: int = TELEMETRY_HISTORY):
+        self.interval = interval
+        self._history = history
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._buffers: Dict[str, deque] = {}
+        self._containers: Dict[str, Dict[str, Any]] = {}
+        self._last_read = 0.0
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=TELEMETRY_WORKERS, thread_name_prefix="stats")
+
+    def _touch(self) -> None:
+        self._last_read = time.time()
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="telemetry", daemon=True)
+                self._thread.start()
+        self._wake.set()
+
+    def _run(self) -> None:
+        while True:
+            if time.time() - self._last_read > TELEMETRY_IDLE:
+                self._wake.clear()
+                self._wake.wait()
+            started = time.time()
+            try:
+                self._sample_all()
+            except Exception as e:
+                logger.warning(f"Collecte des statistiques Docker impossible : {e}")
+            time.sleep(max(self.interval - (time.time() - started), 0))
+
+    def _sample_all(self) -> None:
+        _, containers = inventory.snapshot(created_by="mon_app")
+        running = {c["id"]: c for c in containers if c["status"] == "running"}
+        list(self._executor.map(self._sample_one, running.values()))
+        with self._lock:
+            self._containers = running
+            for container_id in set(self._buffers) - set(running):
+                del self._buffers[container_id]
+
+    def _sample_one(self, container: Dict[str, Any]) -> None:
+        try:
+            stats = get_docker_client().api.stats(container["id"], stream=False, one_shot=True)
+        except DockerException as e:
+            logger.debug(f"Statistiques indisponibles pour {container['name']} : {e}")
+            return
+        with self._lock:
+            buffer = self._buffers.setdefault(container["id"], deque(maxlen=self._history))
+            previous = buffer[-1] if buffer else None
+        sample = summarize_stats(stats, previous)
+        with self._lock:
+            buffer.append(sample)
+
+    def read(self, tool: Optional[str] = None, name: Optional[str] = None,
+             history: int = 0, since: float = 0.0) -> List[Dict[str, Any]]:
+        """
+        Derniers échantillons par conteneur, filtrés par outil (label bigdata.tool)
+        et par nom exact ; 'history' échantillons plus anciens sont joints si demandé.
+        """
+        self._touch()
+        with self._lock:
+            result = []
+            for container_id, container in self._containers.items():
+                if tool and container["labels"].get("bigdata.tool") != tool:
+                    continue
+                if name and container["name"] != name:
+                    continue
+                buffer = self._buffers.get(container_id)
+                if not buffer or buffer[-1]["ts"] <= since:
+                    continue
+                entry = {
+                    "id": container_id,
+                    "name": container["name"],
+                    "latest": public_sample(buffer[-1]),
+                }
+                if history:
+                    entry["history"] = [public_sample(s) for s in list(buffer)[-history:]]
+                result.append(entry)
+        result.sort(key=lambda c: c["name"])
+        return result
+
+    async def sse(self, tool: Optional[str] = None, name: Optional[str] = None) -> AsyncIterator[str]:
+        """Flux Server-Sent Events : un événement 'stats' par nouvel échantillonnage."""
+        since = 0.0
+        while True:
+            containers = self.read(tool=tool, name=name, since=since)
+            if containers:
+                since = max(c["latest"]["ts"] for c in containers)
+                yield f"event: stats\ndata: {json.dumps({'containers': containers})}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(self.interval)
+
+
+def aggregate(containers: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Somme des derniers échantillons (vue d'ensemble d'un outil)."""
+    keys = ("cpu_percent", "mem_usage", "mem_limit", "blk_read", "blk_write", "net_rx", "net_tx")
+    totals = {k: 0 for k in keys}
+    for container in containers:
+        for k in keys:
+            totals[k] += container["latest"][k]
+    totals["cpu_percent"] = round(totals["cpu_percent"], 2)
+    return totals
+
+
+collector = StatsCollector()
@@ -1,8 +1,25 @@
+import io
 import platform
+import socket
 import subprocess
+import tarfile
 import shutil
 import logging
-from typing import Tuple
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import docker
+from docker.errors import APIError, DockerException, NotFound
+from docker.utils.socket import frames_iter
+
+from .output import OutputCapture, capture_for
+from .metrics import COMMAND_DURATION, COMMAND_FAILURES, command_label, timed_docker
+
+# Client Docker partagé par tout le processus (connexion persistante à la socket)
+_docker_client = None
+_docker_client_lock = threading.Lock()
 
 def detect_os() -> str:
     system = platform.system().lower()
@@ -14,6 +31,7 @@ def detect_os() -> str:
         return 'windows'
     return 'unknown'
 
+@lru_cache(maxsize=1)
 def get_docker_command() -> str:
     """
     Retourne le chemin complet vers la commande docker, ou lève une erreur si non trouvée.
@@ -23,11 +41,17 @@ def get_docker_command() -> str:
         raise RuntimeError("Docker n'est pas installé ou 'docker' n'est pas dans le PATH.")
     return docker_cmd
 
-def run_command(cmd: str, logger: logging.Logger) -> Tuple[int, str]:
+def run_command(cmd: str, logger: logging.Logger, capture: Optional[OutputCapture] = None,
+                tail: Optional[int] = None) -> Tuple[int, str]:
     """
-    Exécute une commande shell, loggue chaque ligne et capture toutes les sorties.
-    Retourne (code de sortie, sortie complète).
+    Exécute une commande shell en lisant sa sortie au fil de l'eau dans une
+    OutputCapture bornée (chaque ligne part sur le canal du job et vers les
+    abonnés de la capture). Retourne (code de sortie, fin de la sortie) ;
+    tail limite le nombre de lignes renvoyées.
     """
+    label = command_label(cmd)
+    start = time.perf_counter()
+    capture = capture or capture_for(label, logger)
     try:
         logger.debug(f"Exécution de la commande : {cmd}")
         proc = subprocess.Popen(
@@ -35,28 +59,32 @@ def run_command(cmd: str, logger: logging.Logger) -> Tuple[int, str]:
             shell=True,
             stdout=subprocess.PIPE,
             stderr=subprocess.STDOUT,
-            text=True
+            text=True,
+            errors="replace"
         )
 
-        output = ""
-        for line in proc.stdout:
-            output += line
-            logger.info(line.strip())
+        with capture:
+            for line in proc.stdout:
+                capture.feed_line(line)
 
         code = proc.wait()
+        COMMAND_DURATION.observe(time.perf_counter() - start, command=label)
         if code != 0:
+            COMMAND_FAILURES.inc(command=label)
             logger.error(f"Commande échouée avec le code {code}")
         else:
-            logger.debug("Commande exécutée avec succès.")
+            logger.debug(f"Commande exécutée avec succès ({capture.line_count} lignes).")
 
-        return code, output.strip()
+        return code, capture.tail(tail)
 
     except Exception as e:
+        COMMAND_FAILURES.inc(command=label)
         error_msg = f"Erreur lors de l'exécution de la commande : {e}"
         logger.exception(error_msg)
         return 1, error_msg
 
-def run_docker_command(args: str, logger: logging.Logger) -> Tuple[int, str]:
+def run_docker_command(args: str, logger: logging.Logger,
+                       capture: Optional[OutputCapture] = None) -> Tuple[int, str]:
     """
     Exécute une commande Docker en utilisant le chemin absolu de docker détecté.
     'args' est la partie après 'docker', par exemple 'ps -a'.
@@ -69,7 +97,273 @@ def run_docker_command(args: str, logger: logging.Logger) -> Tuple[int, str]:
         else:
             full_cmd = f'"{docker_cmd}" {args}'
         logger.debug(f"Commande Docker construite : {full_cmd}")
-        return run_command(full_cmd, logger)
+        return run_command(full_cmd, logger, capture)
     except Exception as e:
         logger.error(f"Erreur exécution commande Docker : {e}")
         return 1, str(e)
+
+
+# ------------------- DOCKER ENGINE API -------------------
+
+def get_docker_client() -> docker.DockerClient:
+    """
+    Retourne le client Docker SDK unique du processus.
+    Il est créé à la première utilisation puis réutilisé (pool de connexions HTTP).
+    """
+    global _docker_client
+    if _docker_client is None:
+        with _docker_client_lock:
+            if _docker_client is None:
+                _docker_client = docker.from_env()
+    return _docker_client
+
+
+def managed_labels(tool: str) -> Dict[str, str]:
+    """Labels posés sur tous les conteneurs gérés par l'application."""
+    return {"myapp": "mon_interface", "created_by": "mon_app", "bigdata.tool": tool}
+
+
+# Labels d'un groupe de conteneurs (cluster) : nom du groupe et rôle du conteneur
+CLUSTER_LABEL = "bigdata.cluster"
+ROLE_LABEL = "bigdata.role"
+
+
+def cluster_labels(tool: str, cluster: str, role: str) -> Dict[str, str]:
+    return {**managed_labels(tool), CLUSTER_LABEL: cluster, ROLE_LABEL: role}
+
+
+def cluster_network(cluster: str) -> str:
+    """Réseau Docker dédié d'un cluster : les conteneurs s'y joignent par leur nom."""
+    return f"{cluster}-net"
+
+
+def docker_available(logger: logging.Logger) -> bool:
+    """Vérifie que le démon Docker répond."""
+    try:
+        get_docker_client().ping()
+        return True
+    except DockerException as e:
+        logger.error(f"Démon Docker injoignable : {e}")
+        return False
+
+
+def get_container(name: str):
+    """Retourne le conteneur portant exactement ce nom, ou None."""
+    try:
+        return get_docker_client().containers.get(name)
+    except NotFound:
+        return None
+
+
+def is_container_running(name: str) -> bool:
+    container = get_container(name)
+    return container is not None and container.status == "running"
+
+
+@timed_docker("stop")
+def stop_container(name: str, logger: logging.Logger) -> bool:
+    container = get_container(name)
+    if container is None:
+        return False
+    try:
+        container.stop()
+        return True
+    except APIError as e:
+        logger.error(f"Erreur arrêt du conteneur {name} : {e}")
+        return False
+
+
+@timed_docker("remove")
+def remove_container(name: str, logger: logging.Logger) -> bool:
+    """Équivalent de 'docker rm -f', sans erreur si le conteneur n'existe pas."""
+    try:
+        get_docker_client().api.remove_container(name, force=True)
+        return True
+    except NotFound:
+        return False
+    except APIError as e:
+        logger.error(f"Erreur suppression du conteneur {name} : {e}")
+        return False
+
+
+@timed_docker("build")
+def build_image(path: str, tag: str, logger: logging.Logger,
+                capture: Optional[OutputCapture] = None) -> Tuple[int, str]:
+    """
+    Construit une image via l'API Docker en streamant les logs de build dans
+    une OutputCapture propre au build. Retourne (code, fin de la sortie).
+    """
+    capture = capture or capture_for(f"build-{tag}", logger)
+    try:
+        with capture:
+            for chunk in get_docker_client().api.build(path=path, tag=tag, rm=True, decode=True):
+                if "error" in chunk:
+                    capture.feed_line(chunk["error"])
+                    logger.error(chunk["error"].strip())
+                    return 1, capture.tail()
+                capture.feed(chunk.get("stream", ""))
+        return 0, capture.tail()
+    except DockerException as e:
+        logger.error(f"Erreur build de l'image {tag} : {e}")
+        return 1, str(e)
+
+
+def image_exists(reference: str) -> bool:
+    """Indique si l'image est présente dans le store local."""
+    try:
+        get_docker_client().images.get(reference)
+        return True
+    except NotFound:
+        return False
+
+
+@timed_docker("pull")
+def pull_image(repository: str, tag: str, logger: logging.Logger) -> Tuple[int, str]:
+    """Télécharge une image via l'API Docker. Retourne (code, sortie)."""
+    try:
+        image = get_docker_client().images.pull(repository, tag=tag)
+        return 0, image.id
+    except DockerException as e:
+        logger.error(f"Erreur téléchargement de l'image {repository}:{tag} : {e}")
+        return 1, str(e)
+
+
+@timed_docker("load")
+def load_image(path: str, logger: logging.Logger) -> Tuple[int, str]:
+    """Importe une archive 'docker save' dans le store local. Retourne (code, sortie)."""
+    try:
+        with open(path, "rb") as f:
+            images = get_docker_client().images.load(f)
+        return 0, ", ".join(tag for image in images for tag in image.tags)
+    except (OSError, DockerException) as e:
+        logger.error(f"Erreur import de l'archive {path} : {e}")
+        return 1, str(e)
+
+
+@timed_docker("run")
+def run_container(image: str, logger: logging.Logger, **kwargs: Any) -> Tuple[int, str]:
+    """
+    Lance un conteneur détaché ('docker run -d').
+    Les kwargs sont ceux de DockerClient.containers.run (name, ports, environment...).
+    Retourne (code, id du conteneur ou message d'erreur).
+    """
+    try:
+        container = get_docker_client().containers.run(image, detach=True, **kwargs)
+        return 0, container.id
+    except DockerException as e:
+        logger.error(f"Erreur lancement du conteneur {kwargs.get('name', image)} : {e}")
+        return 1, str(e)
+
+
+def list_containers(labels: Dict[str, str]) -> List[Any]:
+    """Conteneurs (arrêtés compris) portant tous les labels donnés."""
+    filters = {"label": [f"{k}={v}" for k, v in labels.items()]}
+    return get_docker_client().containers.list(all=True, filters=filters)
+
+
+def create_network(name: str, labels: Dict[str, str], logger: logging.Logger) -> None:
+    """Crée un réseau bridge dédié s'il n'existe pas encore."""
+    client = get_docker_client()
+    # Le filtre 'name' de Docker accepte les correspondances partielles
+    if any(n.name == name for n in client.networks.list(names=[name])):
+        return
+    logger.info(f"Création du réseau Docker {name}...")
+    client.networks.create(name, driver="bridge", labels=labels)
+
+
+def remove_network(name: str, logger: logging.Logger) -> None:
+    """Supprime un réseau (après ses conteneurs). Absent : rien à faire."""
+    try:
+        for network in get_docker_client().networks.list(names=[name]):
+            if network.name == name:
+                network.remove()
+    except DockerException as e:
+        logger.warning(f"Suppression du réseau {name} impossible : {e}")
+
+
+def remove_volume(name: str, logger: logging.Logger) -> None:
+    """Supprime un volume nommé (après son conteneur). Absent : rien à faire."""
+    try:
+        get_docker_client().volumes.get(name).remove(force=True)
+    except NotFound:
+        return
+    except DockerException as e:
+        logger.warning(f"Suppression du volume {name} impossible : {e}")
+
+
+@timed_docker("copy")
+def copy_to_container(name: str, directory: str, filename: str, data: bytes,
+                      logger: logging.Logger) -> Tuple[int, str]:
+    """Dépose un fichier dans un conteneur ('docker cp'). Retourne (code, sortie)."""
+    archive = io.BytesIO()
+    with tarfile.open(fileobj=archive, mode="w") as tar:
+        info = tarfile.TarInfo(filename)
+        info.size = len(data)
+        info.mode = 0o644
+        info.mtime = int(time.time())
+        tar.addfile(info, io.BytesIO(data))
+    try:
+        get_docker_client().containers.get(name).put_archive(directory, archive.getvalue())
+        return 0, f"{directory}/{filename}"
+    except DockerException as e:
+        logger.error(f"Copie de {filename} dans {name} impossible : {e}")
+        return 1, str(e)
+
+
+@timed_docker("exec")
+def exec_in_container(name: str, cmd: List[str], logger: logging.Logger,
+                      environment: Optional[Dict[str, str]] = None,
+                      capture: Optional[OutputCapture] = None) -> Tuple[int, str]:
+    """
+    Équivalent de 'docker exec', sortie lue en flux dans une OutputCapture
+    (non republiée sur le canal du job sauf capture fournie).
+    Retourne (code, fin de la sortie).
+    """
+    capture = capture or capture_for(f"exec-{name}", logger, stream=False)
+    try:
+        api = get_docker_client().api
+        exec_id = api.exec_create(name, cmd, environment=environment)["Id"]
+        with capture:
+            for chunk in api.exec_start(exec_id, stream=True):
+                capture.feed(chunk)
+        return api.exec_inspect(exec_id)["ExitCode"] or 0, capture.tail()
+    except DockerException as e:
+        logger.debug(f"Erreur exec dans {name} : {e}")
+        return 1, str(e)
+
+
+@timed_docker("exec")
+def exec_with_input(name: str, cmd: List[str], chunks: Iterable[bytes], logger: logging.Logger,
+                    environment: Optional[Dict[str, str]] = None,
+                    capture: Optional[OutputCapture] = None) -> Tuple[int, str]:
+    """
+    Équivalent de 'docker exec -i' : les morceaux sont écrits au fil de l'eau
+    sur l'entrée standard de la commande (rien n'est rassemblé en mémoire),
+    la sortie est lue en parallèle. Retourne (code, fin de la sortie).
+    """
+    capture = capture or capture_for(f"exec-{name}", logger, stream=False)
+    try:
+        api = get_docker_client().api
+        exec_id = api.exec_create(name, cmd, stdin=True, environment=environment)["Id"]
+        sock = api.exec_start(exec_id, socket=True)
+        raw = getattr(sock, "_sock", sock)
+
+        def read_output():
+            for _, data in frames_iter(sock, False):
+                capture.feed(data)
+
+        reader = threading.Thread(target=read_output, name=f"exec-output-{name}", daemon=True)
+        reader.start()
+        with capture:
+            try:
+                for chunk in chunks:
+                    raw.sendall(chunk)
+            finally:
+                # Fin de l'entrée standard : la commande termine puis ferme sa sortie
+                raw.shutdown(socket.SHUT_WR)
+                reader.join()
+                sock.close()
+        return api.exec_inspect(exec_id)["ExitCode"] or 0, capture.tail()
+    except (DockerException, OSError) as e:
+        logger.debug(f"Erreur exec dans {name} : {e}")
+        return 1, str(e)
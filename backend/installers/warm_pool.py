@@ -0,0 +1,287 @@
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+
+from docker.errors import DockerException
+
+from .jobs import rollback_after_failure, run_lifecycle
+from .metrics import POOL_CLAIMS
+from .ports import port_allocator
+from .profiles import resolve_resources
+from .utils import get_container, get_docker_client, remove_container
+
+logger = logging.getLogger("installer_logger")
+
+# Préfixe des conteneurs du pool chaud, et label qui les identifie (valeur : l'outil)
+POOL_PREFIX = "bigdata-pool-"
+POOL_LABEL = "bigdata.pool"
+POOL_TOOLS = ("spark", "hbase", "mongodb")
+
+# Intervalle de vérification du refiller (secondes)
+POOL_CHECK_INTERVAL = float(os.environ.get("BIGDATA_POOL_CHECK_INTERVAL", "10"))
+# Créations de conteneurs du pool menées en parallèle
+POOL_WORKERS = int(os.environ.get("BIGDATA_POOL_WORKERS", "2"))
+
+# Outils dont le volume de données est un dossier ./data/<nom du conteneur>
+DATA_DIR_TOOLS = {"spark", "hbase"}
+# Plage de ports des conteneurs MongoDB du pool (MongoDB réserve le port exact demandé)
+MONGO_POOL_PORTS = (27017, 28000)
+# Identifiants par défaut de SparkInstaller et MongoDBInstaller (variables d'environnement
+# du conteneur), seuls compatibles avec un conteneur du pool
+DEFAULT_CREDENTIALS = {"spark": ("admin", "password"), "mongodb": ("admin", "password")}
+
+
+def pool_settings(tool: str) -> Dict[str, Any]:
+    """Taille, durée de vie (s) et limite mémoire du pool d'un outil (BIGDATA_POOL_<OUTIL>_*)."""
+    prefix = f"BIGDATA_POOL_{tool.upper()}_"
+    return {
+        "size": int(os.environ.get(prefix + "SIZE", "0")),
+        "ttl": float(os.environ.get(prefix + "TTL", "3600")),
+        "mem_limit": os.environ.get(prefix + "MEM") or None,
+    }
+
+
+def data_dir(container_name: str) -> str:
+    return os.path.abspath(os.path.join(".", "data", container_name))
+
+
+class _PoolEntry:
+    """Conteneur prêt, en attente d'être réclamé."""
+
+    def __init__(self, name: str, config: Dict[str, Any]):
+        self.name = name
+        self.config = config
+        self.created_at = time.time()
+
+
+class WarmPool:
+    """
+    Pool de conteneurs déjà démarrés et sains, par outil. Un démarrage réclame
+    un conteneur du pool (renommage, reprise de ses ports, lien vers son dossier
+    de données) au lieu d'en créer un ; un refiller en arrière-plan recrée les
+    conteneurs consommés ou expirés.
+
+    Docker ne permet pas de modifier les ports publiés, les volumes ni
+    l'environnement d'un conteneur existant : une demande avec un volume
+    explicite (ou, pour Spark et MongoDB, d'autres identifiants que ceux par défaut)
+    est donc servie par une installation classique. Le port renvoyé est celui
+    du conteneur réclamé.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._settings = {tool: pool_settings(tool) for tool in POOL_TOOLS}
+        self._ready: Dict[str, deque] = {tool: deque() for tool in POOL_TOOLS}
+        self._creating: Dict[str, int] = {tool: 0 for tool in POOL_TOOLS}
+        self._stats: Dict[str, Dict[str, int]] = {
+            tool: {"hits": 0, "misses": 0, "created": 0, "expired": 0, "failed": 0}
+            for tool in POOL_TOOLS
+        }
+        self._make_installer: Optional[Callable[..., Any]] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def enabled(self) -> bool:
+        return any(s["size"] > 0 for s in self._settings.values())
+
+    def start(self, make_installer: Callable[..., Any]) -> None:
+        """
+        Démarre le refiller. make_installer(outil, config) instancie l'installateur :
+        les conteneurs du pool sont créés par le cycle de vie normal de l'outil.
+        """
+        with self._lock:
+            if self._thread is not None or not self.enabled:
+                return
+            self._make_installer = make_installer
+            self._executor = ThreadPoolExecutor(max_workers=POOL_WORKERS, thread_name_prefix="pool")
+            self._thread = threading.Thread(target=self._run, name="warm-pool", daemon=True)
+        self._remove_orphans()
+        self._thread.start()
+
+    def _remove_orphans(self) -> None:
+        """Supprime les conteneurs du pool laissés par une exécution précédente."""
+        try:
+            containers = get_docker_client().containers.list(all=True, filters={"label": POOL_LABEL})
+        except DockerException as e:
+            logger.warning(f"Pool chaud : nettoyage impossible : {e}")
+            return
+        for container in containers:
+            if container.name.startswith(POOL_PREFIX):
+                self._discard(container.name)
+
+    def _run(self) -> None:
+        while True:
+            try:
+                self._refill()
+            except Exception as e:
+                logger.error(f"Pool chaud : erreur du refiller : {e}")
+            self._wake.wait(POOL_CHECK_INTERVAL)
+            self._wake.clear()
+
+    def _refill(self) -> None:
+        now = time.time()
+        for tool, settings in self._settings.items():
+            expired: List[_PoolEntry] = []
+            with self._lock:
+                ready = self._ready[tool]
+                while ready and now - ready[0].created_at > settings["ttl"]:
+                    expired.append(ready.popleft())
+                self._stats[tool]["expired"] += len(expired)
+                missing = settings["size"] - len(ready) - self._creating[tool]
+                if missing > 0:
+                    self._creating[tool] += missing
+            for entry in expired:
+                self._discard(entry.name)
+            for _ in range(max(missing, 0)):
+                self._executor.submit(self._create, tool)
+
+    def _create(self, tool: str) -> None:
+        name = f"{POOL_PREFIX}{tool}-{uuid.uuid4().hex[:8]}"
+        settings = self._settings[tool]
+        options: Dict[str, Any] = {"labels": {POOL_LABEL: tool}}
+        if settings["mem_limit"]:
+            options["mem_limit"] = settings["mem_limit"]
+        config: Dict[str, Any] = {"container_name": name, "container_options": options}
+        try:
+            if tool == "mongodb":
+                start, end = MONGO_POOL_PORTS
+                config["port"], = port_allocator.allocate(name, [(start, start, end)])
+            else:
+                config["port"] = {"spark": 8080, "hbase": 16010}[tool]
+            installer = self._make_installer(tool, config)
+            run_lifecycle(installer)
+            with self._lock:
+                self._ready[tool].append(_PoolEntry(name, installer.config))
+                self._stats[tool]["created"] += 1
+            logger.info(f"Pool chaud : {name} prêt.")
+        except Exception as e:
+            logger.error(f"Pool chaud : création de {name} échouée : {e}")
+            self._discard(name)
+            with self._lock:
+                self._stats[tool]["failed"] += 1
+        finally:
+            with self._lock:
+                self._creating[tool] -= 1
+
+    def _discard(self, name: str) -> None:
+        remove_container(name, logger)
+        port_allocator.release(name)
+        shutil.rmtree(data_dir(name), ignore_errors=True)
+
+    def _compatible(self, tool: str, config: Dict[str, Any]) -> bool:
+        name = config.get("container_name")
+        if not name or config.get("volume") or get_container(name) is not None:
+            return False
+        if tool in DATA_DIR_TOOLS and os.path.lexists(data_dir(name)):
+            return False
+        # Variables JVM et arguments de mongod ne peuvent pas être changés après coup
+        if resolve_resources(tool, config):
+            return False
+        # Le pool ne contient que des instances autonomes de l'image par défaut, pas de clusters
+        if any(config.get(k) for k in ("workers", "regionservers", "replicas", "shards", "image")):
+            return False
+        if tool in DEFAULT_CREDENTIALS:
+            default_user, default_password = DEFAULT_CREDENTIALS[tool]
+            credentials = (config.get("username") or default_user, config.get("password") or default_password)
+            return credentials == DEFAULT_CREDENTIALS[tool]
+        return True
+
+    def claim(self, tool: str, installer: Any) -> Optional[Dict[str, Any]]:
+        """
+        Réclame un conteneur prêt pour installer.config["container_name"].
+        Retourne le résultat du démarrage, ou None si le pool ne peut pas servir la demande.
+
+        Un port imposé par la demande doit être celui du conteneur du pool, sinon
+        l'outil part d'une installation complète ; sans port imposé, le port du
+        pool est repris dans installer.config (puis dans l'état souhaité par le réconciliateur).
+        """
+        if self._settings.get(tool, {}).get("size", 0) <= 0:
+            return None
+        entry = None
+        if self._compatible(tool, installer.config):
+            pinned = {
+                k: v for k, v in installer.config.items()
+                if (k == "port" or k.endswith("_port")) and v is not None
+            }
+            with self._lock:
+                for candidate in self._ready[tool]:
+                    if all(candidate.config.get(k) == v for k, v in pinned.items()):
+                        entry = candidate
+                        self._ready[tool].remove(candidate)
+                        break
+        if entry is None:
+            with self._lock:
+                self._stats[tool]["misses"] += 1
+            POOL_CLAIMS.inc(tool=tool, result="miss")
+            return None
+        self._wake.set()
+
+        name = installer.config["container_name"]
+        linked = tool in DATA_DIR_TOOLS
+        if linked:
+            # Le montage du conteneur garde le dossier du pool : ./data/<nom> n'en est qu'un lien,
+            # persistant sur disque, suivi par les ingestions et par une recréation ultérieure
+            try:
+                os.symlink(data_dir(entry.name), data_dir(name), target_is_directory=True)
+            except OSError as e:
+                installer.logger.warning(f"Lien vers le dossier de {entry.name} impossible : {e}")
+                with self._lock:
+                    self._ready[tool].appendleft(entry)
+                    self._stats[tool]["misses"] += 1
+                POOL_CLAIMS.inc(tool=tool, result="miss")
+                return None
+        try:
+            get_container(entry.name).rename(name)
+        except (AttributeError, DockerException) as e:
+            installer.logger.warning(f"Conteneur du pool {entry.name} inutilisable : {e}")
+            if linked:
+                os.unlink(data_dir(name))
+            self._discard(entry.name)
+            with self._lock:
+                self._stats[tool]["misses"] += 1
+            POOL_CLAIMS.inc(tool=tool, result="miss")
+            return None
+        port_allocator.transfer(entry.name, name)
+
+        installer.config.update({
+            k: v for k, v in entry.config.items() if k not in ("container_name", "container_options")
+        })
+        installer.logger.info(f"Conteneur {entry.name} du pool chaud réclamé pour {name}.")
+        installer.progress(90)
+        if not installer.test_installation():
+            rollback_after_failure(installer)
+            raise RuntimeError("Test d'installation échoué.")
+        installer.progress(100)
+        with self._lock:
+            self._stats[tool]["hits"] += 1
+        POOL_CLAIMS.inc(tool=tool, result="hit")
+        return {"status": "started", "port": installer.config.get("port"), "pool": True}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                tool: {
+                    **self._settings[tool],
+                    **self._stats[tool],
+                    "ready": [entry.name for entry in self._ready[tool]],
+                    "creating": self._creating[tool],
+                }
+                for tool in POOL_TOOLS
+            }
+
+
+def start_or_claim(tool: str, installer: Any) -> Dict[str, Any]:
+    """Démarre un outil depuis le pool chaud si possible, sinon par une installation complète."""
+    result = warm_pool.claim(tool, installer)
+    return result if result is not None else run_lifecycle(installer)
+
+
+warm_pool = WarmPool()
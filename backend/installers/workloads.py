@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Scripts de charge copiés dans les conteneurs au moment du benchmark
+SCRIPTS_DIR = os.path.join(os.path.dirname(__file__), "scripts")
+# Dossier des conteneurs où les scripts sont déposés
+WORKLOAD_DIR = "/tmp"
+# Résultats conservés par conteneur
+BENCHMARK_HISTORY = int(os.environ.get("BIGDATA_BENCHMARK_HISTORY", "50"))
+
+# Charges de référence par outil, avec leurs paramètres par défaut (le type fait foi)
+WORKLOADS: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "spark": {
+        "groupby": {"rows": 10000000, "partitions": 8, "keys": 1000, "iterations": 3},
+        "terasort": {"rows": 1000000, "partitions": 8, "iterations": 1},
+    },
+    "hbase": {
+        # PerformanceEvaluation : écriture séquentielle puis lectures aléatoires de la même table
+        "pe": {"rows": 100000, "clients": 1, "value_size": 1000, "tests": "sequentialWrite,randomRead"},
+    },
+    "mongodb": {
+        "ycsb": {"records": 10000, "operations": 10000, "read_proportion": 0.5, "field_length": 100},
+    },
+}
+DEFAULT_WORKLOADS = {"spark": "groupby", "hbase": "pe", "mongodb": "ycsb"}
+HBASE_PE_TESTS = ("sequentialWrite", "sequentialRead", "randomWrite", "randomRead", "scan")
+
+
+def resolve_workload(tool: str, workload: Optional[str], params: Dict[str, Any]) -> tuple:
+    """
+    (charge, paramètres) : paramètres par défaut de la charge, remplacés par
+    ceux fournis, convertis au type du défaut. Lève ValueError sinon.
+    """
+    workloads = WORKLOADS.get(tool, {})
+    workload = workload or DEFAULT_WORKLOADS.get(tool)
+    if workload not in workloads:
+        raise ValueError(f"Charge inconnue pour {tool} : {workload} (charges : {', '.join(workloads)})")
+    defaults = workloads[workload]
+    unknown = sorted(set(params) - set(defaults))
+    if unknown:
+        raise ValueError(f"Paramètre(s) inconnu(s) pour {workload} : {', '.join(unknown)}")
+    resolved = dict(defaults)
+    for key, value in params.items():
+        try:
+            resolved[key] = type(defaults[key])(value)
+        except (TypeError, ValueError):
+            raise ValueError(f"Paramètre {key} invalide : {value}")
+        # Tailles et compteurs strictement positifs, proportions dans [0, 1]
+        invalid = resolved[key] <= 0 if isinstance(resolved[key], int) else (
+            isinstance(resolved[key], float) and not 0 <= resolved[key] <= 1
+        )
+        if invalid:
+            raise ValueError(f"Paramètre {key} invalide : {value}")
+    if tool == "hbase":
+        tests = [t for t in resolved["tests"].split(",") if t]
+        if not tests or any(t not in HBASE_PE_TESTS for t in tests):
+            raise ValueError(f"Tests PerformanceEvaluation valides : {', '.join(HBASE_PE_TESTS)}")
+    return workload, resolved
+
+
+def read_script(filename: str) -> bytes:
+    with open(os.path.join(SCRIPTS_DIR, filename), "rb") as f:
+        return f.read()
+
+
+def last_json_line(output: str) -> Dict[str, Any]:
+    """Rapport JSON d'un script de charge : dernière ligne JSON de la sortie (les logs précèdent)."""
+    for line in reversed(output.splitlines()):
+        line = line.strip()
+        if line.startswith("{"):
+            return json.loads(line)
+    raise RuntimeError(f"Aucun rapport JSON dans la sortie : {output[-500:]}")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile par rang le plus proche (q entre 0 et 100)."""
+    ordered = sorted(values)
+    index = max(int(round(q / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(index, len(ordered) - 1)]
+
+
+def latency_summary(latencies_ms: List[float]) -> Dict[str, float]:
+    if not latencies_ms:
+        return {}
+    return {
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 3),
+        "max_ms": round(max(latencies_ms), 3),
+    }
+
+
+def phase_result(operations: int, duration_ms: float, latencies_ms: Optional[List[float]] = None,
+                 latency: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+    """Résultat normalisé d'une phase : opérations, durée, débit (op/s) et latences."""
+    return {
+        "operations": operations,
+        "duration_s": round(duration_ms / 1000, 3),
+        "throughput_ops": round(operations / (duration_ms / 1000), 2) if duration_ms else 0.0,
+        "latency": latency if latency is not None else latency_summary(latencies_ms or []),
+    }
+
+
+# PerformanceEvaluation : "Finished TestClient-0 in 5386ms over 100000 rows" (2.x)
+# ou "Finished class ...RandomReadTest in 5386ms at offset 0 for 100000 rows" (1.x)
+_PE_FINISHED = re.compile(r"Finished \S+ in (\d+)ms (?:over|at offset \d+ for) (\d+) rows")
+# Latences : "Latency (us) : mean=12.3, min=3.0, max=900.0, ..., 50th=10.0, ..., 99th=55.0"
+_PE_LATENCY = re.compile(r"\b(avg|mean|50th|99th|max)\s*=\s*([\d.]+)", re.IGNORECASE)
+
+
+def parse_pe_output(output: str) -> Dict[str, Any]:
+    """Débit et latences (µs dans la sortie de PE, convertis en ms) d'un test PerformanceEvaluation."""
+    finished = _PE_FINISHED.findall(output)
+    if not finished:
+        raise RuntimeError(f"Sortie PerformanceEvaluation inattendue : {output[-500:]}")
+    duration_ms = max(int(ms) for ms, _ in finished)
+    rows = sum(int(n) for _, n in finished)
+    values: Dict[str, float] = {}
+    for name, value in _PE_LATENCY.findall(output):
+        values.setdefault(name.lower(), float(value) / 1000)
+    latency = {}
+    for name, key in (("50th", "p50_ms"), ("99th", "p99_ms"), ("mean", "mean_ms"), ("avg", "mean_ms"), ("max", "max_ms")):
+        if name in values:
+            latency.setdefault(key, round(values[name], 3))
+    return phase_result(rows, duration_ms, latency=latency)
+
+
+def config_hash(snapshot: Dict[str, Any]) -> str:
+    """Empreinte stable d'un instantané de configuration."""
+    canonical = json.dumps(snapshot, sort_keys=True, default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()[:12]
+
+
+def headline(result: Dict[str, Any]) -> Optional[float]:
+    """Débit principal d'un résultat : moyenne des débits de ses phases."""
+    phases = result.get("phases") or {}
+    values = [p["throughput_ops"] for p in phases.values() if p.get("throughput_ops")]
+    return round(sum(values) / len(values), 2) if values else None
+
+
+class BenchmarkStore:
+    """
+    Résultats des benchmarks par conteneur, rattachés à l'instantané de
+    configuration mesuré (empreinte config_hash) : les mesures avant et après
+    un update-config se comparent directement.
+    """
+
+    def __init__(self, history: int = BENCHMARK_HISTORY):
+        self._history = history
+        self._lock = threading.Lock()
+        self._runs: Dict[tuple, deque] = {}
+
+    def record(self, tool: str, container_name: str, snapshot: Dict[str, Any], workload: str,
+               params: Dict[str, Any], result: Dict[str, Any]) -> Dict[str, Any]:
+        entry = {
+            "tool": tool,
+            "container_name": container_name,
+            "config_hash": config_hash(snapshot),
+            "config": snapshot,
+            "workload": workload,
+            "params": params,
+            "result": result,
+            "timestamp": time.time(),
+        }
+        with self._lock:
+            self._runs.setdefault((tool, container_name), deque(maxlen=self._history)).append(entry)
+        return entry
+
+    def history(self, tool: str, container_name: str, workload: Optional[str] = None) -> List[Dict[str, Any]]:
+        with self._lock:
+            runs = list(self._runs.get((tool, container_name), ()))
+        return [r for r in runs if workload is None or r["workload"] == workload]
+
+    def compare(self, tool: str, container_name: str, workload: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Dernier résultat par instantané de configuration (du plus ancien au plus
+        récent), avec l'écart de débit par rapport à l'instantané précédent.
+        """
+        latest: Dict[tuple, Dict[str, Any]] = {}
+        for run in self.history(tool, container_name, workload):
+            latest.pop((run["workload"], run["config_hash"]), None)
+            latest[(run["workload"], run["config_hash"])] = run
+        previous: Dict[str, float] = {}
+        comparison = []
+        for (name, digest), run in latest.items():
+            throughput = headline(run["result"])
+            row = {"workload": name, "config_hash": digest, "timestamp": run["timestamp"], "throughput_ops": throughput}
+            if throughput and previous.get(name):
+                row["change_pct"] = round((throughput - previous[name]) / previous[name] * 100, 2)
+            if throughput:
+                previous[name] = throughput
+            comparison.append(row)
+        return comparison
+
+
+def run_benchmark(installer: Any, workload: str, params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Mesure une charge dans le conteneur de l'installateur et enregistre le
+    résultat avec l'instantané de configuration pris juste avant.
+    """
+    container_name = installer.config["container_name"]
+    snapshot = installer.config_snapshot()
+    installer.logger.info(f"Benchmark {workload} sur {container_name} (config {config_hash(snapshot)})...")
+    started = time.time()
+    phases = installer.benchmark(workload, params)
+    result = {"phases": phases, "elapsed_s": round(time.time() - started, 3)}
+    entry = benchmark_store.record(installer.tool_name, container_name, snapshot, workload, params, result)
+    return {**entry, "comparison": benchmark_store.compare(installer.tool_name, container_name, workload)}
+
+
+benchmark_store = BenchmarkStore()
@@ -1,12 +1,53 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
 from backend.routers import tools
+from backend.installers.images import PREPULL_IMAGES, PREWARM_IMAGES
+from backend.installers.config_cache import config_cache
+from backend.installers.inventory import inventory
+from backend.installers.metrics import registry
+from backend.installers.reconciler import reconciler, recover
+from backend.installers.warm_pool import warm_pool
 from fastapi.middleware.cors import CORSMiddleware
+import logging
 import os
-import docker
 
-app = FastAPI()
+logger = logging.getLogger("installer_logger")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Inventaire des conteneurs : listage initial puis mise à jour par événements Docker
+    try:
+        await run_in_threadpool(inventory.start)
+    except Exception as e:
+        logger.warning(f"Inventaire Docker non initialisé au démarrage : {e}")
+    # Reprise de l'état persistant (BIGDATA_STATE_DB) confronté à l'inventaire Docker,
+    # avant toute soumission de job : seules les opérations du processus précédent sont interrompues
+    try:
+        await run_in_threadpool(recover)
+    except Exception as e:
+        # Base illisible (dossier en lecture seule, verrouillée...) : le backend démarre sans état repris
+        logger.warning(f"Reprise de l'état persistant impossible, démarrage avec un état vide : {e}")
+    # Cache des configurations : invalidé par les événements Docker des conteneurs
+    config_cache.start()
+    # Préconstruction des images personnalisées (BIGDATA_PREWARM_IMAGES=1)
+    if PREWARM_IMAGES:
+        tools.prewarm_tool_images()
+    # Téléchargement de l'image MongoDB épinglée (BIGDATA_PREPULL_IMAGES=0 pour désactiver)
+    if PREPULL_IMAGES:
+        tools.prepull_official_images()
+    # Boucle de réconciliation des états souhaités (PUT /tools/{outil}/{conteneur})
+    reconciler.start(tools.get_installer)
+    # Pool chaud de conteneurs (BIGDATA_POOL_<OUTIL>_SIZE > 0)
+    if warm_pool.enabled:
+        await run_in_threadpool(warm_pool.start, tools.get_installer)
+    yield
+
+
+app = FastAPI(lifespan=lifespan)
 app.include_router(tools.router)
 
 # Configuration CORS pour permettre les requêtes depuis le frontend
@@ -18,6 +59,11 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Métriques au format texte Prometheus (durées par outil et par phase, échecs, jauges)."""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 # Serve static files from the frontend directory
 frontend_path = os.path.join(os.path.dirname(__file__), '..', 'frontend')
 app.mount("/static", StaticFiles(directory=frontend_path), name="static")
@@ -26,22 +72,3 @@ app.mount("/static", StaticFiles(directory=frontend_path), name="static")
 @app.get("/")
 def read_index():
     return FileResponse(os.path.join(frontend_path, "index.html"))
-
-@app.get("/tools/containers")
-def list_containers(created_by: str = None):
-    client = docker.from_env()
-    containers = client.containers.list(all=True)
-    result = []
-    for c in containers:
-        # Optionally filter by label or name
-        if created_by:
-            if not c.name or created_by not in c.name:
-                continue
-        ports = c.attrs.get('NetworkSettings', {}).get('Ports', {})
-        result.append({
-            "name": c.name,
-            "image": c.image.tags[0] if c.image.tags else c.image.short_id,
-            "status": c.status,
-            "ports": ports
-        })
-    return JSONResponse({"containers": result})
\ No newline at end of file
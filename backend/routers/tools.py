@@ -1,8 +1,28 @@
-from fastapi import APIRouter, HTTPException, Body
-from pydantic import BaseModel, Field
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from starlette.requests import ClientDisconnect
+from pydantic import BaseModel, Field, field_validator
 import logging
 import importlib
 import docker
+from backend.installers.utils import get_docker_client
+from backend.installers.batch import BATCH_CONCURRENCY, BATCH_MAX_CONCURRENCY, run_batch
+from backend.installers.config_cache import config_cache
+from backend.installers.images import BUILD_CONTEXTS, MONGO_IMAGE, build_manager, image_manager
+from backend.installers.ingest import (
+    INGEST_BATCH_SIZE, INGEST_MAX_PARALLELISM, INGEST_PARALLELISM, IngestStats, IngestStream, ingests,
+    resolve_format, run_ingest,
+)
+from backend.installers.inventory import inventory
+from backend.installers.jobs import engine
+from backend.installers.profiles import PROFILES, RESOURCE_FIELDS
+from backend.installers.reconciler import desired_states, reconciler
+from backend.installers.state import state_store
+from backend.installers.progress import ChannelLogger
+from backend.installers.telemetry import TELEMETRY_HISTORY, aggregate, collector
+from backend.installers.warm_pool import POOL_PREFIX, warm_pool
+from backend.installers.workloads import benchmark_store, resolve_workload, run_benchmark
 
 router = APIRouter(prefix="/tools", tags=["tools"])
 
@@ -24,14 +44,56 @@ def dummy_progress(p: int):
 
 # ------------------- MODELS -------------------
 
-class ToolConfig(BaseModel):
+class ResourceSettings(BaseModel):
+    """Limites et réglages de performance ; un profil fournit les valeurs non renseignées."""
+    profile: str | None = None
+    cpus: float | None = Field(default=None, gt=0)
+    memory: str | None = Field(default=None, pattern=r"^\d+(\.\d+)?[bkmgBKMG]?$")
+    cpuset: str | None = Field(default=None, pattern=r"^\d+([-,]\d+)*$")
+    spark_driver_memory: str | None = Field(default=None, pattern=r"^\d+[kmgtKMGT]?$")
+    spark_executor_memory: str | None = Field(default=None, pattern=r"^\d+[kmgtKMGT]?$")
+    spark_executor_cores: int | None = Field(default=None, ge=1)
+    hbase_heapsize: str | None = Field(default=None, pattern=r"^\d+[kmgKMG]?$")
+    hbase_handler_count: int | None = Field(default=None, ge=1)
+    mongo_cache_gb: float | None = Field(default=None, ge=0.25)
+
+    @field_validator("profile")
+    @classmethod
+    def known_profile(cls, value):
+        if value is not None and value not in PROFILES:
+            raise ValueError(f"profil inconnu, profils disponibles : {', '.join(PROFILES)}")
+        return value
+
+    def resources(self) -> dict:
+        return self.dict(include=set(RESOURCE_FIELDS), exclude_none=True)
+
+class ToolConfig(ResourceSettings):
     container_name: str
     username: str | None = None
     password: str | None = None
     port: int | None = Field(default=None, ge=1, le=65535)
     volume: str | None = None
-
-class ToolUpdateConfig(BaseModel):
+    # Mode cluster Spark : nombre de workers et ressources de chacun
+    workers: int | None = Field(default=None, ge=0, le=64)
+    worker_cores: int | None = Field(default=None, ge=1)
+    worker_memory: str | None = Field(default=None, pattern=r"^\d+[kmgtKMGT]?$")
+    # Mode HBase distribué : nombre de RegionServers (ZooKeeper et master séparés)
+    regionservers: int | None = Field(default=None, ge=0, le=32)
+    # MongoDB : replica set de 'replicas' membres, ou cluster shardé ('shards' shards + mongos)
+    replicas: int | None = Field(default=None, ge=0, le=7)
+    shards: int | None = Field(default=None, ge=0, le=8)
+
+class DesiredToolState(ToolConfig):
+    """État souhaité complet d'un conteneur (PUT /tools/{outil}/{conteneur})."""
+    container_name: str | None = None
+    # Image MongoDB (tag ou 'mongo@sha256:...') ; Spark et HBase suivent leur contexte de build
+    image: str | None = None
+    config: dict = Field(default_factory=dict)
+
+    def spec(self) -> dict:
+        return self.dict(exclude={"container_name", "image", "config"}, exclude_none=True)
+
+class ToolUpdateConfig(ResourceSettings):
     container_name: str
     port: int = Field(..., ge=1, le=65535)
     config: dict
@@ -39,166 +101,606 @@ class ToolUpdateConfig(BaseModel):
 class MongoToolConfig(BaseModel):
     container_name: str
 
+class SparkScaleConfig(BaseModel):
+    container_name: str
+    workers: int = Field(..., ge=0, le=64)
+    worker_cores: int | None = Field(default=None, ge=1)
+    worker_memory: str | None = Field(default=None, pattern=r"^\d+[kmgtKMGT]?$")
+
+class HBaseScaleConfig(BaseModel):
+    container_name: str
+    regionservers: int = Field(..., ge=0, le=32)
+
+class BenchmarkRequest(BaseModel):
+    container_name: str
+    # Charge de référence de l'outil (défaut : groupby, pe, ycsb) et ses paramètres
+    workload: str | None = None
+    params: dict = Field(default_factory=dict)
+
+class BatchItem(BaseModel):
+    tool: str
+    config: ToolConfig
+
+class BatchRequest(BaseModel):
+    items: list[BatchItem] = Field(..., min_length=1)
+    concurrency: int = Field(default=BATCH_CONCURRENCY, ge=1, le=BATCH_MAX_CONCURRENCY)
+    all_or_nothing: bool = False
+
 
 # ------------------- ROUTES -------------------
 
-@router.post("/{tool_name}/start")
-def start_tool(tool_name: str, config: ToolConfig = Body(...)):
+def get_installer(tool_name: str, config: dict, job=None, item: int | None = None):
     """
-    Démarre un outil donné avec la configuration fournie.
-    Importe dynamiquement l'installateur correspondant.
+    Instancie dynamiquement l'installateur correspondant à l'outil.
+    Si un job est fourni, la progression et les logs sont publiés sur son canal.
     """
-    if tool_name not in TOOLS:
-        raise HTTPException(status_code=404, detail="Outil non supporté")
-    try:
-        module = importlib.import_module(f"backend.installers.{tool_name}_installer")
-        installer_class = getattr(module, TOOLS[tool_name])
-        installer = installer_class(config=config.dict(), progress_callback=dummy_progress, logger=logger)
+    module = importlib.import_module(f"backend.installers.{tool_name}_installer")
+    installer_class = getattr(module, TOOLS[tool_name])
+    progress, job_logger = job_reporting(job, item)
+    return installer_class(config=config, progress_callback=progress, logger=job_logger)
 
-        installer.check_prerequisites()
-        installer.install()
 
-        if not installer.test_installation():
-            installer.rollback()
-            raise HTTPException(status_code=500, detail="Test d'installation échoué.")
+def job_reporting(job=None, item: int | None = None):
+    """
+    Retourne (callback de progression, logger) pour un job donné.
+    Pour un élément de batch, la progression et les logs sont rattachés à son index.
+    """
+    if job is None:
+        return dummy_progress, logger
+    if item is not None:
+        def item_progress(p: int):
+            dummy_progress(p)
+            job.channel.publish("item_progress", index=item, percent=p)
 
-        return {"status": "started", "tool": tool_name}
+        return item_progress, ChannelLogger(logger, job.channel, prefix=f"[{item}] ")
+
+    def progress(p: int):
+        dummy_progress(p)
+        job.channel.progress(p)
+
+    return progress, ChannelLogger(logger, job.channel)
+
+
+def submit_job(tool_name: str, action: str, container_name: str, fn, coordinator: bool = False) -> dict:
+    """Soumet une opération au moteur de jobs et retourne son identifiant (coordinator : voir JobEngine.submit)."""
+    def run(job):
+        try:
+            return fn(job)
+        except Exception as e:
+            logger.error(f"Erreur {action} {tool_name} : {e}")
+            raise
+
+    job = engine.submit(tool_name, action, container_name, run, coordinator=coordinator)
+    return {"job_id": job.id, "status": job.status, "tool": tool_name}
 
-    except Exception as e:
-        logger.error(f"Erreur installation {tool_name} : {e}")
-        raise HTTPException(status_code=500, detail=str(e))
 
+def submit_reconcile(tool_name: str, container_name: str, action: str = "reconcile") -> dict:
+    """Soumet sans délai la réconciliation d'un conteneur avec son état souhaité."""
+    job = reconciler.submit(container_name, get_installer, action)
+    return {"job_id": job.id, "status": job.status, "tool": tool_name}
 
-@router.post("/{tool_name}/stop")
+
+@router.post("/{tool_name}/start", status_code=202)
+def start_tool(tool_name: str, config: ToolConfig = Body(...)):
+    """
+    Démarre un outil donné avec la configuration fournie, enregistrée comme
+    état souhaité du conteneur ; le job de réconciliation l'installe (depuis le
+    pool chaud quand c'est possible) ou corrige un conteneur existant.
+    """
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+
+    spec = config.dict(exclude={"container_name"}, exclude_none=True)
+    desired_states.merge(tool_name, config.container_name, spec)
+    return submit_reconcile(tool_name, config.container_name, "start")
+
+
+@router.post("/{tool_name}/stop", status_code=202)
 def stop_tool(tool_name: str, config: ToolConfig = Body(...)):
     """
     Arrête un outil donné en effectuant un rollback via l'installateur.
     """
     if tool_name not in TOOLS:
         raise HTTPException(status_code=404, detail="Outil non supporté")
-    try:
-        module = importlib.import_module(f"backend.installers.{tool_name}_installer")
-        installer_class = getattr(module, TOOLS[tool_name])
-        installer = installer_class(config=config.dict(), progress_callback=dummy_progress, logger=logger)
 
-        installer.rollback()
+    desired_states.forget(config.container_name)
 
+    def run(job):
+        installer = get_installer(tool_name, config.dict(), job)
+        installer.rollback()
         return {"status": "stopped", "tool": tool_name}
 
-    except Exception as e:
-        logger.error(f"Erreur arrêt {tool_name} : {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return submit_job(tool_name, "stop", config.container_name, run)
 
 
-@router.get("/containers")
-def list_all_containers():
+@router.post("/batch", status_code=202)
+def start_batch(batch: BatchRequest):
+    """
+    Démarre plusieurs outils en parallèle (une pile Spark + HBase + MongoDB,
+    N conteneurs Spark...) dans un seul job. Le résultat du job donne l'issue
+    de chaque élément ; avec all_or_nothing, tout échec annule les autres.
+    """
+    unknown = sorted({item.tool for item in batch.items if item.tool not in TOOLS})
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Outil(s) non supporté(s) : {', '.join(unknown)}")
+    names = [item.config.container_name for item in batch.items]
+    duplicates = sorted({n for n in names if names.count(n) > 1})
+    if duplicates:
+        raise HTTPException(status_code=400, detail=f"Conteneur(s) en double : {', '.join(duplicates)}")
+
+    items = [{"tool": item.tool, "config": item.config.dict()} for item in batch.items]
+
+    def run(job):
+        return run_batch(
+            items,
+            lambda index, item: get_installer(item["tool"], item["config"], job, index),
+            job.channel,
+            concurrency=batch.concurrency,
+            all_or_nothing=batch.all_or_nothing,
+        )
+
+    # Job coordinateur : le libellé ne réserve rien, chaque élément réserve son propre conteneur
+    return submit_job("batch", "start", f"batch:{','.join(names)}", run, coordinator=True)
+
+
+@router.get("/jobs")
+def list_jobs(
+    tool: str | None = None,
+    container_name: str | None = None,
+    limit: int = Query(50, ge=1, le=500),
+):
     """
-    Retourne la liste de tous les conteneurs Docker (avec détails).
+    Opérations enregistrées (y compris celles d'avant le dernier démarrage du
+    backend), les plus récentes d'abord, filtrées par outil et par conteneur.
     """
+    return {"jobs": state_store.operations(container_name=container_name, tool=tool, limit=limit)}
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """
+    Retourne l'état et le résultat d'un job (depuis la base d'état s'il n'est
+    plus en mémoire).
+    """
+    job = engine.get(job_id)
+    if job is not None:
+        return job.to_dict()
+    operation = state_store.operation(job_id)
+    if operation is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return operation
+
+
+@router.get("/jobs/{job_id}/events")
+def stream_job_events(job_id: str, request: Request):
+    """
+    Flux Server-Sent Events de la progression d'un job (pourcentages, lignes
+    de sortie Docker, événement 'end'). Reprend après l'en-tête Last-Event-ID.
+    """
+    job = engine.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job introuvable")
     try:
-        client = docker.from_env()
-        containers = client.containers.list(all=True)
-
-        result = []
-        for c in containers:
-            try:
-                image_tag = c.image.tags[0] if c.image.tags else "untagged"
-            except Exception as ex:
-                logger.warning(f"Erreur récupération image du conteneur {c.name}: {ex}")
-                image_tag = "unknown_error"
-            result.append({
-                "id": c.id,
-                "name": c.name,
-                "status": c.status,
-                "image": image_tag,
-                "ports": c.attrs.get("NetworkSettings", {}).get("Ports", {}),
-            })
-
-        return {"containers": result}
+        last_seq = int(request.headers.get("last-event-id", "0"))
+    except ValueError:
+        last_seq = 0
+    return StreamingResponse(
+        job.channel.sse(last_seq),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
 
+@router.get("/containers")
+def list_all_containers(
+    request: Request,
+    created_by: str | None = None,
+    label: list[str] = Query(default=[]),
+    name: str | None = None,
+    limit: int | None = Query(default=None, ge=1, le=1000),
+    offset: int = Query(default=0, ge=0),
+):
+    """
+    Retourne la liste des conteneurs Docker depuis l'inventaire en mémoire.
+    Filtres : label created_by, labels 'clé=valeur', sous-chaîne du nom ; pagination par limit/offset.
+    Répond 304 si l'ETag fourni dans If-None-Match est toujours valide.
+    """
+    labels = {}
+    for item in label:
+        key, sep, value = item.partition("=")
+        if not sep:
+            raise HTTPException(status_code=400, detail=f"Label invalide : '{item}' (attendu clé=valeur)")
+        labels[key] = value
+
+    try:
+        etag, containers = inventory.snapshot(created_by=created_by, labels=labels, name=name)
     except Exception as e:
         logger.error(f"Erreur récupération des conteneurs Docker : {e}")
         raise HTTPException(status_code=500, detail="Impossible de récupérer les conteneurs Docker.")
+    # Les conteneurs du pool chaud non réclamés ne sont pas des instances utilisateur
+    containers = [c for c in containers if not c["name"].startswith(POOL_PREFIX)]
+
+    # no-cache : le navigateur revalide systématiquement via If-None-Match
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+
+    page = containers[offset:offset + limit] if limit else containers[offset:]
+    return JSONResponse(
+        {"containers": page, "total": len(containers), "offset": offset},
+        headers=headers,
+    )
+
+
+@router.get("/{tool_name}/stats")
+def get_tool_stats(
+    tool_name: str,
+    name: str | None = None,
+    history: int = Query(default=0, ge=0, le=TELEMETRY_HISTORY),
+):
+    """
+    Statistiques des conteneurs en cours d'un outil (CPU, mémoire, E/S disque
+    et réseau), lues dans les tampons du collecteur partagé. 'history' joint
+    les N derniers échantillons de chaque conteneur.
+    """
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    containers = collector.read(tool=tool_name, name=name, history=history)
+    return {
+        "tool": tool_name,
+        "interval": collector.interval,
+        "total": aggregate(containers),
+        "containers": containers,
+    }
+
+
+@router.get("/{tool_name}/stats/stream")
+def stream_tool_stats(tool_name: str, name: str | None = None):
+    """Flux Server-Sent Events des statistiques d'un outil, un événement par échantillonnage."""
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    return StreamingResponse(
+        collector.sse(tool=tool_name, name=name),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.post("/{tool_name}/benchmark", status_code=202)
+def benchmark_tool(tool_name: str, request: BenchmarkRequest):
+    """
+    Exécute une charge de référence dans le conteneur (Spark groupby/terasort,
+    HBase PerformanceEvaluation, MongoDB YCSB) ; le résultat du job donne débit
+    et latences par phase, rattachés à l'empreinte de la configuration mesurée.
+    """
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    try:
+        workload, params = resolve_workload(tool_name, request.workload, request.params)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    def run(job):
+        installer = get_installer(tool_name, {"container_name": request.container_name}, job)
+        return run_benchmark(installer, workload, params)
+
+    return submit_job(tool_name, "benchmark", request.container_name, run)
+
+
+@router.get("/{tool_name}/benchmark")
+def get_benchmarks(tool_name: str, name: str, workload: str | None = None):
+    """
+    Résultats des benchmarks d'un conteneur, et comparaison par instantané de
+    configuration (avant/après update-config) : dernier débit de chacun et écart en %.
+    """
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    return {
+        "tool": tool_name,
+        "container_name": name,
+        "runs": benchmark_store.history(tool_name, name, workload),
+        "comparison": benchmark_store.compare(tool_name, name, workload),
+    }
+
+
+@router.get("/pool")
+def get_warm_pool():
+    """
+    État du pool chaud par outil : taille, TTL, limite mémoire, conteneurs prêts,
+    et compteurs hits/misses/créations/expirations.
+    """
+    return warm_pool.stats()
+
+
+# ------------- ÉTAT SOUHAITÉ --------------
+
+def redacted(entry: dict) -> dict:
+    """Copie d'un état sans le mot de passe (gardé en base pour les réconciliations)."""
+    if not entry["spec"].get("password"):
+        return entry
+    return {**entry, "spec": {**entry["spec"], "password": "***"}}
+
+
+def desired_state_or_404(tool_name: str, container_name: str) -> dict:
+    entry = desired_states.get(container_name)
+    if tool_name not in TOOLS or entry is None or entry["tool"] != tool_name:
+        raise HTTPException(status_code=404, detail=f"Aucun état souhaité pour {tool_name}/{container_name}")
+    return entry
+
+
+@router.get("/instances")
+def list_instances(tool: str | None = None):
+    """
+    Instances gérées lues dans la base d'état : paramètres et configuration
+    déclarés, génération, dernière réconciliation et identifiant Docker.
+    Le frontend y recharge ses formulaires.
+    """
+    if tool is not None and tool not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    return {"instances": [redacted(row) for row in state_store.instances(tool)]}
+
+
+@router.put("/{tool_name}/{container_name}", status_code=202)
+def put_desired_state(tool_name: str, container_name: str, state: DesiredToolState):
+    """
+    Déclare l'état souhaité complet d'un conteneur (paramètres, ressources,
+    configuration de l'outil, image). Un état identique au précédent ne
+    déclenche rien ; sinon la réconciliation est regroupée avec les PUT qui
+    suivent de près et ne fait que le travail nécessaire.
+    """
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    if state.image and tool_name != "mongodb":
+        raise HTTPException(status_code=400, detail="L'image Spark et HBase suit son contexte de build")
+    entry, changed = desired_states.put(tool_name, container_name, state.spec(), state.config, state.image)
+    reconciled = entry["status"].get("observed_generation") == entry["generation"] and not entry["status"].get("error")
+    due = reconciler.schedule(container_name) if changed or not reconciled else None
+    return {
+        "tool": tool_name,
+        "container_name": container_name,
+        "generation": entry["generation"],
+        "changed": changed,
+        "reconcile_at": due,
+    }
+
+
+@router.get("/{tool_name}/{container_name}/state")
+def get_desired_state(tool_name: str, container_name: str):
+    """État souhaité d'un conteneur et état de sa dernière réconciliation (génération observée, écarts, job)."""
+    return redacted(desired_state_or_404(tool_name, container_name))
+
+
+@router.get("/{tool_name}/{container_name}/history")
+def get_history(tool_name: str, container_name: str, limit: int = Query(20, ge=1, le=200)):
+    """Versions successives de l'état souhaité d'un conteneur et ses dernières opérations."""
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    configs = [redacted(row) for row in state_store.config_history(container_name, limit)]
+    return {
+        "tool": tool_name,
+        "container_name": container_name,
+        "configs": configs,
+        "operations": state_store.operations(container_name=container_name, tool=tool_name, limit=limit),
+    }
+
+
+@router.post("/{tool_name}/{container_name}/reconcile", status_code=202)
+def reconcile_now(tool_name: str, container_name: str):
+    """Réconcilie immédiatement un conteneur déclaré, sans attendre le regroupement."""
+    desired_state_or_404(tool_name, container_name)
+    return submit_reconcile(tool_name, container_name)
+
+
+@router.delete("/{tool_name}/{container_name}", status_code=202)
+def delete_desired_state(tool_name: str, container_name: str):
+    """Retire l'état souhaité d'un conteneur et le supprime (rollback de l'installateur)."""
+    entry = desired_state_or_404(tool_name, container_name)
+    desired_states.forget(container_name)
+
+    def run(job):
+        installer = get_installer(tool_name, {"container_name": container_name, **entry["spec"]}, job)
+        installer.rollback()
+        return {"status": "stopped", "tool": tool_name}
+
+    return submit_job(tool_name, "stop", container_name, run)
+
+
+# ------------- INGESTION --------------
+
+@router.post("/{tool_name}/{container_name}/ingest", status_code=202)
+async def ingest_data(
+    tool_name: str,
+    container_name: str,
+    request: Request,
+    data_format: str | None = Query(None, alias="format"),
+    target: str | None = None,
+    batch_size: int = Query(INGEST_BATCH_SIZE, ge=1, le=100000),
+    parallelism: int = Query(INGEST_PARALLELISM, ge=1, le=INGEST_MAX_PARALLELISM),
+    delimiter: str | None = Query(None, min_length=1, max_length=1),
+    row_key: str | None = None,
+    family: str | None = None,
+):
+    """
+    Charge le corps de la requête (CSV, JSON lines ou Parquet, envoi chunked
+    accepté) dans l'outil, au fil de la réception : MongoDB par insertMany non
+    ordonnés ('target' = base.collection), HBase par lots de Puts ('target' =
+    table, 'family', 'row_key'), Spark par écriture dans le workspace monté
+    ('target' = chemin relatif). Le corps n'est jamais rassemblé en mémoire ;
+    l'envoi ralentit au rythme des écritures. Le débit (lignes/s, octets/s)
+    est publié sur le canal du job et par GET sur la même route.
+    """
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    try:
+        data_format = resolve_format(data_format, request.headers.get("content-type"), parse=tool_name != "spark")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    options = {
+        "target": target,
+        "batch_size": batch_size,
+        "parallelism": parallelism,
+        "delimiter": delimiter,
+        "row_key": row_key,
+        "family": family,
+    }
+    stats = IngestStats(tool_name, container_name, data_format, target or "")
+    stream = IngestStream(data_format, stats)
+
+    def run(job):
+        installer = get_installer(tool_name, {"container_name": container_name}, job)
+        return run_ingest(installer, stream, options)
+
+    submitted = submit_job(tool_name, "ingest", container_name, run)
+    ingests.add(submitted["job_id"], stats)
+    received = 0
+    try:
+        async for chunk in request.stream():
+            if chunk:
+                await run_in_threadpool(stream.put, chunk)
+                received += len(chunk)
+    except ClientDisconnect:
+        await run_in_threadpool(stream.abort, "Envoi interrompu par le client.")
+        raise HTTPException(status_code=400, detail="Envoi interrompu")
+    except RuntimeError:
+        # Le job a cessé de lire (échec d'écriture) : son erreur est donnée par /tools/jobs/{id}
+        pass
+    else:
+        await run_in_threadpool(stream.finish)
+    return {**submitted, "received": received}
+
+
+@router.get("/{tool_name}/{container_name}/ingest")
+def get_ingests(tool_name: str, container_name: str):
+    """Ingestions en cours et récentes d'un conteneur : lignes, octets, erreurs et débits."""
+    if tool_name not in TOOLS:
+        raise HTTPException(status_code=404, detail="Outil non supporté")
+    return {"ingests": ingests.list(tool_name, container_name)}
+
+
+# ------------- IMAGES --------------
+
+def prewarm_tool_images() -> list:
+    """Soumet un job de build (ou de vérification du cache) par image personnalisée."""
+    jobs = []
+    for tool, (image_name, _) in BUILD_CONTEXTS.items():
+        def run(job, tool=tool):
+            _, job_logger = job_reporting(job)
+            return {"image": build_manager.ensure_tool_image(tool, job_logger)}
+
+        jobs.append(submit_job(tool, "prewarm", image_name, run))
+    return jobs
+
+
+def prepull_official_images() -> list:
+    """Soumet un job de téléchargement (ou de résolution locale) de l'image MongoDB épinglée."""
+    def run(job):
+        _, job_logger = job_reporting(job)
+        return {"image": MONGO_IMAGE, "id": image_manager.ensure(MONGO_IMAGE, job_logger)}
+
+    return [submit_job("mongodb", "prepull", MONGO_IMAGE, run)]
+
+
+@router.post("/images/prewarm", status_code=202)
+def prewarm_images():
+    """
+    Construit en arrière-plan les images Spark et HBase dont le contexte a changé
+    et télécharge l'image MongoDB, pour que le premier démarrage ne paie ni build ni pull.
+    """
+    return {"jobs": prewarm_tool_images() + prepull_official_images()}
+
+
+# ------------- CONFIGURATION --------------
+
+def cached_config(request: Request, tool_name: str, container_name: str, fetch) -> Response:
+    """
+    Configuration d'un conteneur servie par le cache partagé : l'en-tête Age
+    donne l'ancienneté de la lecture, l'ETag son contenu (304 si If-None-Match
+    correspond) ; 'Cache-Control: no-cache' dans la requête force une relecture.
+    """
+    refresh = "no-cache" in request.headers.get("cache-control", "")
+    config, etag, age = config_cache.get(tool_name, container_name, fetch, refresh=refresh)
+    headers = {"ETag": etag, "Age": str(int(age)), "Cache-Control": "no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return JSONResponse(config, headers=headers)
 
 
 # ------------- SPARK --------------
 
 @router.post("/spark/config")
-def get_spark_config(config: ToolConfig = Body(...)):
+def get_spark_config(request: Request, config: ToolConfig = Body(...)):
     """
-    Retourne la configuration actuelle de Spark.
+    Retourne la configuration actuelle de Spark (voir cached_config).
     """
     try:
         from backend.installers.spark_installer import SparkInstaller
         installer = SparkInstaller(config=config.dict(), progress_callback=dummy_progress, logger=logger)
-        return installer.get_configuration()
+        return cached_config(request, "spark", config.container_name, installer.get_configuration)
     except Exception as e:
         logger.error(f"Erreur récupération config Spark : {e}")
         raise HTTPException(status_code=500, detail="Impossible d'extraire la configuration Spark.")
 
 
-@router.post("/spark/update-config")
+@router.post("/spark/update-config", status_code=202)
 def update_spark_config(update: ToolUpdateConfig):
     """
-    Met à jour la configuration Spark et redémarre le conteneur avec cette nouvelle config.
+    Met à jour la configuration Spark (à chaud si possible) ; le résultat du job
+    indique la stratégie utilisée (noop, in_place, restart, recreate).
     """
-    try:
-        from backend.installers.spark_installer import SparkInstaller
-        installer = SparkInstaller(
-            config={"container_name": update.container_name, "port": update.port},
-            progress_callback=dummy_progress,
-            logger=logger
-        )
-        installer.restart_with_new_config(update.config)
+    desired_states.merge("spark", update.container_name, {"port": update.port, **update.resources()}, update.config)
+    return submit_reconcile("spark", update.container_name, "update-config")
 
-        if not installer.test_installation():
-            raise HTTPException(status_code=500, detail="Redémarrage Spark échoué.")
 
-        return {"status": "updated", "tool": "spark"}
+@router.post("/spark/scale", status_code=202)
+def scale_spark(scale: SparkScaleConfig):
+    """
+    Ajuste le nombre de workers d'un cluster Spark ; le job se termine quand
+    le master compte exactement le nombre de workers demandé.
+    """
+    def run(job):
+        installer = get_installer("spark", scale.dict(), job)
+        return {"status": "scaled", "tool": "spark", **installer.scale(scale.workers)}
 
-    except Exception as e:
-        logger.error(f"Erreur mise à jour Spark : {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return submit_job("spark", "scale", scale.container_name, run)
 
 
 # ------------- HBASE --------------
 
 @router.post("/hbase/config")
-def get_hbase_config(config: ToolConfig = Body(...)):
+def get_hbase_config(request: Request, config: ToolConfig = Body(...)):
     """
-    Retourne la configuration actuelle de HBase.
+    Retourne la configuration actuelle de HBase (voir cached_config).
     """
     try:
         from backend.installers.hbase_installer import HBaseInstaller
         installer = HBaseInstaller(config=config.dict(), progress_callback=dummy_progress, logger=logger)
-        return installer.get_configuration()
+        return cached_config(request, "hbase", config.container_name, installer.get_configuration)
     except Exception as e:
         logger.error(f"Erreur récupération config HBase : {e}")
         raise HTTPException(status_code=500, detail="Impossible d'extraire la configuration HBase.")
 
 
-@router.post("/hbase/update-config")
+@router.post("/hbase/update-config", status_code=202)
 def update_hbase_config(update: ToolUpdateConfig):
     """
-    Met à jour la configuration HBase et redémarre le conteneur.
+    Met à jour la configuration HBase (rechargement à chaud, redémarrage ou
+    recréation selon les clés modifiées) ; le résultat du job indique la stratégie.
     """
-    try:
-        from backend.installers.hbase_installer import HBaseInstaller
-        installer = HBaseInstaller(
-            config={"container_name": update.container_name, "port": update.port},
-            progress_callback=dummy_progress,
-            logger=logger
-        )
-        installer.restart_with_new_config(update.config)
+    desired_states.merge("hbase", update.container_name, {"port": update.port, **update.resources()}, update.config)
+    return submit_reconcile("hbase", update.container_name, "update-config")
 
-        if not installer.test_installation():
-            raise HTTPException(status_code=500, detail="Redémarrage HBase échoué.")
 
-        return {"status": "updated", "tool": "hbase"}
+@router.post("/hbase/scale", status_code=202)
+def scale_hbase(scale: HBaseScaleConfig):
+    """
+    Ajuste le nombre de RegionServers d'un HBase distribué ; le job se termine
+    quand le master compte exactement le nombre de RegionServers demandé.
+    """
+    def run(job):
+        installer = get_installer("hbase", scale.dict(), job)
+        return {"status": "scaled", "tool": "hbase", **installer.scale(scale.regionservers)}
 
-    except Exception as e:
-        logger.error(f"Erreur mise à jour HBase : {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    return submit_job("hbase", "scale", scale.container_name, run)
 
 
 # ------------- MONGODB --------------
@@ -208,7 +710,7 @@ def get_mongodb_config(config: MongoToolConfig = Body(...)):
     """
     Retourne les informations détaillées d'un conteneur MongoDB donné.
     """
-    client = docker.from_env()
+    client = get_docker_client()
     try:
         container = client.containers.get(config.container_name)
     except docker.errors.NotFound:
@@ -234,25 +736,11 @@ def get_mongodb_config(config: MongoToolConfig = Body(...)):
     return container_info
 
 
-@router.post("/mongodb/update-config")
+@router.post("/mongodb/update-config", status_code=202)
 def update_mongodb_config(update: ToolUpdateConfig):
     """
-    Met à jour la configuration MongoDB et redémarre le conteneur.
+    Met à jour la configuration MongoDB (setParameter à chaud si possible) ; le
+    résultat du job indique la stratégie utilisée (noop, in_place, recreate).
     """
-    try:
-        from backend.installers.mongodb_installer import MongoDBInstaller
-        installer = MongoDBInstaller(
-            config={"container_name": update.container_name, "port": update.port},
-            progress_callback=dummy_progress,
-            logger=logger
-        )
-        installer.update_config(update.config)  # <-- Changement ici
-
-        if not installer.test_installation():
-            raise HTTPException(status_code=500, detail="Redémarrage MongoDB échoué.")
-
-        return {"status": "updated", "tool": "mongodb"}
-
-    except Exception as e:
-        logger.error(f"Erreur mise à jour MongoDB : {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    desired_states.merge("mongodb", update.container_name, {"port": update.port, **update.resources()}, update.config)
+    return submit_reconcile("mongodb", update.container_name, "update-config")
@@ -0,0 +1,62 @@
+"""
+Installation HBase distribuée (ZooKeeper, HMaster, RegionServers) contre le
+démon Docker factice du banc d'essai.
+"""
+import logging
+import os
+
+os.environ.setdefault("BIGDATA_STATE_DB", ":memory:")
+
+import pytest
+
+from backend.benchmarks.fake_docker import FakeDockerClient
+from backend.installers import utils
+from backend.installers.hbase_installer import HBaseInstaller
+from backend.installers.ports import port_allocator
+from backend.installers.utils import cluster_network
+
+logger = logging.getLogger("installer_logger")
+
+
+@pytest.fixture
+def docker(tmp_path, monkeypatch):
+    # Les volumes sont créés sous ./data : le test travaille dans un dossier temporaire
+    monkeypatch.chdir(tmp_path)
+    client = FakeDockerClient()
+    monkeypatch.setattr(utils, "_docker_client", client)
+    yield client
+    client.close()
+
+
+def make_installer(name: str) -> HBaseInstaller:
+    return HBaseInstaller(
+        config={"container_name": name, "regionservers": 2},
+        progress_callback=lambda percent: None,
+        logger=logger,
+    )
+
+
+def test_install_distributed_starts_cluster(docker):
+    installer = make_installer("hb-dist")
+    installer.install_distributed()
+
+    names = set(docker.containers.by_name)
+    assert {"hb-dist", "hb-dist-zookeeper"} <= names
+    assert len(installer.list_regionservers()) == 2
+    assert cluster_network("hb-dist") in docker.networks.store
+    installer.rollback()
+
+
+def test_install_distributed_rolls_back_on_unexpected_error(docker, monkeypatch):
+    installer = make_installer("hb-fail")
+
+    def fail(*args, **kwargs):
+        raise TypeError("échec inattendu")
+
+    monkeypatch.setattr(installer, "start_regionservers", fail)
+    with pytest.raises(TypeError):
+        installer.install_distributed()
+
+    assert not docker.containers.by_name
+    assert cluster_network("hb-fail") not in docker.networks.store
+    assert "hb-fail" not in port_allocator._leases
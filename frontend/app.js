@@ -2,17 +2,30 @@ let currentTool = null;
 let runningTools = [];
 let toolConfigs = {};
 
-// Sauvegarde la config dans localStorage
-function saveState() {
-    localStorage.setItem('toolConfigs', JSON.stringify(toolConfigs));
+// Recharge les configurations des outils depuis les instances enregistrées côté backend
+function loadConfigs() {
+    return fetch("http://localhost:8000/tools/instances")
+        .then(res => res.json())
+        .then(data => {
+            toolConfigs = {};
+            // Instances triées de la plus ancienne à la plus récente : la dernière de chaque outil l'emporte
+            (data.instances || []).forEach(instance => {
+                const spec = instance.spec || {};
+                toolConfigs[instance.tool] = {
+                    container_name: instance.container_name,
+                    username: spec.username,
+                    port: spec.port || spec.master_port,
+                    profile: spec.profile || null,
+                };
+            });
+        })
+        .catch(err => console.error("Erreur récupération des configurations:", err));
 }
 
-// Charge la config depuis localStorage et récupère la liste des conteneurs côté backend
+// Charge les configurations et la liste des conteneurs côté backend
 function loadState() {
-    const savedConfigs = localStorage.getItem('toolConfigs');
-    if (savedConfigs) toolConfigs = JSON.parse(savedConfigs);
-
-    fetch("http://localhost:8000/tools/containers?created_by=mon_app")
+    loadConfigs()
+        .then(() => fetch("http://localhost:8000/tools/containers?created_by=mon_app"))
         .then(res => res.json())
         .then(data => {
             runningTools = [];
@@ -42,6 +55,62 @@ function detectToolFromName(name) {
     return null;
 }
 
+// Nombre maximal de lignes de log gardées à l'écran
+const JOB_LOG_MAX_LINES = 200;
+
+// Récupère l'état final d'un job backend
+async function fetchJob(jobId) {
+    const res = await fetch(`http://localhost:8000/tools/jobs/${jobId}`);
+    const job = await res.json();
+    if (!res.ok) throw new Error(job.detail || "Job introuvable");
+    return job;
+}
+
+// Attend la fin d'un job backend en interrogeant périodiquement son statut (repli sans SSE)
+async function waitForJob(jobId, intervalMs = 1000) {
+    while (true) {
+        const job = await fetchJob(jobId);
+        if (job.status === "succeeded" || job.status === "failed") return job;
+        await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+}
+
+// Affiche la progression et les lignes de sortie d'un job
+function showJobProgress(percent, line) {
+    const bar = document.getElementById('jobProgress');
+    if (bar && percent !== null) {
+        bar.style.display = 'block';
+        bar.value = percent;
+    }
+    const log = document.getElementById('jobLog');
+    if (log && line) {
+        const lines = (log.textContent + line + "\n").split("\n");
+        log.textContent = lines.slice(-JOB_LOG_MAX_LINES - 1).join("\n");
+        log.scrollTop = log.scrollHeight;
+    }
+}
+
+// Suit un job via le flux Server-Sent Events, puis retourne son état final
+function followJob(jobId) {
+    const log = document.getElementById('jobLog');
+    if (log) log.textContent = "";
+    showJobProgress(0, null);
+
+    return new Promise((resolve, reject) => {
+        const source = new EventSource(`http://localhost:8000/tools/jobs/${jobId}/events`);
+        source.addEventListener('progress', e => showJobProgress(JSON.parse(e.data).percent, null));
+        source.addEventListener('log', e => showJobProgress(null, JSON.parse(e.data).line));
+        source.addEventListener('end', () => {
+            source.close();
+            fetchJob(jobId).then(resolve, reject);
+        });
+        source.onerror = () => {
+            source.close();
+            waitForJob(jobId).then(resolve, reject);
+        };
+    });
+}
+
 // Affiche un message dans la zone output
 function setOutput(msg) {
     const outputEl = document.getElementById('output');
@@ -64,7 +133,6 @@ function updateStatus(tool, isRunning) {
     }
 
     updateRunningList();
-    saveState();
 }
 
 // Met à jour la liste des outils en cours dans l'interface avec boutons de configuration et compteurs
@@ -142,8 +210,13 @@ async function stopTool(tool) {
         const data = await response.json();
 
         if (response.ok) {
-            setOutput(`${tool} arrêté avec succès !`);
-            updateStatus(tool, false);
+            const job = await followJob(data.job_id);
+            if (job.status === "succeeded") {
+                setOutput(`${tool} arrêté avec succès !`);
+                updateStatus(tool, false);
+            } else {
+                setOutput(`Erreur : ${job.error || `Échec de l'arrêt de ${tool}`}`);
+            }
         } else {
             setOutput(`Erreur : ${data.detail || `Échec de l'arrêt de ${tool}`}`);
         }
@@ -163,6 +236,7 @@ function showCustomizeModal(tool) {
     document.getElementById('username').value = config.username || '';
     document.getElementById('password').value = config.password || '';
     document.getElementById('port').value = config.port || '8080';
+    document.getElementById('profile').value = config.profile || '';
 
     document.getElementById('customModal').style.display = 'block';
 }
@@ -173,6 +247,7 @@ async function submitCustomization() {
     const username = document.getElementById('username').value.trim();
     const password = document.getElementById('password').value.trim();
     const port = parseInt(document.getElementById('port').value.trim());
+    const profile = document.getElementById('profile').value || null;
 
     if (!container_name || !username || !password || isNaN(port)) {
         setOutput('Tous les champs sont requis avec un port valide !');
@@ -186,13 +261,19 @@ async function submitCustomization() {
         const response = await fetch(`http://localhost:8000/tools/${currentTool}/start`, {
             method: 'POST',
             headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ container_name, username, password, port })
+            body: JSON.stringify({ container_name, username, password, port, profile })
         });
         const data = await response.json();
         if (response.ok) {
-            setOutput(`${currentTool} démarré avec succès !`);
-            toolConfigs[currentTool] = { container_name, username, password, port };
-            updateStatus(currentTool, true);
+            const tool = currentTool;
+            const job = await followJob(data.job_id);
+            if (job.status === "succeeded") {
+                setOutput(`${tool} démarré avec succès !`);
+                toolConfigs[tool] = { container_name, username, password, port: job.result.port || port, profile };
+                updateStatus(tool, true);
+            } else {
+                setOutput(`Erreur : ${job.error || `Échec du démarrage de ${tool}`}`);
+            }
         } else {
             setOutput(`Erreur : ${data.detail || `Échec du démarrage de ${currentTool}`}`);
         }
@@ -332,12 +413,14 @@ async function showConfigModal(tool) {
                     });
                     const dataUpdate = await respUpdate.json();
 
-                    if (respUpdate.ok) {
-                        setOutput("Configuration MongoDB mise à jour avec succès !");
+                    const jobUpdate = respUpdate.ok ? await followJob(dataUpdate.job_id) : null;
+
+                    if (jobUpdate && jobUpdate.status === "succeeded") {
+                        setOutput(`Configuration MongoDB mise à jour avec succès ! (stratégie : ${jobUpdate.result.strategy})`);
                         document.getElementById('configModal').style.display = 'none';
                         disableConfigTemporarily(tool, 5);
                     } else {
-                        setOutput(`Erreur : ${dataUpdate.detail || 'Erreur inconnue'}`);
+                        setOutput(`Erreur : ${jobUpdate ? jobUpdate.error : (dataUpdate.detail || 'Erreur inconnue')}`);
                     }
                 } catch (err) {
                     setOutput(`Erreur de requête : ${err}`);
@@ -391,13 +474,14 @@ async function applySparkConfig(tool) {
             body: JSON.stringify(body)
         });
         const data = await response.json();
+        const job = response.ok ? await followJob(data.job_id) : null;
 
-        if (response.ok) {
-            setOutput("Configuration Spark mise à jour avec succès !");
+        if (job && job.status === "succeeded") {
+            setOutput(`Configuration Spark mise à jour avec succès ! (stratégie : ${job.result.strategy})`);
             document.getElementById('configModal').style.display = 'none';
             disableConfigTemporarily(tool, 5);
         } else {
-            setOutput(`Erreur : ${data.detail}`);
+            setOutput(`Erreur : ${job ? job.error : data.detail}`);
         }
     } catch (err) {
         setOutput(`Erreur de requête : ${err}`);
@@ -424,13 +508,14 @@ async function applyHBaseConfig(tool) {
             body: JSON.stringify(body)
         });
         const data = await response.json();
+        const job = response.ok ? await followJob(data.job_id) : null;
 
-        if (response.ok) {
-            setOutput("Configuration HBase mise à jour avec succès !");
+        if (job && job.status === "succeeded") {
+            setOutput(`Configuration HBase mise à jour avec succès ! (stratégie : ${job.result.strategy})`);
             document.getElementById('configModal').style.display = 'none';
             disableConfigTemporarily(tool, 5);
         } else {
-            setOutput(`Erreur : ${data.detail}`);
+            setOutput(`Erreur : ${job ? job.error : data.detail}`);
         }
     } catch (err) {
         setOutput(`Erreur de requête : ${err}`);
@@ -554,13 +639,14 @@ async function applyMongoConfig(tool) {
         });
 
         const data = await response.json();
+        const job = response.ok ? await followJob(data.job_id) : null;
 
-        if (response.ok) {
-            setOutput("Configuration MongoDB mise à jour avec succès !");
+        if (job && job.status === "succeeded") {
+            setOutput(`Configuration MongoDB mise à jour avec succès ! (stratégie : ${job.result.strategy})`);
             document.getElementById('configModal').style.display = 'none';
             disableConfigTemporarily(tool, 5);
         } else {
-            setOutput(`Erreur : ${data.detail || "Échec de la mise à jour"}`);
+            setOutput(`Erreur : ${job ? job.error : (data.detail || "Échec de la mise à jour")}`);
         }
     } catch (err) {
         setOutput(`Erreur de requête : ${err}`);